@@ -0,0 +1,68 @@
+"""
+Regression check of sensitivity curves against full simulations.
+Point of curve without ASE and power scaling must give the same values as simulation without amplifier
+(the same noise of transmitter laser, independent local oscillator and photodiodes).
+
+Run from the repository root: python -m benchmarks.sensitivity_check
+"""
+
+import numpy as np
+
+from scripts.simulation import simulate, getValues
+from scripts.sensitivity import osnrCurve, sensitivityCurve
+
+# Number of simulated symbols
+SYMBOLS = 2 * 10**4
+# Laser linewidth [Hz] (phase noise of transmitter and local oscillator isn't negligible)
+LINEWIDTH = 5 * 10**6
+# Compared values
+VALUES = ["BER", "SER", "SNR", "powerRxdBm"]
+
+def configuration(localOscillator: str) -> tuple:
+    """
+    QPSK with coherent reciever without carrier phase recovery.
+
+    Returns
+    -----
+    tuple (generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters)
+    """
+    generalParameters = {"SpS":8, "Format":"psk", "Order":4, "Rs":25e9, "Symbols":SYMBOLS}
+    generalParameters.update({"Fs":generalParameters.get("SpS") * generalParameters.get("Rs")})
+    generalParameters.update({"Ts":1 / generalParameters.get("Fs")})
+    sourceParameters = {"Power":10, "Frequency":193.1, "Linewidth":LINEWIDTH, "RIN":-150, "Ideal":False}
+    modulatorParameters = {"Type":"IQM"}
+    channelParameters = {"Length":10, "Attenuation":0.2, "Dispersion":16, "Ideal":False}
+    recieverParameters = {"Type":"Coherent", "Bandwidth":5 * 10**10, "Resolution":0.7, "Ideal":False, "LocalOscillator":localOscillator}
+
+    return generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters
+
+
+def check(localOscillator: str):
+    generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters = configuration(localOscillator)
+
+    simulationResults = simulate(generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, {}, False)
+    expected = getValues(simulationResults, generalParameters)
+    point = sensitivityCurve([(None, None)], generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters,
+                             symbols=SYMBOLS)[0]
+    # Point of curve with high OSNR
+    curve = osnrCurve([40], generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, symbols=SYMBOLS)[0]
+
+    print(f"{localOscillator:>12} simulate BER {expected.get('BER'):.4g}, curve point BER {point.get('BER'):.4g}, OSNR 40 dB BER {curve.get('BER'):.4g}")
+
+    for key in VALUES:
+        if not np.isclose(expected.get(key), point.get(key)):
+            raise Exception(f"{key} of curve point differs from simulation ({localOscillator} local oscillator)")
+
+    if not np.isclose(expected.get("BER"), curve.get("BER"), atol=0.05):
+        raise Exception(f"BER of curve at high OSNR differs from simulation ({localOscillator} local oscillator)")
+
+
+def main():
+    for localOscillator in ["Transmitter", "Independent"]:
+        check(localOscillator)
+
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
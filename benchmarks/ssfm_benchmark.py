@@ -0,0 +1,71 @@
+"""
+Benchmark of nonlinear fiber channel (split-step Fourier method).
+Measures time and number of steps for span lengths and maximum nonlinear phase rotations.
+
+Run from the repository root: python -m benchmarks.ssfm_benchmark
+"""
+
+import time
+import numpy as np
+from optic.utils import parameters
+
+from scripts.my_models import nonlinearFiberChannel, ssfmLinearOperator
+
+# Number of samples of test signal
+SAMPLES = 2**18
+# Span lengths [km]
+LENGTHS = [20, 50, 80, 120]
+# Maximum nonlinear phase rotations in one step [rad]
+MAX_PHASES = [2e-2, 5e-3, 1e-3]
+# Launch power [dBm]
+POWER = 10
+
+def testSignal(samples: int, power: float, SpS: int = 8) -> np.ndarray:
+    """
+    QPSK signal with NRZ pulses.
+    """
+    rng = np.random.default_rng(123)
+    symbols = (rng.choice([-1, 1], samples // SpS) + 1j * rng.choice([-1, 1], samples // SpS)) / np.sqrt(2)
+
+    return np.repeat(symbols, SpS) * np.sqrt(10**(power / 10) * 1e-3)
+
+
+def benchmark(length: float, maxPhase: float, signal) -> tuple[float, int]:
+    """
+    Returns
+    -----
+    tuple (time [s], number of steps)
+    """
+    param = parameters()
+    param.L = length
+    param.alpha = 0.2
+    param.D = 16
+    param.Fc = 193.1e12
+    param.Fs = 200e9
+    param.maxPhase = maxPhase
+
+    cacheInfo = ssfmLinearOperator.cache_info()
+    start = time.perf_counter()
+    nonlinearFiberChannel(signal, param)
+    duration = time.perf_counter() - start
+    newCacheInfo = ssfmLinearOperator.cache_info()
+
+    steps = newCacheInfo.hits + newCacheInfo.misses - cacheInfo.hits - cacheInfo.misses
+
+    return duration, steps
+
+
+def main():
+    signal = testSignal(SAMPLES, POWER)
+
+    print(f"{SAMPLES} samples, {POWER} dBm")
+    print(f"{'length [km]':>12} {'max phase [rad]':>16} {'steps':>8} {'time [s]':>10} {'time/step [ms]':>15}")
+
+    for length in LENGTHS:
+        for maxPhase in MAX_PHASES:
+            duration, steps = benchmark(length, maxPhase, signal)
+            print(f"{length:>12} {maxPhase:>16} {steps:>8} {duration:>10.3f} {duration / steps * 1e3:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Alignment of received symbols with transmitted symbols before error counting.
+Delay and phase ambiguity are estimated from FFT cross-correlation of the first symbols (O(N log N)).
+"""
+
+import numpy as np
+
+from scripts.fft_backend import fft, ifft
+
+# Number of symbols used for estimation of delay
+ALIGNMENT_WINDOW = 2**14
+
+def symmetryAngle(modulationOrder: int, modulationFormat: str) -> float:
+    """
+    Rotation which maps constellation to itself (phase ambiguity of reciever).
+    """
+    if modulationFormat == "pam":
+        return np.pi
+    elif modulationFormat == "psk":
+        return 2 * np.pi / modulationOrder
+    elif modulationFormat == "qam":
+        return np.pi / 2
+    else: raise Exception("Unexpected error")
+
+
+def estimateDelay(symbolsRx, symbolsTx, window: int = ALIGNMENT_WINDOW) -> tuple[int, complex]:
+    """
+    Estimates delay of received symbols with cross-correlation computed by FFT.
+    Delay is searched in range of +- half of the window.
+
+    Returns
+    -----
+    tuple (delay [symbols], correlation at delay)
+
+    Positive delay means that symbolsRx[n] corresponds to symbolsTx[n - delay].
+    """
+    length = min(window, symbolsRx.size, symbolsTx.size)
+    nfft = int(2**np.ceil(np.log2(2 * length)))
+
+    correlation = ifft(fft(symbolsRx[:length], nfft) * np.conj(fft(symbolsTx[:length], nfft)))
+
+    # Lags -maxLag ... maxLag (negative lags are at the end of circular correlation)
+    maxLag = length // 2
+    lags = np.concatenate((np.arange(maxLag + 1), np.arange(-maxLag, 0)))
+    correlation = np.concatenate((correlation[:maxLag + 1], correlation[nfft - maxLag:]))
+
+    peak = int(np.argmax(np.abs(correlation)))
+
+    return int(lags[peak]), correlation[peak]
+
+
+def alignSymbols(symbolsRx, symbolsTx, modulationOrder: int, modulationFormat: str, window: int = ALIGNMENT_WINDOW) -> dict:
+    """
+    Aligns received symbols with transmitted ones (delay and phase ambiguity).
+
+    Returns
+    -----
+    dictionary: symbolsRx, symbolsTx (aligned, same lengths), Delay [symbols], Rotation [rad]
+    """
+    delay, peak = estimateDelay(symbolsRx, symbolsTx, window)
+
+    length = min(symbolsRx.size - max(delay, 0), symbolsTx.size + min(delay, 0))
+
+    if delay >= 0:
+        symbolsRx = symbolsRx[delay:delay + length]
+        symbolsTx = symbolsTx[:length]
+    else:
+        symbolsRx = symbolsRx[:length]
+        symbolsTx = symbolsTx[-delay:-delay + length]
+
+    # Rotation to the nearest symmetric position of constellation
+    symmetry = symmetryAngle(modulationOrder, modulationFormat)
+    rotation = symmetry * np.round(np.angle(peak) / symmetry)
+
+    if rotation != 0:
+        symbolsRx = symbolsRx * np.exp(-1j * rotation)
+        if modulationFormat == "pam":
+            symbolsRx = symbolsRx.real
+
+    return {"symbolsRx":symbolsRx, "symbolsTx":symbolsTx, "Delay":delay, "Rotation":rotation}
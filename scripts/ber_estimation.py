@@ -0,0 +1,154 @@
+"""
+Semi-analytical estimation of error rates.
+Per-level statistics of received symbols are measured from a short simulation and BER / SER are predicted with Gaussian noise formulas.
+"""
+
+import numpy as np
+from scipy.special import erfc
+
+# Number of symbols used for estimation
+ESTIMATE_SYMBOLS = 10**4
+
+def qFunction(x):
+    """
+    Gaussian tail probability Q(x).
+    """
+    return 0.5 * erfc(x / np.sqrt(2))
+
+
+def levelStatistics(symbolsRx, symbolsTx) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calculates mean and variance of received symbols for every transmitted constellation point.
+
+    Returns
+    -----
+    tuple (transmitted levels, means of received symbols, variances of received symbols)
+
+    Variance is total variance (sum of real and imaginary part variances).
+    """
+    length = min(symbolsRx.size, symbolsTx.size)
+    symbolsRx = symbolsRx[:length]
+
+    # Index of transmitted constellation point for every symbol
+    levels, indexes = np.unique(np.round(symbolsTx[:length], 8), return_inverse=True)
+
+    counts = np.bincount(indexes, minlength=levels.size)
+    means = (np.bincount(indexes, weights=symbolsRx.real, minlength=levels.size)
+             + 1j * np.bincount(indexes, weights=symbolsRx.imag, minlength=levels.size)) / counts
+
+    deviation = np.abs(symbolsRx - means[indexes])**2
+    variances = np.bincount(indexes, weights=deviation, minlength=levels.size) / counts
+
+    return levels, means, variances
+
+
+def estimatePAM(symbolsRx, symbolsTx, modulationOrder: int) -> tuple[float, float, float]:
+    """
+    Estimates errors of PAM (OOK) with per-level Gaussian noise. Decision thresholds are in the middle of neighbouring levels.
+
+    Returns
+    -----
+    tuple (BER, SER, SNR [dB])
+    """
+    _, means, variances = levelStatistics(symbolsRx.real, symbolsTx.real)
+    means = means.real
+
+    # Sort levels by received mean
+    order = np.argsort(means)
+    means = means[order]
+    sigmas = np.sqrt(variances[order])
+
+    thresholds = (means[1:] + means[:-1]) / 2
+
+    # Error probability of every level (crossing lower and upper threshold)
+    with np.errstate(divide="ignore"):
+        errorsUp = np.append(qFunction((thresholds - means[:-1]) / sigmas[:-1]), 0)
+        errorsDown = np.insert(qFunction((means[1:] - thresholds) / sigmas[1:]), 0, 0)
+
+    ser = np.mean(errorsUp + errorsDown)
+    # Gray coding => neighbouring levels differ in one bit
+    ber = ser / np.log2(modulationOrder)
+
+    # Signal power related to mean noise power
+    noisePower = np.mean(sigmas**2)
+    snr = np.var(means) / noisePower if noisePower > 0 else np.inf
+
+    return ber, ser, 10 * np.log10(snr)
+
+
+def estimateQAM(symbolsRx, symbolsTx, modulationOrder: int) -> tuple[float, float, float]:
+    """
+    Estimates errors of square QAM with additive Gaussian noise.
+
+    Returns
+    -----
+    tuple (BER, SER, SNR [dB])
+    """
+    snr = symbolsSNR(symbolsRx, symbolsTx)
+    M = modulationOrder
+
+    # Error probability in one dimension
+    p = 2 * (1 - 1 / np.sqrt(M)) * qFunction(np.sqrt(3 * snr / (M - 1)))
+    ser = 1 - (1 - p)**2
+    ber = ser / np.log2(M)
+
+    return ber, ser, 10 * np.log10(snr)
+
+
+def estimatePSK(symbolsRx, symbolsTx, modulationOrder: int) -> tuple[float, float, float]:
+    """
+    Estimates errors of PSK with additive Gaussian noise.
+
+    Returns
+    -----
+    tuple (BER, SER, SNR [dB])
+    """
+    snr = symbolsSNR(symbolsRx, symbolsTx)
+    M = modulationOrder
+
+    if M == 2:
+        ber = qFunction(np.sqrt(2 * snr))
+        ser = ber
+    else:
+        ser = min(2 * qFunction(np.sqrt(2 * snr) * np.sin(np.pi / M)), 1)
+        ber = ser / np.log2(M)
+
+    return ber, ser, 10 * np.log10(snr)
+
+
+def symbolsSNR(symbolsRx, symbolsTx) -> float:
+    """
+    Calculates symbol SNR (Es/N0) from per-level statistics.
+    """
+    _, means, variances = levelStatistics(symbolsRx, symbolsTx)
+
+    noisePower = np.mean(variances)
+
+    if noisePower == 0:
+        return np.inf
+
+    return np.mean(np.abs(means)**2) / noisePower
+
+
+def estimateErrors(symbolsRx, symbolsTx, modulationOrder: int, modulationFormat: str, symbols: int = ESTIMATE_SYMBOLS) -> tuple[float, float, float]:
+    """
+    Estimates BER, SER and SNR from received and transmitted symbols.
+
+    Parameters
+    -----
+    symbols: number of symbols used for estimation
+
+    Returns
+    -----
+    tuple (BER, SER, SNR [dB])
+    """
+    symbolsRx = symbolsRx[:symbols]
+    symbolsTx = symbolsTx[:symbols]
+
+    if modulationFormat == "pam":
+        return estimatePAM(symbolsRx, symbolsTx, modulationOrder)
+    elif modulationFormat == "qam":
+        return estimateQAM(symbolsRx, symbolsTx, modulationOrder)
+    elif modulationFormat == "psk":
+        return estimatePSK(symbolsRx, symbolsTx, modulationOrder)
+    else: raise Exception("Unexpected error")
@@ -0,0 +1,314 @@
+"""
+Distributed parameter sweep. Coordinator hands out sweep points to workers connected over TCP, workers run simulate and getValues
+and send back metric records. Messages are JSON objects, one per line (as in simulation_server module).
+
+Every worker computes one point at a time. Point of lost worker (closed connection or no result before timeout) is given to another worker,
+point which fails more than allowed retries is recorded as failed. Records are appended to JSON-lines file as soon as they arrive,
+so finished points are skipped when interrupted sweep is started again.
+
+Coordinator -> worker: {"type": "point", "key": point key, "job": job dictionary of simulation_server}, {"type": "stop"}
+
+Worker -> coordinator: {"type": "result", "key": ..., "values": ..., "seconds": ...}, {"type": "error", "key": ..., "message": ...}
+
+Run coordinator: python -m scripts.distributed_sweep coordinator SWEEP.json RESULTS.jsonl [--host HOST] [--port PORT]
+    SWEEP.json: {"job": base job, "axes": {"generalParameters.Order": [4, 16], "channelParameters.Length": [10, 50], ...}, "common": false}
+        "common": true => common random numbers, all points use the same noise realizations (only scaled), which are generated once
+        per worker (smooth curves of swept metrics with fewer symbols)
+
+Run worker (on every machine): python -m scripts.distributed_sweep worker [--host COORDINATOR] [--port PORT]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import socket
+import time
+
+from scripts.simulation_server import runJob, jobConfig, jsonValue
+
+# Default TCP port of coordinator
+SWEEP_PORT = 8766
+# Number of repeated attempts of point after lost worker or error
+SWEEP_RETRIES = 2
+# Time limit of one point [s] (worker is considered lost after it)
+SWEEP_TIMEOUT = 3600
+# Time of repeated connection attempts of worker to coordinator [s]
+CONNECT_TIMEOUT = 30
+
+def pointKey(job: dict) -> str:
+    """
+    Stable key of sweep point (digest of job dictionary).
+    """
+    return hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()
+
+
+def sweepPoints(job: dict, axes: dict) -> list[dict]:
+    """
+    Creates sweep points (all combinations of swept values).
+
+    Parameters
+    -----
+    job: base job (see simulation_server module)
+
+    axes: swept values of parameters, keys are "block.Key" (e.g. "generalParameters.Order") or top level keys of job (e.g. "symbols")
+
+    Returns
+    -----
+    list of points: Key, Point (swept values), Job
+    """
+    points = []
+    for combination in itertools.product(*axes.values()):
+        pointJob = {key:dict(value) if isinstance(value, dict) else value for key, value in job.items()}
+        point = dict(zip(axes.keys(), combination))
+
+        for name, value in point.items():
+            block, _, key = name.partition(".")
+            if key:
+                pointJob.setdefault(block, {}).update({key:value})
+            else:
+                pointJob.update({block:value})
+
+        # Invalid parameters are found before sweep starts
+        jobConfig(pointJob)
+        points.append({"Key":pointKey(pointJob), "Point":point, "Job":pointJob})
+
+    return points
+
+
+def finishedKeys(path: str) -> set:
+    """
+    Keys of points already recorded in results file.
+    """
+    if not os.path.exists(path):
+        return set()
+
+    keys = set()
+    with open(path) as file:
+        for line in file:
+            # Last line could be incomplete after interruption
+            try:
+                keys.add(json.loads(line).get("key"))
+            except json.JSONDecodeError:
+                pass
+
+    return keys
+
+
+class SweepCoordinator:
+    """
+    Hands out sweep points to workers and writes their records.
+
+    Parameters
+    -----
+    points: output of sweepPoints
+
+    output: path of JSON-lines results file (records are appended)
+
+    retries: number of repeated attempts of one point
+
+    timeout: time limit of one point [s]
+    """
+    def __init__(self, points: list, output: str, retries: int = SWEEP_RETRIES, timeout: float = SWEEP_TIMEOUT):
+        self.output = output
+        self.retries = retries
+        self.timeout = timeout
+
+        finished = finishedKeys(output)
+        self.points = {point.get("Key"):dict(point, Attempts=0) for point in points if point.get("Key") not in finished}
+        self.remaining = len(self.points)
+        self.queue = asyncio.Queue()
+        self.done = asyncio.Event()
+        # Tasks of connected workers
+        self.workers = set()
+
+
+    async def run(self, host: str = "127.0.0.1", port: int = SWEEP_PORT):
+        """
+        Runs coordinator until all points are recorded.
+        """
+        if self.remaining == 0:
+            return
+
+        for key in self.points:
+            self.queue.put_nowait(key)
+
+        server = await asyncio.start_server(self.handleWorker, host=host, port=port)
+        async with server:
+            await self.done.wait()
+            # Workers are stopped before server is closed
+            await asyncio.gather(*self.workers, return_exceptions=True)
+
+
+    async def handleWorker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Gives points to one worker until sweep is finished or worker is lost.
+        """
+        worker = "{}:{}".format(*writer.get_extra_info("peername")[:2])
+        self.workers.add(asyncio.current_task())
+
+        try:
+            while not self.done.is_set():
+                key = await self.nextPoint()
+                if key is None:
+                    break
+
+                point = self.points.get(key)
+                point.update({"Attempts":point.get("Attempts") + 1})
+
+                try:
+                    writer.write((json.dumps({"type":"point", "key":key, "job":point.get("Job")}) + "\n").encode())
+                    await writer.drain()
+                    line = await asyncio.wait_for(reader.readline(), self.timeout)
+                    message = json.loads(line) if line else None
+                except (ConnectionError, asyncio.TimeoutError, json.JSONDecodeError):
+                    message = None
+
+                # Lost worker
+                if message is None:
+                    self.retry(key, worker, "Worker was lost")
+                    break
+
+                if message.get("type") == "result":
+                    self.record(key, {"status":"done", "values":message.get("values"), "seconds":message.get("seconds"), "worker":worker})
+                else:
+                    self.retry(key, worker, message.get("message"))
+
+            writer.write((json.dumps({"type":"stop"}) + "\n").encode())
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.workers.discard(asyncio.current_task())
+            writer.close()
+
+
+    async def nextPoint(self) -> str | None:
+        """
+        Returns
+        -----
+        key of next point
+
+        None: all points are recorded
+        """
+        getTask = asyncio.ensure_future(self.queue.get())
+        doneTask = asyncio.ensure_future(self.done.wait())
+        await asyncio.wait((getTask, doneTask), return_when=asyncio.FIRST_COMPLETED)
+        doneTask.cancel()
+
+        if getTask.done():
+            return getTask.result()
+
+        getTask.cancel()
+        return None
+
+
+    def retry(self, key: str, worker: str, message: str):
+        """
+        Returns point to queue or records it as failed after all retries.
+        """
+        point = self.points.get(key)
+
+        if point.get("Attempts") > self.retries:
+            self.record(key, {"status":"failed", "message":message, "worker":worker})
+        else:
+            self.queue.put_nowait(key)
+
+
+    def record(self, key: str, result: dict):
+        """
+        Appends record of point to results file.
+        """
+        point = self.points.get(key)
+        record = {"key":key, "point":point.get("Point"), "attempts":point.get("Attempts")}
+        record.update(result)
+
+        with open(self.output, "a") as file:
+            file.write(json.dumps(jsonValue(record)) + "\n")
+
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.done.set()
+
+
+def runWorker(host: str = "127.0.0.1", port: int = SWEEP_PORT, connectTimeout: float = CONNECT_TIMEOUT) -> int:
+    """
+    Worker loop. Connects to coordinator (repeatedly until connectTimeout) and computes points until coordinator stops it.
+
+    Returns
+    -----
+    number of computed points
+    """
+    deadline = time.monotonic() + connectTimeout
+    while True:
+        try:
+            connection = socket.create_connection((host, port))
+            break
+        except ConnectionError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+    computed = 0
+    with connection, connection.makefile("rw") as stream:
+        for line in stream:
+            message = json.loads(line)
+            if message.get("type") != "point":
+                break
+
+            start = time.perf_counter()
+            try:
+                values = runJob(message.get("job"))
+            except Exception as exception:
+                reply = {"type":"error", "key":message.get("key"), "message":str(exception)}
+            else:
+                if values is None:
+                    reply = {"type":"error", "key":message.get("key"), "message":"Signal power is too low to be detected by amplifier"}
+                else:
+                    reply = {"type":"result", "key":message.get("key"), "values":values, "seconds":time.perf_counter() - start}
+
+            # Coordinator closed connection (point was given to another worker after timeout)
+            try:
+                stream.write(json.dumps(reply) + "\n")
+                stream.flush()
+            except ConnectionError:
+                break
+            computed += 1
+
+    return computed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed parameter sweep")
+    parser.add_argument("role", choices=("coordinator", "worker"))
+    parser.add_argument("sweep", nargs="?", help="sweep JSON file (coordinator)")
+    parser.add_argument("output", nargs="?", help="results JSON-lines file (coordinator)")
+    parser.add_argument("--host", default="127.0.0.1", help="listening address of coordinator / address of coordinator for worker")
+    parser.add_argument("--port", type=int, default=SWEEP_PORT)
+    parser.add_argument("--retries", type=int, default=SWEEP_RETRIES)
+    parser.add_argument("--timeout", type=float, default=SWEEP_TIMEOUT, help="time limit of one point [s]")
+    arguments = parser.parse_args()
+
+    if arguments.role == "worker":
+        print(f"Worker computed {runWorker(arguments.host, arguments.port)} points")
+        return
+
+    if arguments.sweep is None or arguments.output is None:
+        parser.error("coordinator needs sweep and output files")
+
+    with open(arguments.sweep) as file:
+        sweep = json.load(file)
+
+    job = sweep.get("job")
+    if sweep.get("common", False):
+        job = dict(job, commonNoise=True)
+
+    coordinator = SweepCoordinator(sweepPoints(job, sweep.get("axes")), arguments.output, arguments.retries, arguments.timeout)
+    print(f"Sweep with {coordinator.remaining} remaining points")
+    asyncio.run(coordinator.run(arguments.host, arguments.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Common FFT backend of simulation (fiber channels, spectra, reciever filters and DSP).
+
+FFTs are computed by scipy.fft with multiple threads (WORKERS). scipy.fft keeps plans (twiddle factors) of recently used lengths,
+frequency grids and filter responses are cached here, so repeated calls with the same lengths don't recompute them.
+Cached arrays have the length of the whole signal, so their memory is limited together (CACHE_BYTES) and can be released by clearCaches.
+Linear convolutions are padded to fast lengths (next_fast_len).
+"""
+
+import threading
+import numpy as np
+import scipy.fft as sfft
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+# Number of threads used by FFTs (-1 = all processors)
+WORKERS = -1
+# Memory limit of all cached arrays (frequency grids, filter responses, linear operators of fiber) [bytes]
+CACHE_BYTES = 2**28
+# Cached arrays of all cached functions (the least recently used are dropped first)
+CACHE = OrderedDict()
+# Lock of CACHE (cached functions are called from more threads)
+CACHE_LOCK = threading.Lock()
+# Statistics of cached function
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "entries", "bytes"])
+
+def setWorkers(workers: int):
+    """
+    Sets number of threads used by FFTs (-1 = all processors, 1 = single thread).
+    """
+    global WORKERS
+    WORKERS = workers
+
+
+def cachedArray(function):
+    """
+    Decorator caching arrays returned by function (arguments must be hashable).
+    All cached functions share memory limit CACHE_BYTES, arrays larger than the limit aren't kept.
+    Decorated function has cache_info and cache_clear (as functools.lru_cache).
+    """
+    statistics = {"hits":0, "misses":0}
+
+    @wraps(function)
+    def wrapper(*arguments, **keywords):
+        key = (function, arguments, tuple(sorted(keywords.items())))
+
+        with CACHE_LOCK:
+            value = CACHE.get(key)
+            if value is not None:
+                CACHE.move_to_end(key)
+                statistics.update({"hits":statistics.get("hits") + 1})
+                return value
+
+            statistics.update({"misses":statistics.get("misses") + 1})
+
+        # Computed outside of lock (cached functions call each other)
+        value = function(*arguments, **keywords)
+
+        with CACHE_LOCK:
+            if value.nbytes <= CACHE_BYTES:
+                CACHE.update({key:value})
+                while sum(item.nbytes for item in CACHE.values()) > CACHE_BYTES:
+                    CACHE.popitem(last=False)
+
+        return value
+
+    def cacheInfo() -> CacheInfo:
+        with CACHE_LOCK:
+            entries = [value for (cached, _, _), value in CACHE.items() if cached is function]
+        return CacheInfo(statistics.get("hits"), statistics.get("misses"), len(entries), sum(value.nbytes for value in entries))
+
+    def cacheClear():
+        with CACHE_LOCK:
+            for key in [key for key in CACHE if key[0] is function]:
+                CACHE.pop(key)
+        statistics.update({"hits":0, "misses":0})
+
+    wrapper.cache_info = cacheInfo
+    wrapper.cache_clear = cacheClear
+
+    return wrapper
+
+
+def clearCaches():
+    """
+    Releases memory of all cached arrays (e.g. after simulation of long signal).
+    """
+    with CACHE_LOCK:
+        CACHE.clear()
+
+
+def fft(x, n: int | None = None, axis: int = -1) -> np.ndarray:
+    return sfft.fft(x, n=n, axis=axis, workers=WORKERS)
+
+
+def ifft(x, n: int | None = None, axis: int = -1) -> np.ndarray:
+    return sfft.ifft(x, n=n, axis=axis, workers=WORKERS)
+
+
+def rfft(x, n: int | None = None, axis: int = -1) -> np.ndarray:
+    return sfft.rfft(x, n=n, axis=axis, workers=WORKERS)
+
+
+def irfft(x, n: int | None = None, axis: int = -1) -> np.ndarray:
+    return sfft.irfft(x, n=n, axis=axis, workers=WORKERS)
+
+
+def fastLength(length: int, real: bool = False) -> int:
+    """
+    The smallest length not shorter than given length with fast FFT (small prime factors).
+    """
+    return sfft.next_fast_len(length, real=real)
+
+
+@cachedArray
+def fftFrequencies(length: int, Fs: float) -> np.ndarray:
+    """
+    Frequencies of FFT bins [Hz] (FFT order). Cached for repeated use.
+    """
+    frequencies = sfft.fftfreq(length, 1 / Fs)
+    frequencies.flags.writeable = False
+
+    return frequencies
+
+
+@cachedArray
+def angularFrequencies(length: int, Fs: float) -> np.ndarray:
+    """
+    Angular frequencies of FFT bins [rad/s] (FFT order). Cached for repeated use.
+    """
+    omega = 2 * np.pi * fftFrequencies(length, Fs)
+    omega.flags.writeable = False
+
+    return omega
+
+
+@cachedArray
+def cachedResponse(taps: bytes, length: int, real: bool) -> np.ndarray:
+    """
+    Frequency response of FIR filter (taps as bytes so they can be hashed). Cached for repeated use.
+    """
+    h = np.frombuffer(taps, dtype=np.float64)
+    response = rfft(h, length) if real else fft(h, length)
+    response.flags.writeable = False
+
+    return response
+
+
+def fftConvolve(x, h) -> np.ndarray:
+    """
+    Linear convolution computed with FFT, output has the same length and alignment as np.convolve(x, h, mode="same").
+    Frequency response of real filter taps is cached. 2-D signals are filtered along last axis (every row at once).
+    """
+    length = x.shape[-1] + h.size - 1
+    real = not np.iscomplexobj(x) and not np.iscomplexobj(h)
+    nfft = fastLength(length, real)
+
+    if not np.iscomplexobj(h):
+        response = cachedResponse(np.ascontiguousarray(h, dtype=np.float64).tobytes(), nfft, real)
+    else:
+        response = fft(h, nfft)
+
+    if real:
+        full = irfft(rfft(x, nfft) * response, nfft)
+    else:
+        full = ifft(fft(x, nfft) * response, nfft)
+
+    start = (h.size - 1) // 2
+
+    return full[..., start:start + x.shape[-1]]
+
+
+def magnitudeSpectrum(x, Fs: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Two-sided magnitude spectrum (without window) with zero frequency in the middle.
+
+    Returns
+    -----
+    tuple (frequencies [Hz], magnitudes)
+    """
+    spectrum = np.abs(fft(x)) / x.size
+    frequencies = fftFrequencies(x.size, Fs)
+
+    return sfft.fftshift(frequencies), sfft.fftshift(spectrum)
+
+
+def reducedSpectrum(x, Fs: float, bins: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Magnitude spectrum (as magnitudeSpectrum) with at most given number of bins.
+    Power of neighbouring bins is summed (wider resolution bandwidth), so spectral lines keep their power.
+
+    Returns
+    -----
+    tuple (frequencies [Hz], magnitudes)
+    """
+    frequencies, spectrum = magnitudeSpectrum(x, Fs)
+    group = int(np.ceil(spectrum.size / bins))
+
+    if group == 1:
+        return frequencies, spectrum
+
+    # Last group is padded with zero power
+    padding = (-spectrum.size) % group
+    power = np.concatenate((spectrum**2, np.zeros(padding))).reshape(-1, group).sum(axis=1)
+    frequencies = np.concatenate((frequencies, frequencies[-1] + (frequencies[1] - frequencies[0]) * np.arange(1, padding + 1)))
+
+    return frequencies.reshape(-1, group).mean(axis=1), np.sqrt(power)
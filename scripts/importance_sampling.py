@@ -0,0 +1,224 @@
+"""
+Importance sampling estimation of very low bit error rates.
+
+Noise sources (ASE of amplifier, shot and thermal noise of photodiodes) are amplified by bias factor k,
+so errors occur often even with short symbol sequence. Every error is then weighted by likelihood ratio of true and biased noise.
+Noise at the decision point is taken as Gaussian (exact for linear coherent detection, approximation for square-law detection).
+Symbols pass thru the whole reciever DSP of simulation (decimation, dispersion compensation, timing recovery, equalizer, phase recovery),
+so the estimate belongs to the same reciever as counted errors of getValues (adaptive stages see biased noise).
+"""
+
+import numpy as np
+from optic.comm.modulation import GrayMapping, demodulateGray
+from optic.dsp.core import pnorm, signal_power
+
+from scripts.simulation import simulateTransmitter, simulateLink
+from scripts.simulation_parameters import asDict
+from scripts.alignment import estimateDelay
+from scripts.noise import seedRandom
+
+# Number of simulated symbols
+IS_SYMBOLS = 10**5
+# Target Q factor of biased simulation (~ 2e-2 symbol errors)
+BIASED_Q = 2
+
+def biasedLink(transmitterResults: dict, noiseScale: float, generalParameters: dict, sourceParameters: dict, channelParameters: dict,
+               recieverParameters: dict, amplifierParameters: dict | None, includeAmplifier: bool, seed: int) -> tuple[np.ndarray, int] | None:
+    """
+    Simulate channel and reciever with scaled noise sources.
+
+    Returns
+    -----
+    tuple (received symbols after reciever DSP (symbolsRx, one row per polarization), number of training symbols of equalizer)
+
+    None: signal power is too low for amplifier detection
+    """
+    recieverParameters = dict(recieverParameters, NoiseScale=noiseScale)
+    if includeAmplifier:
+        amplifierParameters = dict(amplifierParameters, NoiseScale=noiseScale)
+
+    # Same seed => noise realizations differ only in scale
+    seedRandom(seed)
+
+    linkResults = simulateLink(generalParameters, sourceParameters, channelParameters, recieverParameters, amplifierParameters, includeAmplifier, transmitterResults)
+
+    if linkResults.get("recieverSignal") is None:
+        return None
+
+    return np.atleast_2d(linkResults.get("symbolsRx")), linkResults.get("TrainingSymbols")
+
+
+def decisionNoise(symbols, referenceSymbols) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Normalizes symbols with statistics of noiseless reference symbols and separates noise at decision point.
+    Reciever normalizes power of symbols together with noise, so symbols are scaled to reference first (least squares).
+
+    Returns
+    -----
+    tuple (normalized symbols, noise, number of noise dimensions)
+    """
+    length = min(symbols.size, referenceSymbols.size)
+    symbols, referenceSymbols = symbols[:length], referenceSymbols[:length]
+
+    offset = referenceSymbols.mean()
+    scale = np.sqrt(signal_power(referenceSymbols - offset))
+
+    gain = np.real(np.vdot(referenceSymbols - offset, symbols - symbols.mean())) / scale**2 / length
+    symbols = (symbols - symbols.mean()) / gain / scale
+    noise = symbols - (referenceSymbols - offset) / scale
+
+    # Intensity detection gives real signal
+    dimensions = 2 if np.iscomplexobj(symbols) and np.any(symbols.imag) else 1
+
+    return symbols, noise, dimensions
+
+
+def automaticBias(noise, dimensions: int, modulationOrder: int, modulationFormat: str) -> float:
+    """
+    Selects bias factor so that biased simulation has Q factor around BIASED_Q.
+
+    Parameters
+    -----
+    noise: unbiased noise at decision point (normalized symbols)
+    """
+    const = pnorm(GrayMapping(modulationOrder, modulationFormat))
+
+    # Minimum distance of constellation points
+    distances = np.abs(const.reshape(-1, 1) - const.reshape(1, -1))
+    minDistance = distances[distances > 0].min()
+
+    sigma = np.sqrt(np.mean(np.abs(noise)**2) / dimensions)
+    if sigma == 0:
+        return 1.0
+
+    qFactor = minDistance / 2 / sigma
+
+    return max(1.0, qFactor / BIASED_Q)
+
+
+def delaySlices(referenceSymbols, symbolsTx) -> tuple[slice, slice]:
+    """
+    Delay of reciever DSP (dispersion compensation, equalizer, timing recovery) estimated from noiseless reference symbols of one polarization.
+
+    Returns
+    -----
+    tuple (slice of received symbols, slice of transmitted symbols) with the same length
+    """
+    delay, _ = estimateDelay(referenceSymbols, symbolsTx)
+    length = min(referenceSymbols.size - max(delay, 0), symbolsTx.size + min(delay, 0))
+
+    if delay >= 0:
+        return slice(delay, delay + length), slice(0, length)
+    else:
+        return slice(0, length), slice(-delay, -delay + length)
+
+
+def weightedErrors(biasedSymbols, referenceSymbols, symbolsTx, bitsTx, bias: float, modulationOrder: int, modulationFormat: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Bit and symbol errors of biased symbols of one polarization weighted by likelihood ratio.
+
+    Parameters
+    -----
+    biasedSymbols, referenceSymbols, symbolsTx, bitsTx: aligned symbols and bits of one polarization (see delaySlices)
+
+    Returns
+    -----
+    tuple (weighted bit errors related to bits per symbol, weighted symbol errors), one value per symbol
+    """
+    bitsPerSymbol = int(np.log2(modulationOrder))
+
+    biasedSymbols, noise, dimensions = decisionNoise(biasedSymbols, referenceSymbols)
+    symbolsTx, referenceSymbols = symbolsTx[:noise.size], referenceSymbols[:noise.size]
+
+    # Biased noise variance (per dimension) of every transmitted level (noise can depend on signal)
+    _, indexes = np.unique(np.round(symbolsTx, 8), return_inverse=True)
+    sigma2 = np.bincount(indexes, weights=np.abs(noise)**2) / np.bincount(indexes) / dimensions
+    sigma2 = sigma2[indexes]
+
+    # Likelihood ratio of true (variance sigma2/k^2) and biased (variance sigma2) Gaussian noise
+    weights = bias**dimensions * np.exp(-np.abs(noise)**2 / (2 * sigma2) * (bias**2 - 1))
+
+    # Decisions
+    const = GrayMapping(modulationOrder, modulationFormat)
+    Es = signal_power(const)
+    if dimensions == 1:
+        biasedSymbols = biasedSymbols.real
+    else:
+        # Constant phase rotation of channel (as in fastBERcalc)
+        biasedSymbols = biasedSymbols * np.exp(1j * np.angle(np.vdot(referenceSymbols, symbolsTx)))
+    bitsRx = demodulateGray(np.sqrt(Es) * biasedSymbols, modulationOrder, modulationFormat)
+
+    length = biasedSymbols.size * bitsPerSymbol
+    bitErrors = (bitsRx[:length] != bitsTx[:length]).reshape(-1, bitsPerSymbol).sum(axis=1)
+
+    return weights * bitErrors / bitsPerSymbol, weights * (bitErrors > 0)
+
+
+def importanceSamplingBER(generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict, recieverParameters: dict,
+                          amplifierParameters: dict | None = None, includeAmplifier: bool = False, bias: float | None = None,
+                          symbols: int = IS_SYMBOLS, seed: int = 321) -> dict | None:
+    """
+    Estimates BER and SER with importance sampling (variance scaling of noise sources).
+
+    Parameters
+    -----
+    bias: noise amplitude multiplier k (None = selected automatically from unbiased run)
+
+    symbols: number of simulated symbols
+
+    Returns
+    -----
+    dictionary: BER, SER, RelativeError (standard error of BER related to BER), Bias
+
+    Dual polarization: BER and SER are means of both polarizations.
+
+    None: signal power is too low for amplifier detection
+    """
+    generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters = [
+        asDict(parameters) for parameters in (generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters)]
+
+    generalParameters = dict(generalParameters, Symbols=symbols)
+    modulationOrder = generalParameters.get("Order")
+    modulationFormat = generalParameters.get("Format")
+    bitsPerSymbol = int(np.log2(modulationOrder))
+
+    seedRandom(123)
+    transmitterResults = simulateTransmitter(generalParameters, sourceParameters, modulatorParameters)
+
+    # One row per polarization
+    symbolsTx = np.atleast_2d(transmitterResults.get("symbolsTx"))
+    bitsTx = transmitterResults.get("bitsTx").reshape(symbolsTx.shape[0], -1)
+
+    linkArguments = (generalParameters, sourceParameters, channelParameters, recieverParameters, amplifierParameters, includeAmplifier, seed)
+
+    # Noiseless reference
+    referenceLink = biasedLink(transmitterResults, 0, *linkArguments)
+    if referenceLink is None:
+        return None
+
+    # Training symbols of equalizer aren't counted (as in getValues)
+    referenceSymbols, training = referenceLink
+    referenceSymbols = referenceSymbols[:, training:]
+    symbolsTx, bitsTx = symbolsTx[:, training:], bitsTx[:, training * bitsPerSymbol:]
+
+    slices = [delaySlices(reference, transmitted) for reference, transmitted in zip(referenceSymbols, symbolsTx)]
+
+    # Bias factor from unbiased simulation
+    if bias is None:
+        unbiasedSymbols = biasedLink(transmitterResults, 1, *linkArguments)[0][:, training:]
+        rows = [decisionNoise(unbiased[rx], reference[rx]) for unbiased, reference, (rx, _) in zip(unbiasedSymbols, referenceSymbols, slices)]
+        bias = automaticBias(np.concatenate([noise for _, noise, _ in rows]), rows[0][2], modulationOrder, modulationFormat)
+
+    biasedSymbols = biasedLink(transmitterResults, bias, *linkArguments)[0][:, training:]
+
+    errors = [weightedErrors(biased[rx], reference[rx], transmitted[tx], bits[tx.start * bitsPerSymbol:tx.stop * bitsPerSymbol], bias,
+                             modulationOrder, modulationFormat)
+              for biased, reference, transmitted, bits, (rx, tx) in zip(biasedSymbols, referenceSymbols, symbolsTx, bitsTx, slices)]
+
+    weightedBitErrors = np.concatenate([bitErrors for bitErrors, _ in errors])
+    ber = weightedBitErrors.mean()
+    ser = np.concatenate([symbolErrors for _, symbolErrors in errors]).mean()
+
+    relativeError = weightedBitErrors.std() / np.sqrt(weightedBitErrors.size) / ber if ber > 0 else np.inf
+
+    return {"BER":ber, "SER":ser, "RelativeError":relativeError, "Bias":bias}
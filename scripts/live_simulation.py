@@ -0,0 +1,204 @@
+"""
+Continuous simulation in blocks for live mode (oscilloscope).
+Blocks are simulated on background thread and reduced to data of live plots (traces, eye and constellation histograms).
+Only the latest processed block is kept, so memory doesn't grow with time.
+"""
+
+import queue
+import threading
+import numpy as np
+
+from scripts.simulation import simulateTransmitter, simulateLink, getValues, recieverRate
+from scripts.simulation_parameters import asDict
+from scripts.noise import localNoise
+
+# Number of symbols of one block
+LIVE_SYMBOLS = 2**12
+# Number of symbols shown in time plots
+TRACE_SYMBOLS = 32
+# Number of bins of histogram axes (eye amplitude, constellation real and imaginary part)
+HISTOGRAM_BINS = 100
+# Range of normalized amplitude in eye diagram and electrical plots [standard deviations]
+EYE_RANGE = 3
+# Range of normalized symbols in constellation histogram
+CONSTELLATION_RANGE = 1.6
+
+def firstPolarization(signal) -> np.ndarray:
+    """
+    Signal of X polarization (dual polarization signals are arrays (2, N)).
+    """
+    return signal[0] if signal.ndim == 2 else signal
+
+
+def normalizedSignal(signal) -> np.ndarray:
+    """
+    Real part of signal without DC level related to its standard deviation.
+    """
+    signal = np.real(signal)
+    deviation = np.std(signal)
+
+    return (signal - signal.mean()) / deviation if deviation > 0 else signal - signal.mean()
+
+
+def eyeHistogram(signal, SpS: int, bins: int = HISTOGRAM_BINS) -> np.ndarray:
+    """
+    Eye diagram density. Normalized signal is folded into two signaling intervals.
+
+    Returns
+    -----
+    histogram (amplitude bins, 2 SpS)
+    """
+    signal = normalizedSignal(signal)
+    positions = np.arange(signal.size) % (2 * SpS)
+
+    histogram, _, _ = np.histogram2d(signal, positions, bins=(bins, 2 * SpS), range=((-EYE_RANGE, EYE_RANGE), (0, 2 * SpS)))
+
+    return histogram
+
+
+def constellationHistogram(symbols, bins: int = HISTOGRAM_BINS) -> np.ndarray:
+    """
+    Constellation density of normalized symbols.
+
+    Returns
+    -----
+    histogram (imaginary part bins, real part bins)
+    """
+    limits = (-CONSTELLATION_RANGE, CONSTELLATION_RANGE)
+
+    histogram, _, _ = np.histogram2d(np.imag(symbols), np.real(symbols), bins=bins, range=(limits, limits))
+
+    return histogram
+
+
+def processBlock(simulationResults: dict, generalParameters: dict) -> dict:
+    """
+    Reduces simulation results of one block to data of live plots.
+
+    Returns
+    -----
+    electricalTx, electricalRx (normalized traces), opticalTx, opticalRx (power traces related to mean power),
+    eye (eye histogram of detected signal), constellation (histogram of Rx symbols), Values (getValues output)
+    """
+    SpS = generalParameters.get("SpS")
+    samples = TRACE_SYMBOLS * SpS
+    # Detected signal is sampled with samples per symbol of reciever DSP
+    recieverSpS = recieverRate(generalParameters).get("SpS")
+
+    modulationSignal, detectedSignal, modulatedSignal, recieverSignal, symbolsRx = [firstPolarization(simulationResults.get(key))
+        for key in ("modulationSignal", "detectedSignal", "modulatedSignal", "recieverSignal", "symbolsRx")]
+
+    frame = {"electricalTx":normalizedSignal(modulationSignal)[:samples], "electricalRx":normalizedSignal(detectedSignal)[:TRACE_SYMBOLS * recieverSpS]}
+
+    for key, signal in (("opticalTx", modulatedSignal), ("opticalRx", recieverSignal)):
+        power = np.abs(signal)**2
+        meanPower = power.mean()
+        frame.update({key:(power / meanPower if meanPower > 0 else power)[:samples]})
+
+    frame.update({"eye":eyeHistogram(detectedSignal, recieverSpS), "constellation":constellationHistogram(symbolsRx)})
+    frame.update({"Values":getValues(simulationResults, generalParameters)})
+
+    return frame
+
+
+class LiveSimulation:
+    """
+    Background worker which simulates blocks of symbols until it is stopped.
+    Parameters are read before every block, so their changes apply on the next block. Random numbers continue from block to block.
+
+    Parameters
+    -----
+    getParameters: function returning current parameters
+        (generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters, includeAmplifier)
+
+    symbols: number of symbols of one block
+    """
+    def __init__(self, getParameters, symbols: int = LIVE_SYMBOLS):
+        self.getParameters = getParameters
+        self.symbols = symbols
+
+        # Only the latest frame
+        self.frames = queue.Queue(maxsize=1)
+        self.stopEvent = threading.Event()
+        self.thread = threading.Thread(target=self.run)
+
+
+    def start(self):
+        self.thread.start()
+
+
+    def stop(self):
+        """
+        Stops worker after current block.
+        """
+        self.stopEvent.set()
+
+
+    def run(self):
+        """
+        Loop of worker thread.
+        """
+        # Noise of the next block is generated while current block is processed (blocks have the same shapes)
+        localNoise().prefetch = True
+        block = 0
+
+        while not self.stopEvent.is_set():
+            try:
+                frame = self.simulateBlock()
+            except Exception as exception:
+                frame = {"Error":str(exception)}
+                # Wait for another parameters
+                self.stopEvent.wait(0.5)
+
+            frame.update({"Block":block})
+            self.publish(frame)
+            block += 1
+
+
+    def simulateBlock(self) -> dict:
+        """
+        Simulates one block with current parameters.
+
+        Returns
+        -----
+        frame of live plots (processBlock) or dictionary with "Error" key
+        """
+        generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters, includeAmplifier = self.getParameters()
+
+        generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters = [
+            asDict(parameters) for parameters in (generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters)]
+        generalParameters = dict(generalParameters, Symbols=self.symbols)
+
+        simulationResults = simulateTransmitter(generalParameters, sourceParameters, modulatorParameters)
+        simulationResults.update(simulateLink(generalParameters, sourceParameters, channelParameters, recieverParameters, amplifierParameters, includeAmplifier, simulationResults))
+
+        if simulationResults.get("recieverSignal") is None:
+            return {"Error":"Signal power is too low to be detected by amplifier !"}
+
+        return processBlock(simulationResults, generalParameters)
+
+
+    def publish(self, frame: dict):
+        """
+        Replaces unread frame with new one.
+        """
+        try:
+            self.frames.get_nowait()
+        except queue.Empty:
+            pass
+
+        self.frames.put(frame)
+
+
+    def latestFrame(self) -> dict | None:
+        """
+        Returns
+        -----
+        the latest unread frame
+
+        None: no new frame
+        """
+        try:
+            return self.frames.get_nowait()
+        except queue.Empty:
+            return None
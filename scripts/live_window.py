@@ -0,0 +1,196 @@
+"""
+Popup window of live mode (oscilloscope). Plots are refreshed with frames of continuously running simulation.
+"""
+
+import numpy as np
+import customtkinter as ctk
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+from scripts.live_simulation import LiveSimulation, TRACE_SYMBOLS, EYE_RANGE, CONSTELLATION_RANGE, HISTOGRAM_BINS
+
+# Refresh rate of plots [frames/s]
+LIVE_FPS = 20
+# Weight of older blocks in eye and constellation densities (persistence of screen)
+PERSISTENCE = 0.8
+
+class LiveWindow:
+    """
+    Class to creates popup window with live plots (electrical and optical signals in time, eye diagram and constellation densities).
+    Figure is created once, plots are updated by changing data of existing artists and blitting them on saved background.
+
+    Parameters
+    ----
+    getParameters: function returning current parameters (see LiveSimulation)
+    """
+    def __init__(self, title: str, getParameters):
+        self.title = title
+        self.running = True
+        self.background = None
+        # Eye diagram and constellation densities (with persistence)
+        self.densities = {"eye":None, "constellation":None}
+
+        # GUI
+
+        self.popup = ctk.CTkToplevel()
+        self.popup.geometry("1000x800")
+        self.popup.minsize(1000,800)
+        self.popup.title(self.title)
+        self.popup.after(100, self.popup.lift)
+        self.popup.bind("<Destroy>", self.onDestroy)
+
+        generalFont = ("Helvetica", 16, "bold")
+        headFont = ("Helvetica", 24, "bold")
+
+        # Title
+        self.titleLabel = ctk.CTkLabel(self.popup, text=self.title, font=headFont)
+        self.titleLabel.pack(padx=20, pady=10)
+
+        # Block number and values
+        self.statusLabel = ctk.CTkLabel(self.popup, text="Waiting for first block", font=generalFont)
+        self.statusLabel.pack(padx=20, pady=5)
+
+        self.createFigure()
+        self.canvas = FigureCanvasTkAgg(figure=self.figure, master=self.popup)
+        self.canvas.mpl_connect("draw_event", self.onDraw)
+        self.canvas.draw()
+        self.canvas.get_tk_widget().pack(padx=10, pady=10, fill="both", expand=True)
+
+        # Other
+
+        self.closeButton = ctk.CTkButton(self.popup, text="Close", command=self.closePopup, font=generalFont)
+        self.closeButton.pack(padx=20, pady=10)
+
+        # Simulation
+        self.simulation = LiveSimulation(getParameters)
+        self.simulation.start()
+
+        self.popup.after(int(1000 / LIVE_FPS), self.refresh)
+
+
+
+    # Methods
+
+    def createFigure(self):
+        """
+        Creates figure with all artists. Animated artists aren't part of saved background.
+        """
+        self.figure = Figure(figsize=(10, 7))
+        (electricalAxes, opticalAxes), (eyeAxes, constellationAxes) = self.figure.subplots(2, 2)
+
+        time = np.zeros(0)
+
+        electricalAxes.set_title("Electrical signals")
+        electricalAxes.set_xlim(0, TRACE_SYMBOLS)
+        electricalAxes.set_ylim(-EYE_RANGE, EYE_RANGE)
+        electricalAxes.set_xlabel("Time [symbols]")
+        electricalAxes.set_ylabel("Normalized amplitude")
+        self.electricalTx, = electricalAxes.plot(time, time, label="Tx", animated=True)
+        self.electricalRx, = electricalAxes.plot(time, time, label="Rx", animated=True)
+        electricalAxes.legend(loc="upper right")
+
+        opticalAxes.set_title("Optical signals")
+        opticalAxes.set_xlim(0, TRACE_SYMBOLS)
+        opticalAxes.set_ylim(0, 4)
+        opticalAxes.set_xlabel("Time [symbols]")
+        opticalAxes.set_ylabel("Power / mean power")
+        self.opticalTx, = opticalAxes.plot(time, time, label="Tx", animated=True)
+        self.opticalRx, = opticalAxes.plot(time, time, label="Rx", animated=True)
+        opticalAxes.legend(loc="upper right")
+
+        eyeAxes.set_title("Eye diagram (Rx)")
+        eyeAxes.set_xlabel("Time [symbols]")
+        eyeAxes.set_ylabel("Normalized amplitude")
+        self.eyeImage = eyeAxes.imshow(np.zeros((HISTOGRAM_BINS, 2)), extent=(0, 2, -EYE_RANGE, EYE_RANGE), origin="lower", aspect="auto",
+                                       cmap="turbo", vmin=0, vmax=1, interpolation="bilinear", animated=True)
+
+        constellationAxes.set_title("Constellation diagram (Rx)")
+        constellationAxes.set_xlabel("In-phase")
+        constellationAxes.set_ylabel("Quadrature")
+        limits = (-CONSTELLATION_RANGE, CONSTELLATION_RANGE)
+        self.constellationImage = constellationAxes.imshow(np.zeros((HISTOGRAM_BINS, HISTOGRAM_BINS)), extent=limits + limits, origin="lower",
+                                                           cmap="turbo", vmin=0, vmax=1, animated=True)
+
+        self.figure.tight_layout()
+
+        self.artists = [self.electricalTx, self.electricalRx, self.opticalTx, self.opticalRx, self.eyeImage, self.constellationImage]
+
+
+    def onDraw(self, event):
+        """
+        Saves background after full redraw of figure (first draw, resize) and draws animated artists on it.
+        """
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.drawArtists()
+
+
+    def drawArtists(self):
+        for artist in self.artists:
+            self.figure.draw_artist(artist)
+
+
+    def refresh(self):
+        """
+        Updates plots with the latest frame (called with fixed frame rate).
+        """
+        if not self.running:
+            return
+
+        frame = self.simulation.latestFrame()
+
+        if frame is not None:
+            self.updateArtists(frame)
+
+            if self.background is not None:
+                self.canvas.restore_region(self.background)
+                self.drawArtists()
+                self.canvas.blit(self.figure.bbox)
+
+        self.popup.after(int(1000 / LIVE_FPS), self.refresh)
+
+
+    def updateArtists(self, frame: dict):
+        """
+        Changes data of artists and status label.
+        """
+        if "Error" in frame:
+            self.statusLabel.configure(text=f"Block {frame.get('Block')}: {frame.get('Error')}")
+            return
+
+        values = frame.get("Values")
+        self.statusLabel.configure(text=f"Block {frame.get('Block')}:   BER {values.get('BER'):.3}   SER {values.get('SER'):.3}   SNR {values.get('SNR'):.3} dB")
+
+        for line, key in ((self.electricalTx, "electricalTx"), (self.electricalRx, "electricalRx"), (self.opticalTx, "opticalTx"), (self.opticalRx, "opticalRx")):
+            trace = frame.get(key)
+            line.set_data(np.arange(trace.size) * TRACE_SYMBOLS / max(trace.size, 1), trace)
+
+        for image, key in ((self.eyeImage, "eye"), (self.constellationImage, "constellation")):
+            histogram = frame.get(key)
+            density = self.densities.get(key)
+
+            # New block is added to decayed density (shape changes with samples per symbol)
+            if density is None or density.shape != histogram.shape:
+                density = histogram / max(histogram.max(), 1)
+            else:
+                density = PERSISTENCE * density + (1 - PERSISTENCE) * histogram / max(histogram.max(), 1)
+            self.densities.update({key:density})
+
+            image.set_data(density / max(density.max(), 1e-12))
+
+
+    def onDestroy(self, event):
+        """
+        Stops simulation when window is destroyed (also by closing main window).
+        """
+        if event.widget is self.popup:
+            self.running = False
+            self.simulation.stop()
+
+
+    def closePopup(self):
+        """
+        Closes popup window.
+        """
+        self.running = False
+        self.simulation.stop()
+        self.popup.destroy()
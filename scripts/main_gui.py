@@ -10,8 +10,12 @@ import matplotlib.pyplot as plt
 from scripts.help_gui import Help
 from scripts.parameters_window import ParametersWindow
 from scripts.plots_window import PlotWindow
+from scripts.live_window import LiveWindow
 from scripts.tooltip import ToolTip
-from scripts.simulation import simulate, getValues, getPlot
+from scripts.simulation import getPlot
+from scripts.simulation_parameters import SimulationConfig
+from scripts.run_ledger import RunLedger
+from scripts.sampling_policy import adaptiveSpS, adaptiveRxSpS
 from scripts.parameters_functions import convertNumber
 
 class GUI(ctk.CTk):
@@ -49,6 +53,12 @@ class GUI(ctk.CTk):
         # Simulation results variables
         self.plots = {}
         self.simulationResults = None
+        # Ledger of past runs (already computed configuration isn't simulated again)
+        # Lean results keep only data of plots, so full signals aren't held in memory
+        self.ledger = RunLedger(lean=True)
+
+        # State of amplifier checkbutton readable from live mode thread (tkinter variables are not thread safe)
+        self.includeAmplifier = False
 
 
         ### GUI
@@ -109,6 +119,14 @@ class GUI(ctk.CTk):
         self.symbolRateEntry.grid(row=2, column=2, padx=5, pady=10)
         self.symbolRateCombobox.grid(row=2, column=3, padx=10, pady=10)
 
+        # Samples per symbol settings (Auto = lowest oversampling for signal bandwidth, faster but noise bandwidth follows Fs,
+        # so results differ from default 8)
+        self.spsLabel = ctk.CTkLabel(generalHelpFrame, text="Samples per symbol", font=generalFont)
+        self.spsCombobox = ctk.CTkComboBox(generalHelpFrame, values=["Auto", "2", "4", "8", "16", "32"], state="readonly", font=generalFont)
+        self.spsCombobox.set("8")
+        self.spsLabel.grid(row=1, column=4, padx=10, pady=10)
+        self.spsCombobox.grid(row=2, column=4, padx=10, pady=10)
+
         
         # Scheme frame
 
@@ -192,9 +210,14 @@ class GUI(ctk.CTk):
         self.simulateButton = ctk.CTkButton(otherFrame, text="Simulate", command=self.startSimulation, font=generalFont)
         self.simulateButton.grid(row=0, column=0, padx=10, pady=10)
 
+        # Live mode
+        self.liveButton = ctk.CTkButton(otherFrame, text="Live mode", command=self.startLive, font=generalFont)
+        self.liveButton.grid(row=0, column=1, padx=10, pady=10)
+        ToolTip(self.liveButton, "Simulation runs continuously in blocks and plots are refreshed, changes of parameters apply on the next block")
+
         # Quit
         self.optionsQuitButton = ctk.CTkButton(otherFrame, text="Quit", command=self.terminateApp, font=generalFont)
-        self.optionsQuitButton.grid(row=0, column=1, padx=10, pady=10)
+        self.optionsQuitButton.grid(row=0, column=2, padx=10, pady=10)
 
 
         ### OUTPUTS TAB
@@ -333,12 +356,17 @@ class GUI(ctk.CTk):
         # Clear plots for new simulation (othervise old graphs could be shown)
         self.plots.clear()
 
-        # Simulation
-        self.simulationResults = simulate(self.generalParameters, self.sourceParameters, self.modulatorParameters,
-                                           self.channelParameters, self.recieverParameters, self.amplifierParameters, self.amplifierCheckVar.get())
-        
+        # Simulation (stored run is taken from ledger)
+        config = SimulationConfig.fromDicts(self.generalParameters, self.sourceParameters, self.modulatorParameters, self.channelParameters,
+                                            self.recieverParameters, self.amplifierParameters, self.amplifierCheckVar.get())
+        record, self.simulationResults = self.ledger.run(config)
+
+        # Arrays of stored run
+        if record.get("Cached"):
+            self.simulationResults = self.ledger.loadResults(record)
+
         # Signal power is too low for amplifier detection
-        if self.simulationResults.get("recieverSignal") is None:
+        if record.get("Values") is None:
             messagebox.showerror("Simulation error", "Signal power is too low to be detected by amplifier !")
             # Clear simulation results
             self.simulationResults = None
@@ -347,16 +375,44 @@ class GUI(ctk.CTk):
         # Simulation was successful
         else:
             # Show numeric values
-            outputValues = getValues(self.simulationResults, self.generalParameters)
-            self.showValues(outputValues)
+            self.showValues(record.get("Values"))
+
+            if record.get("Cached"):
+                messagebox.showinfo("Simulation status", "Results of the same simulation were loaded from ledger")
+            else:
+                messagebox.showinfo("Simulation status", "Simulation successfully completed")
 
-            messagebox.showinfo("Simulation status", "Simulation successfully completed")
+
+    def startLive(self):
+        """
+        Start of live mode (continuous simulation with refreshed plots in popup window).
+        """
+        # Get values of general parameters
+        if not self.updateGeneralParameters(): return
+
+        # Not all parameters provided
+        if not self.checkParameters(): return
+
+        # Sampling frequency error
+        if not self.checkSamplingFrequency(): return
+
+        LiveWindow("Live simulation", self.getLiveParameters)
+
+
+    def getLiveParameters(self) -> tuple:
+        """
+        Copies of current parameters for next block of live mode (called from simulation thread).
+        """
+        return (dict(self.generalParameters), dict(self.sourceParameters), dict(self.modulatorParameters), dict(self.channelParameters),
+                dict(self.recieverParameters), dict(self.amplifierParameters), self.includeAmplifier)
 
 
     def amplifierCheckbuttonChange(self):
         """
         Including / exluding amplifier from the setting scheme.
         """
+        self.includeAmplifier = self.amplifierCheckVar.get()
+
         # Include amplifier
         if self.amplifierCheckVar.get():
             amplifierPosition = self.amplifierParameters.get("Position")
@@ -443,6 +499,7 @@ class GUI(ctk.CTk):
         self.mOrderCombobox.configure(state="disable")
         self.symbolRateEntry.configure(state="disable")
         self.symbolRateCombobox.configure(state="disable")
+        self.spsCombobox.configure(state="disable")
         
         self.amplifierCheckbutton.configure(state="disabled")
 
@@ -464,6 +521,7 @@ class GUI(ctk.CTk):
         self.mOrderCombobox.configure(state="readonly")
         self.symbolRateEntry.configure(state="normal")
         self.symbolRateCombobox.configure(state="readonly")
+        self.spsCombobox.configure(state="readonly")
 
         self.amplifierCheckbutton.configure(state="normal")
 
@@ -587,6 +645,16 @@ class GUI(ctk.CTk):
 
         # Check symbol rate
         if self.checkSymbolRate():
+            # Samples per symbol (automatic or selected)
+            if self.spsCombobox.get() == "Auto":
+                SpS = adaptiveSpS(self.generalParameters, self.sourceParameters, self.channelParameters, self.recieverParameters)
+                # Detected signal is decimated for reciever DSP
+                recieverSpS = adaptiveRxSpS(self.generalParameters, self.sourceParameters, self.channelParameters, self.recieverParameters, SpS)
+                self.generalParameters.update({"SpS":SpS, "RxSpS":recieverSpS, "AutoSpS":True})
+            else:
+                SpS = int(self.spsCombobox.get())
+                self.generalParameters.update({"SpS":SpS, "RxSpS":SpS, "AutoSpS":False})
+
             self.generalParameters.update({"Fs":self.generalParameters.get("SpS") * self.generalParameters.get("Rs")})
             self.generalParameters.update({"Ts":1 / self.generalParameters.get("Fs")})
             return True
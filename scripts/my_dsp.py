@@ -0,0 +1,647 @@
+"""
+Digital signal processing stages of reciever.
+Stages work on whole signals or on streamed blocks of signal.
+"""
+
+import numpy as np
+import scipy.constants as const
+from fractions import Fraction
+from scipy.signal import resample_poly
+from numpy.lib.stride_tricks import sliding_window_view
+from optic.comm.modulation import GrayMapping
+from optic.dsp.core import pnorm, signal_power
+
+from scripts.fft_backend import fft, ifft, angularFrequencies, cachedArray
+
+# Minimal FFT size of overlap-save blocks
+MIN_BLOCK_FFT = 1024
+
+def dispersionMemory(Fs: float, length: float, dispersion: float, frequency: float) -> int:
+    """
+    Calculates number of samples affected by chromatic dispersion (length of dispersion impulse response).
+
+    Parameters
+    -----
+    Fs: sampling frequency [Hz]
+
+    length: fiber length [km]
+
+    dispersion: [ps/nm/km]
+
+    frequency: central frequency [Hz]
+    """
+    wavelength = const.c / frequency
+    # Spectral width of simulated band [nm]
+    bandwidth = wavelength**2 / const.c * Fs * 10**9
+    # Pulse spreading [s]
+    spreading = abs(dispersion) * length * bandwidth * 10**-12
+
+    return int(np.ceil(spreading * Fs)) + 1
+
+
+@cachedArray
+def dispersionCompensationFilter(nfft: int, Fs: float, length: float, dispersion: float, frequency: float) -> np.ndarray:
+    """
+    Frequency response of chromatic dispersion compensation (inverse of fiber dispersion). Cached for repeated use.
+
+    Returns
+    -----
+    transfer function (nfft samples in FFT order)
+    """
+    c_kms = const.c / 1e3
+    wavelength = c_kms / frequency
+    beta2 = -(dispersion * wavelength**2) / (2 * np.pi * c_kms)
+
+    omega = angularFrequencies(nfft, Fs)
+
+    transferFunction = np.exp(-1j * (beta2 / 2) * omega**2 * length)
+    transferFunction.flags.writeable = False
+
+    return transferFunction
+
+
+class CDCompensator:
+    """
+    Frequency domain chromatic dispersion compensation with overlap-save method.
+    Signal can be processed at once or in streamed blocks (output has the same total length as input).
+
+    Parameters
+    -----
+    Fs: sampling frequency [Hz]
+
+    length: fiber length [km]
+
+    dispersion: [ps/nm/km]
+
+    frequency: central frequency [Hz]
+
+    nfft: Optional. FFT size of blocks (default is based on dispersion memory)
+    """
+    def __init__(self, Fs: float, length: float, dispersion: float, frequency: float, nfft: int | None = None):
+        memory = dispersionMemory(Fs, length, dispersion, frequency)
+        # Overlap is discarded half at the start, half at the end of every block
+        # (twice the memory => tails of impulse response are also covered)
+        self.overlap = 2 * memory
+
+        if nfft is None:
+            nfft = max(MIN_BLOCK_FFT, int(2**np.ceil(np.log2(4 * self.overlap))))
+        elif nfft <= self.overlap:
+            raise Exception("Unexpected error")
+
+        self.nfft = nfft
+        self.step = nfft - self.overlap
+        self.transferFunction = dispersionCompensationFilter(nfft, Fs, length, dispersion, frequency)
+
+        # Input waiting for processing (starts with half overlap of zeros)
+        self.buffer = np.zeros(self.overlap // 2, dtype=complex)
+        self.inputLength = 0
+        self.outputLength = 0
+
+    def process(self, block) -> np.ndarray:
+        """
+        Process next block of signal.
+
+        Returns
+        -----
+        compensated samples available so far (output is delayed by half of the overlap)
+        """
+        self.inputLength += block.size
+        self.buffer = np.concatenate((self.buffer, block))
+
+        return self.processBuffer()
+
+    def flush(self) -> np.ndarray:
+        """
+        Process rest of the signal (end of stream).
+
+        Returns
+        -----
+        remaining compensated samples
+        """
+        # Zeros so that the last samples reach the middle of a block
+        half = self.overlap // 2
+        padding = half + (-(self.buffer.size + half - self.overlap)) % self.step
+        self.buffer = np.concatenate((self.buffer, np.zeros(padding, dtype=complex)))
+
+        output = self.processBuffer()
+        output = output[:self.inputLength - self.outputLength + output.size]
+        self.outputLength = self.inputLength
+
+        return output
+
+    def processBuffer(self) -> np.ndarray:
+        """
+        Filters all complete blocks of buffer at once.
+        """
+        blocksNumber = (self.buffer.size - self.overlap) // self.step
+
+        if blocksNumber <= 0:
+            return np.zeros(0, dtype=complex)
+
+        # All blocks (overlapping views) filtered with one FFT call
+        blocks = sliding_window_view(self.buffer, self.nfft)[::self.step][:blocksNumber]
+        filtered = ifft(fft(blocks, axis=1) * self.transferFunction, axis=1)
+
+        half = self.overlap // 2
+        output = filtered[:, half:half + self.step].reshape(-1)
+
+        self.buffer = self.buffer[blocksNumber * self.step:]
+        self.outputLength += output.size
+
+        return output
+
+
+def cdCompensation(signal, Fs: float, length: float, dispersion: float, frequency: float) -> np.ndarray:
+    """
+    Compensates chromatic dispersion of whole signal.
+
+    Parameters
+    -----
+    Fs: sampling frequency [Hz]
+
+    length: fiber length [km]
+
+    dispersion: [ps/nm/km]
+
+    frequency: central frequency [Hz]
+    """
+    compensator = CDCompensator(Fs, length, dispersion, frequency)
+
+    return np.concatenate((compensator.process(signal), compensator.flush()))
+
+
+# Number of symbols averaged by carrier phase recovery
+CPR_WINDOW = 65
+# Number of test phases of blind phase search
+BPS_TEST_PHASES = 32
+
+def windowSums(values, half: int) -> np.ndarray:
+    """
+    Sums of values over sliding windows [i - half, i + half] (cumulative sums => linear complexity).
+    Windows are shortened at the edges of the array.
+    """
+    cumulative = np.cumsum(values, dtype=np.result_type(values, np.float64))
+    # Cumulative sums with clipped indexes (zeros before start, last sum after end)
+    padded = np.concatenate((np.zeros(half + 1, dtype=cumulative.dtype), cumulative, np.full(half, cumulative[-1])))
+
+    return padded[2 * half + 1:] - padded[:values.size]
+
+
+def nearestQAM(symbols, modulationOrder: int) -> np.ndarray:
+    """
+    Nearest points of square QAM constellation (unit average power) found by rounding (without distances to all points).
+    """
+    scale = np.sqrt(signal_power(GrayMapping(modulationOrder, "qam")))
+    limit = np.sqrt(modulationOrder) - 1
+
+    def nearestLevel(values):
+        # Nearest odd integer in range of levels
+        return np.clip(2 * np.round((values - 1) / 2) + 1, -limit, limit)
+
+    symbols = symbols * scale
+
+    return (nearestLevel(symbols.real) + 1j * nearestLevel(symbols.imag)) / scale
+
+
+def viterbiViterbi(symbols, modulationOrder: int, half: int) -> np.ndarray:
+    """
+    Estimates carrier phase of PSK symbols with Viterbi-Viterbi algorithm (M-th power removes modulation).
+
+    Returns
+    -----
+    phase estimates in range (-pi/M, pi/M) (not unwrapped)
+    """
+    # Phase of constellation point after M-th power
+    reference = pnorm(GrayMapping(modulationOrder, "psk"))[0]**modulationOrder
+
+    sums = windowSums(symbols**modulationOrder, half)
+
+    return np.angle(sums * np.conj(reference)) / modulationOrder
+
+
+def blindPhaseSearch(symbols, modulationOrder: int, half: int, testPhases: int = BPS_TEST_PHASES) -> np.ndarray:
+    """
+    Estimates carrier phase of square QAM symbols with blind phase search.
+    Every test phase is evaluated for all symbols at once, so memory use is linear in number of symbols.
+
+    Returns
+    -----
+    phase estimates in range [-pi/4, pi/4) (not unwrapped)
+    """
+    phases = np.arange(testPhases) / testPhases * np.pi / 2 - np.pi / 4
+    limit = np.float32(np.sqrt(modulationOrder) - 1)
+
+    # Symbols in units of constellation levels (odd integers)
+    # Distances are calculated in single precision (window sums are accumulated in double precision)
+    symbols = symbols * np.sqrt(signal_power(GrayMapping(modulationOrder, "qam")))
+    real, imag = symbols.real.astype(np.float32), symbols.imag.astype(np.float32)
+
+    # Work arrays (reused for every test phase)
+    rotated = np.empty(symbols.size, dtype=np.float32)
+    level = np.empty(symbols.size, dtype=np.float32)
+    distance = np.empty(symbols.size, dtype=np.float32)
+
+    def addDistance(values, out):
+        # Squared distance to nearest level (odd integer in range of levels)
+        np.subtract(values, 1, out=level)
+        np.multiply(level, 0.5, out=level)
+        np.round(level, out=level)
+        np.multiply(level, 2, out=level)
+        np.add(level, 1, out=level)
+        np.clip(level, -limit, limit, out=level)
+        np.subtract(values, level, out=level)
+        np.multiply(level, level, out=level)
+        np.add(out, level, out=out)
+
+    bestDistance = np.full(symbols.size, np.inf)
+    bestPhase = np.zeros(symbols.size)
+
+    for phase in phases:
+        cos, sin = np.float32(np.cos(phase)), np.float32(np.sin(phase))
+        distance.fill(0)
+
+        # Real part of rotated symbols
+        np.multiply(real, cos, out=rotated)
+        rotated += imag * sin
+        addDistance(rotated, distance)
+        # Imaginary part of rotated symbols
+        np.multiply(imag, cos, out=rotated)
+        rotated -= real * sin
+        addDistance(rotated, distance)
+
+        windowDistance = windowSums(distance, half)
+
+        better = windowDistance < bestDistance
+        np.copyto(bestDistance, windowDistance, where=better)
+        np.copyto(bestPhase, phase, where=better)
+
+    return bestPhase
+
+
+class CarrierPhaseRecovery:
+    """
+    Carrier phase recovery of symbols (Viterbi-Viterbi for PSK, blind phase search for QAM).
+    Signal can be processed at once or in streamed blocks (output has the same total length as input).
+
+    Parameters
+    -----
+    modulationOrder: order of modulation
+
+    modulationFormat: "psk" / "qam"
+
+    window: number of symbols used for one phase estimate (odd)
+    """
+    def __init__(self, modulationOrder: int, modulationFormat: str, window: int = CPR_WINDOW):
+        if modulationFormat == "psk":
+            self.period = 2 * np.pi / modulationOrder
+        elif modulationFormat == "qam":
+            self.period = np.pi / 2
+        else: raise Exception("Unexpected error")
+
+        self.modulationOrder = modulationOrder
+        self.modulationFormat = modulationFormat
+        self.half = window // 2
+
+        # Symbols waiting for processing and number of already processed symbols at their start (history for windows)
+        self.buffer = np.zeros(0, dtype=complex)
+        self.history = 0
+        # Last output phase (unwrapping continues between blocks)
+        self.lastPhase = None
+
+    def process(self, block) -> np.ndarray:
+        """
+        Process next block of symbols.
+
+        Returns
+        -----
+        symbols with removed phase noise available so far (output is delayed by half of the window)
+        """
+        self.buffer = np.concatenate((self.buffer, block))
+
+        return self.processBuffer(self.buffer.size - self.half)
+
+    def flush(self) -> np.ndarray:
+        """
+        Process rest of symbols (end of stream).
+
+        Returns
+        -----
+        remaining symbols with removed phase noise
+        """
+        return self.processBuffer(self.buffer.size)
+
+    def processBuffer(self, end: int) -> np.ndarray:
+        """
+        Removes phase noise of buffered symbols up to the end index (end index has whole window in buffer).
+        """
+        if end <= self.history:
+            return np.zeros(0, dtype=complex)
+
+        if self.modulationFormat == "psk":
+            phase = viterbiViterbi(self.buffer, self.modulationOrder, self.half)
+        else:
+            phase = blindPhaseSearch(self.buffer, self.modulationOrder, self.half)
+
+        phase = phase[self.history:end]
+
+        # Removes jumps of estimates between ambiguous phases (continuous with previous block)
+        if self.lastPhase is not None:
+            phase = np.unwrap(np.insert(phase, 0, self.lastPhase), period=self.period)[1:]
+        else:
+            phase = np.unwrap(phase, period=self.period)
+        self.lastPhase = phase[-1]
+
+        output = self.buffer[self.history:end] * np.exp(-1j * phase)
+
+        # Keep symbols needed for windows of next outputs
+        start = max(end - self.half, 0)
+        self.buffer = self.buffer[start:]
+        self.history = end - start
+
+        return output
+
+
+def phaseRecovery(symbols, modulationOrder: int, modulationFormat: str, window: int = CPR_WINDOW) -> np.ndarray:
+    """
+    Removes carrier phase noise of all symbols (PSK / QAM).
+
+    Parameters
+    -----
+    window: number of symbols used for one phase estimate
+    """
+    recovery = CarrierPhaseRecovery(modulationOrder, modulationFormat, window)
+
+    return np.concatenate((recovery.process(symbols), recovery.flush()))
+
+
+# Number of symbols in one block of equalizer (coefficients are updated once per block)
+EQ_BLOCK = 256
+# Number of known symbols used for training of equalizer (then decisions are used)
+EQ_TRAINING = 2 * 10**4
+# Maximum part of symbols used for training (the rest is counted in error metrics)
+EQ_MAX_TRAINING = 0.5
+# Default step size of equalizer
+EQ_STEP = 0.05
+
+def trainingLength(symbols: int, training: int = EQ_TRAINING) -> int:
+    """
+    Number of the first symbols used for training of equalizer (at most EQ_MAX_TRAINING of all symbols).
+    Outputs of these symbols depend on known transmitted symbols, so they aren't counted in error metrics.
+    """
+    return min(training, int(symbols * EQ_MAX_TRAINING))
+
+
+def pamDecision(symbols, levels) -> np.ndarray:
+    """
+    Nearest PAM levels of symbols.
+
+    Parameters
+    -----
+    levels: sorted levels of constellation
+    """
+    thresholds = (levels[1:] + levels[:-1]) / 2
+
+    return levels[np.searchsorted(thresholds, symbols)]
+
+
+def blockLMSEqualizer(symbols, trainingSymbols, modulationOrder: int, taps: int, feedbackTaps: int = 0, stepSize: float = EQ_STEP,
+                      blockSize: int = EQ_BLOCK, training: int = EQ_TRAINING) -> np.ndarray:
+    """
+    Feed-forward (FFE) and decision feedback (DFE) equalizer of PAM symbols adapted with block LMS algorithm.
+    Outputs and coefficient updates of one block are computed with matrix operations.
+    Feedback inside of block uses preliminary decisions which are refined with matrix operations until they are the same as decisions of symbol by symbol feedback.
+
+    Parameters
+    -----
+    symbols: normalized received symbols (one sample per symbol)
+
+    trainingSymbols: transmitted symbols (first "training" symbols are used for training)
+
+    taps: number of feed-forward taps (main tap in the middle)
+
+    feedbackTaps: number of feedback taps (0 => only FFE)
+
+    stepSize: step size of LMS algorithm
+
+    blockSize: number of symbols in one block
+
+    Returns
+    -----
+    equalized symbols (the first trainingLength symbols are training, see trainingLength)
+    """
+    levels = np.sort(pnorm(GrayMapping(modulationOrder, "pam")).real)
+    symbols = np.real(symbols)
+    trainingSymbols = np.real(trainingSymbols)[:trainingLength(symbols.size, training)]
+
+    half = taps // 2
+    padded = np.concatenate((np.zeros(half), symbols, np.zeros(taps - 1 - half)))
+    regressors = sliding_window_view(padded, taps)
+
+    # Past decisions (zeros before start)
+    decisions = np.zeros(feedbackTaps + symbols.size)
+    feedbackRegressors = sliding_window_view(decisions, feedbackTaps) if feedbackTaps else None
+
+    forwardWeights = np.zeros(taps)
+    forwardWeights[half] = 1
+    feedbackWeights = np.zeros(feedbackTaps)
+
+    output = np.empty(symbols.size)
+
+    for start in range(0, symbols.size, blockSize):
+        end = min(start + blockSize, symbols.size)
+        trainingBlock = end <= trainingSymbols.size
+
+        X = regressors[start:end]
+        y = X @ forwardWeights
+
+        if feedbackTaps:
+            D = feedbackRegressors[start:end]
+            forwardOutput = y
+
+            if trainingBlock:
+                # Known symbols are fed back
+                decisions[feedbackTaps + start:feedbackTaps + end] = trainingSymbols[start:end]
+                y = forwardOutput + D @ feedbackWeights
+            else:
+                # Preliminary decisions are refined until they don't change
+                # (fixed point is the same as symbol by symbol feedback, every iteration fixes at least one more symbol)
+                blockDecisions = decisions[feedbackTaps + start:feedbackTaps + end]
+                for _ in range(end - start):
+                    newDecisions = pamDecision(y, levels)
+                    if np.array_equal(newDecisions, blockDecisions):
+                        break
+                    blockDecisions[:] = newDecisions
+                    y = forwardOutput + D @ feedbackWeights
+
+        reference = trainingSymbols[start:end] if trainingBlock else pamDecision(y, levels)
+        error = reference - y
+
+        if feedbackTaps:
+            decisions[feedbackTaps + start:feedbackTaps + end] = reference
+            feedbackWeights += stepSize * (D.T @ error) / (end - start)
+
+        forwardWeights += stepSize * (X.T @ error) / (end - start)
+        output[start:end] = y
+
+    return output
+
+
+def mimoEqualizer(symbols, trainingSymbols, modulationOrder: int, modulationFormat: str, taps: int, stepSize: float = EQ_STEP,
+                  blockSize: int = EQ_BLOCK, training: int = EQ_TRAINING) -> np.ndarray:
+    """
+    2x2 butterfly equalizer of dual polarization symbols (polarization demultiplexing and PMD compensation) adapted with block LMS algorithm.
+    Outputs of both polarizations are computed from taps of both polarizations with one matrix product per block.
+    Weights are first converged on training symbols (polarization rotation can be far from identity), then all symbols are equalized
+    with continued adaptation, which uses only decisions (nearest constellation points) as reference.
+
+    Parameters
+    -----
+    symbols: normalized received symbols (2, N) (one sample per symbol)
+
+    trainingSymbols: transmitted symbols (2, N) (first "training" symbols are used for training)
+
+    taps: number of taps of every filter (main tap in the middle)
+
+    stepSize: step size of LMS algorithm
+
+    blockSize: number of symbols in one block
+
+    Returns
+    -----
+    equalized symbols (2, N) (weights were trained on the first trainingLength symbols, see trainingLength)
+    """
+    constellation = pnorm(GrayMapping(modulationOrder, modulationFormat))
+    modes, length = symbols.shape
+    trainingSymbols = trainingSymbols[:, :trainingLength(length, training)]
+
+    half = taps // 2
+    padded = np.pad(symbols, ((0, 0), (half, taps - 1 - half)))
+    # (modes, length, taps)
+    regressors = sliding_window_view(padded, taps, axis=1)
+
+    # Column k = filters of output k (taps of all inputs)
+    weights = np.zeros((modes * taps, modes), dtype=complex)
+    for mode in range(modes):
+        weights[mode * taps + half, mode] = 1
+
+    output = np.empty((modes, length), dtype=complex)
+
+    # Pre-convergence pass (training symbols) and decision directed equalization pass (all symbols)
+    for passLength, trainingPass in ((trainingSymbols.shape[1], True), (length, False)):
+        for start in range(0, passLength, blockSize):
+            end = min(start + blockSize, passLength)
+
+            X = regressors[:, start:end].transpose(1, 0, 2).reshape(end - start, modes * taps)
+            y = X @ weights
+
+            if trainingPass:
+                reference = trainingSymbols[:, start:end].T
+            else:
+                reference = constellation[np.argmin(np.abs(y[..., np.newaxis] - constellation), axis=-1)]
+            error = reference - y
+
+            weights += stepSize * (X.conj().T @ error) / (end - start)
+            output[:, start:end] = y.T
+
+    return output
+
+
+# Number of symbols in one block of timing recovery (timing is updated once per block)
+TIMING_BLOCK = 1024
+# Loop gain of Gardner timing recovery [samples]
+TIMING_GAIN = 0.5
+
+def samplingPhase(signal, SpS: int) -> int:
+    """
+    Finds sampling phase with maximum variance of samples (maximum eye opening).
+    All phases are evaluated at once (signal is reshaped to (symbols, SpS)).
+    Dual polarization signal (2, N) has common phase of both polarizations.
+
+    Returns
+    -----
+    index of sample in signaling interval
+    """
+    symbols = signal.shape[-1] // SpS
+    samples = signal[..., :symbols * SpS].reshape(-1, SpS)
+
+    variance = np.mean(np.abs(samples - samples.mean(axis=0))**2, axis=0)
+
+    return int(np.argmax(variance))
+
+
+def interpolateSamples(signal, positions) -> np.ndarray:
+    """
+    Linear interpolation of signal at fractional sample positions.
+    """
+    index = np.clip(np.floor(positions).astype(int), 0, signal.size - 2)
+    fraction = positions - index
+
+    return signal[index] * (1 - fraction) + signal[index + 1] * fraction
+
+
+def gardnerTiming(signal, SpS: int, phase: float | None = None, blockSize: int = TIMING_BLOCK, gain: float = TIMING_GAIN) -> np.ndarray:
+    """
+    Samples symbols with timing tracked by Gardner timing error detector.
+    Timing error is averaged over block of symbols, so timing drift is followed with one update per block.
+
+    Parameters
+    -----
+    signal: normalized signal (SpS samples per symbol, SpS even)
+
+    phase: initial sampling phase [samples] (None => phase with maximum variance)
+
+    blockSize: number of symbols in one block
+
+    gain: loop gain [samples]
+
+    Returns
+    -----
+    symbols
+    """
+    if phase is None:
+        phase = samplingPhase(signal, SpS)
+
+    symbolsNumber = signal.size // SpS
+    symbols = np.empty(symbolsNumber, dtype=signal.dtype)
+
+    timing = float(phase)
+    previous = None
+
+    for start in range(0, symbolsNumber, blockSize):
+        positions = np.arange(start, min(start + blockSize, symbolsNumber)) * SpS + timing
+        positions = np.clip(positions, SpS / 2, signal.size - 1)
+
+        current = interpolateSamples(signal, positions)
+        middle = interpolateSamples(signal, positions - SpS / 2)
+
+        # Gardner error (middle sample is zero for correct timing of transition)
+        preceding = np.concatenate(([current[0] if previous is None else previous], current[:-1]))
+        error = np.mean(np.real(np.conj(middle) * (current - preceding)))
+
+        symbols[start:start + current.size] = current
+        previous = current[-1]
+
+        timing -= gain * error
+
+    return symbols
+
+
+# Multi-rate reciever
+
+def decimateSignal(signal, SpS: int, recieverSpS: int) -> np.ndarray:
+    """
+    Polyphase resampling of detected signal to lower number of samples per symbol (along the last axis).
+    Anti-aliasing filter is part of polyphase filter, sample of every symbol start is kept in its place.
+
+    Parameters
+    -----
+    SpS: samples per symbol of signal
+
+    recieverSpS: samples per symbol of output
+    """
+    if recieverSpS == SpS:
+        return signal
+
+    factor = Fraction(recieverSpS, SpS)
+
+    return resample_poly(signal, factor.numerator, factor.denominator, axis=-1)
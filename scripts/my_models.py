@@ -7,9 +7,13 @@ import numpy as np
 import scipy.constants as const
 
 from optic.utils import dBm2W
-from optic.dsp.core import gaussianComplexNoise
+from optic.dsp.core import lowPassFIR
 
-def edfa(Ei, ideal: bool, param=None) -> np.array:
+from scripts.fft_backend import fft, ifft, angularFrequencies, fftConvolve, cachedArray
+from scripts.workspace import localWorkspace
+from scripts.noise import localNoise, noiseType
+
+def edfa(Ei, ideal: bool, param=None, out=None) -> np.array:
     """
     Implement simple EDFA model. Edited version from OpticommPY package.
 
@@ -27,6 +31,10 @@ def edfa(Ei, ideal: bool, param=None) -> np.array:
         - param.NF : EDFA noise figure in dB. The default is 4.5.
         - param.Fc : central optical frequency. The default is 193.1e12.
         - param.Fs : sampling frequency in samples/second.
+        - param.noiseScale : multiplier of ASE noise amplitude (importance sampling). The default is 1.
+
+    out : np.array, optional
+        Array for output signal (can be Ei itself => in-place amplification).
 
     Returns
     -------
@@ -39,12 +47,13 @@ def edfa(Ei, ideal: bool, param=None) -> np.array:
     NF = getattr(param, "NF")
     Fc = getattr(param, "Fc")
     Fs = getattr(param, "Fs")
+    noiseScale = getattr(param, "noiseScale", 1)
 
     # Ideal amplifier
     if ideal:
         G_lin = 10 ** (G / 10)
 
-        return Ei * np.sqrt(G_lin)
+        return np.multiply(Ei, np.sqrt(G_lin), out=out)
     # Not ideal amplifier
     else:
         NF_lin = 10 ** (NF / 10)
@@ -54,9 +63,13 @@ def edfa(Ei, ideal: bool, param=None) -> np.array:
         N_ase = (G_lin - 1) * nsp * const.h * Fc
         p_noise = N_ase * Fs
 
-        noise = gaussianComplexNoise(Ei.shape, p_noise)
+        # ASE noise (noiseScale multiplies its amplitude)
+        noise = localNoise().complexGaussian("ase", Ei.shape, p_noise * noiseScale**2, out=localWorkspace().array("aseNoise", Ei.shape, noiseType(complexNoise=True)))
+
+        Eo = np.multiply(Ei, np.sqrt(G_lin), out=out)
+        Eo += noise
 
-        return Ei * np.sqrt(G_lin) + noise
+        return Eo
     
 
 def idealLaser(power: float, length: int) -> np.array:
@@ -73,13 +86,54 @@ def idealLaser(power: float, length: int) -> np.array:
     return np.sqrt(dBm2W(power)) * np.exp(2j * np.pi * samples)
 
 
-def attenuationChannel(signal, param) -> np.array:
+def laserModel(param) -> np.array:
+    """
+    Laser model with Maxwellian random walk phase noise and RIN. Edited version of basicLaserModel from OpticommPY package (noise module).
+
+    Parameters
+    ----------
+    param : parameter object (struct)
+        - param.P: laser power [dBm]
+        - param.lw: laser linewidth [Hz]
+        - param.RIN_var: variance of the RIN noise
+        - param.Fs: sampling rate [samples/s]
+        - param.Ns: number of signal samples
+
+    Returns
+    -------
+    optical_signal : np.array
+        Optical signal with phase noise and RIN.
+    """
+    P = getattr(param, "P")
+    lw = getattr(param, "lw")
+    RIN_var = getattr(param, "RIN_var")
+    Fs = getattr(param, "Fs")
+    Ns = getattr(param, "Ns")
+
+    # Random walk phase noise (cumulative sum of phase increments, accumulated in double precision)
+    σ2 = 2 * np.pi * lw / Fs
+    pn = np.zeros(Ns)
+    increments = localNoise().gaussian("phase", max(Ns - 1, 0), np.sqrt(σ2))
+    np.cumsum(increments, dtype=np.float64, out=pn[1:])
+
+    optical_signal = np.exp(1j * pn)
+    optical_signal *= np.sqrt(dBm2W(P))
+
+    # Relative intensity noise (RIN)
+    optical_signal += localNoise().complexGaussian("rin", Ns, RIN_var, out=localWorkspace().array("rinNoise", Ns, noiseType(complexNoise=True)))
+
+    return optical_signal
+
+
+def attenuationChannel(signal, param, out=None) -> np.array:
     """
     Channel where only attenuation is aplied.
 
     Parameters
     -----
     parameters object: attenuation in dB/km, length in km
+
+    out: array for output signal (can be signal itself => in-place attenuation)
     """
     length = param.L
     attenuation = param.alpha
@@ -89,4 +143,347 @@ def attenuationChannel(signal, param) -> np.array:
     # Attenuation in W
     attenuation = 10**(-attenuation/10)
 
-    return signal * np.sqrt(attenuation)
\ No newline at end of file
+    return np.multiply(signal, np.sqrt(attenuation), out=out)
+
+
+def linearFiberChannel(Ei, param) -> np.array:
+    """
+    Linear fiber channel (attenuation and dispersion). Edited version from OpticommPY package (FFTs of fft_backend).
+
+    Parameters
+    ----------
+    Ei : np.array
+        Input optical field (single polarization or dual polarization (2, N)).
+
+    param : parameter object (struct)
+        - param.L : fiber length [km]
+        - param.alpha : attenuation [dB/km]
+        - param.D : dispersion [ps/nm/km]
+        - param.Fc : central optical frequency [Hz]
+        - param.Fs : sampling frequency [samples/second]
+
+    Returns
+    -------
+    Eo : np.array
+        Optical field at the end of fiber.
+
+    """
+    L = param.L
+    Fs = param.Fs
+
+    c_kms = const.c / 1e3
+    wavelength = c_kms / param.Fc
+    alpha = param.alpha / (10 * np.log10(np.exp(1)))
+    beta2 = -(param.D * wavelength**2) / (2 * np.pi * c_kms)
+
+    omega = angularFrequencies(Ei.shape[-1], Fs)
+
+    return ifft(fft(Ei) * np.exp(-alpha / 2 * L + 1j * (beta2 / 2) * (omega**2) * L))
+
+
+# Fiber nonlinear parameter [1/W/km]
+GAMMA = 1.3
+# Maximum nonlinear phase rotation in one step of split-step Fourier method [rad]
+SSFM_MAX_PHASE = 5e-3
+# Steps of split-step Fourier method are multiples of length / 2**SSFM_RESOLUTION
+SSFM_RESOLUTION = 20
+
+@cachedArray
+def ssfmLinearOperator(nfft: int, Fs: float, step: float, alpha: float, beta2: float) -> np.array:
+    """
+    Linear operator (attenuation and dispersion) of one half step of split-step Fourier method. Cached for each step size.
+
+    Parameters
+    ----------
+    step: length of the whole step [km]
+
+    alpha: attenuation [1/km]
+
+    beta2: group velocity dispersion [s^2/km]
+    """
+    omega = angularFrequencies(nfft, Fs)
+    operator = np.exp(-(alpha / 2) * (step / 2) + 1j * (beta2 / 2) * (omega**2) * (step / 2))
+    operator.flags.writeable = False
+
+    return operator
+
+
+def ssfmStep(power: float, alpha: float, gamma: float, maxPhase: float, remaining: int, resolution: int, length: float) -> int:
+    """
+    Size of next step (in units of length / 2**resolution) so that nonlinear phase rotation doesn't exceed maxPhase.
+    Steps are powers of two so linear operators are reused.
+
+    Parameters
+    ----------
+    power: peak power of signal [W]
+
+    remaining: remaining length in step units
+    """
+    # Effective length with maximum nonlinear phase
+    effectiveLength = maxPhase / (gamma * power) if gamma * power > 0 else np.inf
+
+    if alpha > 0 and alpha * effectiveLength < 1:
+        step = -np.log(1 - alpha * effectiveLength) / alpha
+    elif alpha > 0:
+        step = np.inf
+    else:
+        step = effectiveLength
+
+    # The largest power of two which isn't longer than step nor remaining length
+    units = min(max(step / length * 2**resolution, 1), remaining)
+
+    return 2**int(np.floor(np.log2(units)))
+
+
+def fieldIntensity(field) -> np.ndarray:
+    """
+    Intensity causing nonlinear phase rotation. Total intensity of both polarizations averaged over random birefringence (Manakov factor 8/9) for dual polarization field.
+    """
+    if field.ndim == 2:
+        return 8 / 9 * np.sum(np.abs(field)**2, axis=0)
+
+    return np.abs(field)**2
+
+
+def nonlinearFiberChannel(Ei, param) -> np.array:
+    """
+    Fiber channel with attenuation, dispersion and Kerr nonlinearity (symmetric split-step Fourier method).
+    Step size is adapted to nonlinear phase rotation and FFTs are multithreaded (fft_backend).
+    Dual polarization field (2, N) is propagated with Manakov equation (nonlinear phase of total power scaled by 8/9).
+
+    Parameters
+    ----------
+    Ei : np.array
+        Input optical field (single polarization or dual polarization (2, N)).
+
+    param : parameter object (struct)
+        - param.L : fiber length [km]
+        - param.alpha : attenuation [dB/km]
+        - param.D : dispersion [ps/nm/km]
+        - param.Fc : central optical frequency [Hz]
+        - param.Fs : sampling frequency [samples/second]
+        - param.gamma : nonlinear parameter [1/W/km]. The default is GAMMA.
+        - param.maxPhase : maximum nonlinear phase rotation in one step [rad]. The default is SSFM_MAX_PHASE.
+
+    Returns
+    -------
+    Eo : np.array
+        Optical field at the end of fiber.
+
+    """
+    length = param.L
+    Fs = param.Fs
+    gamma = getattr(param, "gamma", GAMMA)
+    maxPhase = getattr(param, "maxPhase", SSFM_MAX_PHASE)
+
+    c_kms = const.c / 1e3
+    wavelength = c_kms / param.Fc
+    alpha = param.alpha / (10 * np.log10(np.exp(1)))
+    beta2 = -(param.D * wavelength**2) / (2 * np.pi * c_kms)
+
+    nfft = Ei.shape[-1]
+    # Length in step units
+    remaining = 2**SSFM_RESOLUTION
+
+    spectrum = fft(Ei)
+    power = np.max(fieldIntensity(Ei))
+
+    while remaining > 0:
+        units = ssfmStep(power, alpha, gamma, maxPhase, remaining, SSFM_RESOLUTION, length)
+        step = length * units / 2**SSFM_RESOLUTION
+        operator = ssfmLinearOperator(nfft, Fs, step, alpha, beta2)
+        effectiveLength = (1 - np.exp(-alpha * step)) / alpha if alpha > 0 else step
+
+        # Linear half step, nonlinear step, linear half step
+        field = ifft(spectrum * operator)
+        intensity = fieldIntensity(field)
+        field = field * np.exp(1j * gamma * intensity * effectiveLength)
+        spectrum = fft(field) * operator
+
+        # Peak power at the start of next step (dispersion of the half step is neglected)
+        power = np.max(intensity) * np.exp(-alpha * step / 2)
+        remaining -= units
+
+    return ifft(spectrum)
+
+
+# Number of fiber sections with random birefringence of PMD model
+PMD_SECTIONS = 16
+
+def pmdChannel(Ei, param) -> np.array:
+    """
+    Polarization mode dispersion of dual polarization field (coarse-step model).
+    Fiber is divided into sections with random rotation of polarization and the same differential group delay (DGD).
+    Jones matrices of all frequencies are computed at once, every matrix is unitary [[a, -conj(b)], [b, conj(a)]] so only a and b are stored.
+
+    Parameters
+    ----------
+    Ei : np.array
+        Input optical field (2, N).
+
+    param : parameter object (struct)
+        - param.L : fiber length [km]
+        - param.Fs : sampling frequency [samples/second]
+        - param.pmd : PMD parameter [ps/sqrt(km)]
+        - param.pmdSections : number of sections. The default is PMD_SECTIONS.
+
+    Returns
+    -------
+    Eo : np.array
+        Optical field at the end of fiber.
+    """
+    sections = getattr(param, "pmdSections", PMD_SECTIONS)
+
+    # Mean DGD of fiber => DGD of one section (Maxwellian distribution of total DGD)
+    meanDGD = param.pmd * np.sqrt(param.L) * 1e-12
+    sectionDGD = meanDGD * np.sqrt(3 * np.pi / (8 * sections))
+
+    omega = angularFrequencies(Ei.shape[-1], param.Fs)
+    delay = np.exp(1j * omega * sectionDGD / 2)
+
+    a = np.ones(omega.size, dtype=complex)
+    b = np.zeros(omega.size, dtype=complex)
+
+    for _ in range(sections):
+        # Random rotation (uniformly distributed unit quaternion)
+        q = np.random.normal(size=4)
+        q = q / np.linalg.norm(q)
+        rotationA, rotationB = q[0] + 1j * q[1], q[2] + 1j * q[3]
+
+        # Rotation and then birefringence (diag(delay, conj(delay)))
+        a, b = rotationA * a - np.conj(rotationB) * b, rotationB * a + np.conj(rotationA) * b
+        a *= delay
+        b *= np.conj(delay)
+
+    spectrum = fft(Ei)
+
+    return ifft(np.stack((a * spectrum[0] - np.conj(b) * spectrum[1], b * spectrum[0] + np.conj(a) * spectrum[1])))
+
+
+def photodiode(E, param=None) -> np.array:
+    """
+    Pin photodiode (PD). Edited version from OpticommPY package.
+
+    Parameters
+    ----------
+    E : np.array
+        Input optical field (2-D field => every row is detected by its own photodiode).
+
+    param : parameter object (struct), optional
+        Parameters of the photodiode.
+
+        - param.R: photodiode responsivity [A/W][default: 1 A/W]
+        - param.Tc: temperature [°C][default: 25°C]
+        - param.Id: dark current [A][default: 5e-9 A]
+        - param.Ipd_sat: saturation value of the photocurrent [A][default: 5e-3 A]
+        - param.RL: impedance load [Ω] [default: 50Ω]
+        - param.B bandwidth [Hz][default: 30e9 Hz]
+        - param.Fs: sampling frequency [Hz]
+        - param.fType: frequency response type [default: 'rect']
+        - param.N: number of the frequency resp. filter taps. [default: 8000]
+        - param.ideal: ideal PD?(i.e. no noise, no frequency resp.) [default: True]
+        - param.noiseScale: multiplier of shot and thermal noise amplitude (importance sampling) [default: 1]
+
+    Returns
+    -------
+    ipd : np.array
+          photocurrent.
+    """
+    kB = const.Boltzmann
+    q = const.elementary_charge
+
+    # Input parameters
+    R = getattr(param, "R", 1)
+    Tc = getattr(param, "Tc", 25)
+    Id = getattr(param, "Id", 5e-9)
+    RL = getattr(param, "RL", 50)
+    B = getattr(param, "B", 30e9)
+    Ipd_sat = getattr(param, "Ipd_sat", 5e-3)
+    N = getattr(param, "N", 8000)
+    fType = getattr(param, "fType", "rect")
+    ideal = getattr(param, "ideal", True)
+    noiseScale = getattr(param, "noiseScale", 1)
+
+    # Ideal photocurrent
+    ipd = R * E * np.conj(E)
+
+    if not ideal:
+        Fs = getattr(param, "Fs")
+
+        # Saturation of the photocurrent
+        ipd[ipd > Ipd_sat] = Ipd_sat
+
+        ipd_mean = ipd.mean(axis=-1, keepdims=True).real
+
+        # Shot noise variance
+        σ2_s = 2 * q * (ipd_mean + Id) * B
+
+        # Thermal noise variance
+        T = Tc + 273.15
+        σ2_T = 4 * kB * T * B / RL
+
+        # Add noise sources to the p-i-n receiver (sum of independent shot and thermal noise is one Gaussian noise)
+        deviation = np.sqrt(Fs * ((σ2_s + σ2_T) / (2 * B))) * noiseScale
+        ipd += localNoise().gaussian("photodiode", ipd.shape, deviation, out=localWorkspace().array("photodiodeNoise", ipd.shape, noiseType()))
+
+        # Lowpass filtering (FFT convolution)
+        h = lowPassFIR(B, Fs, N, typeF=fType)
+        ipd = fftConvolve(ipd.real, h)
+
+    return ipd.real
+
+
+def coherentReceiver(Es, Elo, param=None) -> np.array:
+    """
+    Coherent optical front-end (90° hybrid and balanced photodiodes). Edited version from OpticommPY package.
+    Dual polarization field (2, N) is detected by two front-ends at once (every polarization with its part of LO field).
+
+    Parameters
+    ----------
+    Es : np.array
+        Input signal optical field.
+
+    Elo : np.array
+        Input LO optical field (field of one polarization).
+
+    param : parameter object (struct), optional
+        Parameters of the photodiodes (see photodiode).
+
+    Returns
+    -------
+    s : np.array
+        Downconverted signal after balanced detection.
+    """
+    # Balanced photodetection (outputs of hybrid are computed one at a time in the same workspace buffer)
+    sI = photodiode(hybridOutput(Es, Elo, 1), param) - photodiode(hybridOutput(Es, Elo, 0), param)
+    sQ = photodiode(hybridOutput(Es, Elo, 2), param) - photodiode(hybridOutput(Es, Elo, 3), param)
+
+    return sI + 1j * sQ
+
+
+def hybridOutput(Es, Elo, output: int) -> np.array:
+    """
+    One output of optical 2 x 4 90° hybrid: (Es - Elo) / 2, 1j * (Es + Elo) / 2, (1j * Es - Elo) / 2, (-Es + 1j * Elo) / 2.
+
+    Returns
+    -----
+    output field in workspace buffer (valid until the next call)
+    """
+    Eo = localWorkspace().array("hybridOutput", np.broadcast_shapes(Es.shape, Elo.shape), np.result_type(Es, Elo, 1j))
+
+    if output == 0:
+        np.subtract(Es, Elo, out=Eo)
+    elif output == 1:
+        np.add(Es, Elo, out=Eo)
+        Eo *= 1j
+    elif output == 2:
+        np.multiply(Es, 1j, out=Eo)
+        Eo -= Elo
+    elif output == 3:
+        np.multiply(Elo, 1j, out=Eo)
+        Eo -= Es
+    else: raise Exception("Unexpected error")
+
+    Eo /= 2
+
+    return Eo
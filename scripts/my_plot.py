@@ -8,9 +8,10 @@ import numpy as np
 from scipy.interpolate import interp1d
 from scipy.ndimage.filters import gaussian_filter
 from optic.dsp.core import pnorm, signal_power
-from optic.models.amplification import get_spectrum
 from optic.plot import constHist
 import warnings
+
+from scripts.fft_backend import magnitudeSpectrum
 from scipy.constants import c
 
 warnings.filterwarnings("ignore", r"All-NaN (slice|axis) encountered")
@@ -327,7 +328,7 @@ def opticalInTime(Ts: int, signal, title: str, type: str) -> tuple[plt.Figure, p
     return fig, axs
 
 
-def opticalSpectrum(signal, Fs: int, Fc: float, title: str) -> tuple[plt.Figure, plt.Axes]:
+def opticalSpectrum(signal, Fs: int, Fc: float, title: str, spectrum: tuple | None = None) -> tuple[plt.Figure, plt.Axes]:
     """
     Plot optical spectrum with wavelength and frequency.
 
@@ -336,8 +337,14 @@ def opticalSpectrum(signal, Fs: int, Fc: float, title: str) -> tuple[plt.Figure,
     Fs: sampling frequency
 
     Fc: central frequency
+
+    spectrum: precomputed (frequencies, magnitudes) used instead of signal (lean results)
     """
-    frequency, spectrum = get_spectrum(signal, Fs, Fc, xunits="Hz")
+    frequency, spectrum = magnitudeSpectrum(signal, Fs) if spectrum is None else spectrum
+    frequency = frequency + Fc
+    # Power of spectral components [dBm]
+    with np.errstate(divide="ignore"):
+        spectrum = 10*np.log10(1e3*spectrum**2)
 
     # Wavelength
     wavelength = c / frequency
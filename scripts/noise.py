@@ -0,0 +1,298 @@
+"""
+Gaussian noise of simulation models (ASE noise of amplifier, RIN and phase noise of laser, shot and thermal noise of photodiode).
+
+Noise is drawn by numpy Generator (PCG64) from named streams. Every request of stream is its own block and block is split into chunks
+of NOISE_CHUNK samples, every chunk has independent generator (SeedSequence with stream, block and chunk in spawn key).
+Chunks are generated in parallel by NOISE_WORKERS threads, so noise doesn't depend on number of threads or on order of requests of different streams.
+
+Optional prefetch generates the next block of stream (with the same shape) on background thread while the current block is processed
+(photodiodes of coherent reciever, blocks of live simulation).
+
+Noise can be generated in single precision (setPrecision), it is added to double precision signals.
+
+Common random numbers mode (commonRandomNumbers) keeps generated unit noise blocks, so sweep points with the same seed and signal shapes
+reuse the same realizations (only scaled by noise power of the point) without generating them again.
+Differences between points are then given only by swept parameters, not by different noise.
+"""
+
+import os
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Number of threads generating noise
+NOISE_WORKERS = os.cpu_count() or 1
+# Number of samples generated by one generator
+NOISE_CHUNK = 2**18
+# Type of generated noise (np.float64 / np.float32)
+NOISE_DTYPE = np.float64
+# Identifiers of noise streams (part of spawn key)
+NOISE_STREAMS = {"ase":1, "rin":2, "phase":3, "photodiode":4}
+# Default seed of noise (same as seed of simulate)
+NOISE_SEED = 123
+# Memory limit of unit noise blocks kept in common random numbers mode [bytes] (the oldest blocks are dropped)
+COMMON_NOISE_BYTES = 2**30
+# Noise sources of threads
+THREAD_NOISE = threading.local()
+# Thread pools of chunk generation and of prefetch (created on first use)
+EXECUTORS = {}
+
+def setWorkers(workers: int):
+    """
+    Sets number of threads generating noise (1 = without threads).
+    """
+    global NOISE_WORKERS
+    NOISE_WORKERS = workers
+    executor = EXECUTORS.pop("chunks", None)
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def setCommonMemory(limit: int):
+    """
+    Sets memory limit of unit noise blocks kept in common random numbers mode [bytes].
+    """
+    global COMMON_NOISE_BYTES
+    COMMON_NOISE_BYTES = limit
+
+
+def setPrecision(dtype):
+    """
+    Sets type of generated noise (np.float32 = single precision, np.float64 = double precision).
+    """
+    global NOISE_DTYPE
+    if np.dtype(dtype) not in (np.float32, np.float64): raise Exception("Unexpected error")
+    NOISE_DTYPE = np.dtype(dtype).type
+
+
+def noiseType(complexNoise: bool = False) -> np.dtype:
+    """
+    Type of generated real (or complex) noise.
+    """
+    dtype = np.dtype(NOISE_DTYPE)
+
+    return np.result_type(dtype, np.complex64) if complexNoise else dtype
+
+
+def executor(name: str, workers: int) -> ThreadPoolExecutor:
+    """
+    Shared thread pool ("chunks" / "prefetch").
+    """
+    if name not in EXECUTORS:
+        EXECUTORS.update({name:ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"noise-{name}")})
+
+    return EXECUTORS.get(name)
+
+
+def fillNormal(out: np.ndarray, entropy: int, key: tuple):
+    """
+    Fills array with standard normal noise of one block (chunks in parallel).
+
+    Parameters
+    -----
+    out: contiguous float32 / float64 array
+
+    entropy: entropy of seed
+
+    key: stream and block (spawn key of block)
+    """
+    flat = out.reshape(-1)
+
+    def fillChunk(start: int):
+        generator = np.random.Generator(np.random.PCG64(np.random.SeedSequence(entropy, spawn_key=key + (start // NOISE_CHUNK,))))
+        generator.standard_normal(out=flat[start:start + NOISE_CHUNK], dtype=flat.dtype)
+
+    starts = range(0, flat.size, NOISE_CHUNK)
+
+    if NOISE_WORKERS == 1 or len(starts) == 1:
+        for start in starts:
+            fillChunk(start)
+    else:
+        list(executor("chunks", NOISE_WORKERS).map(fillChunk, starts))
+
+
+class NoiseSource:
+    """
+    Named streams of Gaussian noise.
+
+    Parameters
+    -----
+    seed: seed of all streams (None = random seed)
+
+    prefetch: the next block of every stream is generated in background
+
+    common: dictionary of kept unit noise blocks (common random numbers mode, see commonRandomNumbers), None = blocks aren't kept
+    """
+    def __init__(self, seed: int | None = NOISE_SEED, prefetch: bool = False, common: dict | None = None):
+        self.prefetch = prefetch
+        self.common = common
+        self.reset(seed)
+
+
+    def reset(self, seed: int | None, blocks: dict | None = None):
+        """
+        Starts all streams again from given seed (prefetched blocks are discarded).
+
+        Parameters
+        -----
+        blocks: numbers of blocks already drawn from streams (streams continue after them), None = all streams start from the first block
+        """
+        self.entropy = np.random.SeedSequence(seed).entropy
+        self.blocks = {} if blocks is None else dict(blocks)
+        self.pending = {}
+
+
+    def normal(self, stream: str, shape, dtype=None, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Standard normal noise (next block of stream).
+
+        Parameters
+        -----
+        stream: key of NOISE_STREAMS
+
+        dtype: float32 / float64 (default NOISE_DTYPE)
+
+        out: array for noise (contiguous)
+
+        Returns
+        -----
+        noise
+        """
+        dtype = np.dtype(NOISE_DTYPE if dtype is None else dtype)
+        shape = tuple(np.atleast_1d(shape))
+
+        block = self.blocks.get(stream, 0)
+        self.blocks.update({stream:block + 1})
+        key = (NOISE_STREAMS.get(stream), block)
+
+        # Common random numbers (block of the same stream, shape and seed was generated before)
+        commonKey = (self.entropy, key, shape, dtype)
+        if self.common is not None and commonKey in self.common:
+            if out is None:
+                return self.common.get(commonKey).copy()
+
+            np.copyto(out, self.common.get(commonKey))
+            return out
+
+        pending = self.pending.pop(stream, None)
+        if pending is not None and pending[0] == (key, shape, dtype):
+            noise = pending[1].result()
+            if out is not None:
+                out[...] = noise
+                noise = out
+        else:
+            noise = np.empty(shape, dtype) if out is None else out
+            fillNormal(noise, self.entropy, key)
+
+        if self.common is not None:
+            self.keepCommon(commonKey, noise)
+        # Next block of the same shape is generated while this one is used
+        elif self.prefetch:
+            nextKey = (key[0], block + 1)
+            future = executor("prefetch", 1).submit(self.prefetchBlock, nextKey, shape, dtype)
+            self.pending.update({stream:((nextKey, shape, dtype), future)})
+
+        return noise
+
+
+    def keepCommon(self, commonKey: tuple, noise: np.ndarray):
+        """
+        Keeps copy of unit noise block for common random numbers (memory of kept blocks is limited by COMMON_NOISE_BYTES).
+        """
+        block = noise.copy()
+        block.flags.writeable = False
+        self.common.update({commonKey:block})
+
+        # Dictionary can be shared by more threads
+        while len(self.common) > 1 and sum(item.nbytes for item in list(self.common.values())) > COMMON_NOISE_BYTES:
+            self.common.pop(next(iter(self.common)), None)
+
+
+    def prefetchBlock(self, key: tuple, shape: tuple, dtype: np.dtype) -> np.ndarray:
+        noise = np.empty(shape, dtype)
+        fillNormal(noise, self.entropy, key)
+
+        return noise
+
+
+    def gaussian(self, stream: str, shape, deviation, dtype=None, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Real Gaussian noise with zero mean.
+
+        Parameters
+        -----
+        deviation: standard deviation (scalar or array broadcastable to shape)
+        """
+        noise = self.normal(stream, shape, dtype, out)
+        noise *= deviation
+
+        return noise
+
+
+    def complexGaussian(self, stream: str, shape, variance, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Complex circular Gaussian noise with zero mean (real and imaginary parts have variance / 2).
+
+        Parameters
+        -----
+        out: complex64 / complex128 array for noise (contiguous, type sets precision)
+        """
+        shape = tuple(np.atleast_1d(shape))
+        noise = np.empty(shape, noiseType(complexNoise=True)) if out is None else out
+
+        # Real and imaginary parts are interleaved in memory
+        parts = noise.view(np.finfo(noise.dtype).dtype).reshape(shape + (2,))
+        self.normal(stream, shape + (2,), parts.dtype, parts)
+        noise *= np.sqrt(variance / 2)
+
+        return noise
+
+
+def localNoise() -> NoiseSource:
+    """
+    Noise source of current thread.
+    """
+    if not hasattr(THREAD_NOISE, "source"):
+        THREAD_NOISE.source = NoiseSource()
+
+    return THREAD_NOISE.source
+
+
+@contextmanager
+def commonRandomNumbers(common: dict | None = None):
+    """
+    Common random numbers mode of current thread (variance reduction of sweeps).
+    Simulations inside the block reuse unit noise blocks generated by the first simulation with the same seed and shapes.
+
+    Parameters
+    -----
+    common: dictionary of kept blocks shared by more blocks of code (e.g. all points of sweep), None = new dictionary
+
+    Yields
+    -----
+    noise source of current thread
+    """
+    source = localNoise()
+    previous = source.common
+    source.common = {} if common is None else common
+
+    try:
+        yield source
+    finally:
+        source.common = previous
+
+
+def seedNoise(seed: int | None, blocks: dict | None = None):
+    """
+    Seeds noise source of current thread (blocks: see NoiseSource.reset).
+    """
+    localNoise().reset(seed, blocks)
+
+
+def seedRandom(seed: int | None):
+    """
+    Seeds random numbers of simulation (numpy global generator of information bits and noise source of current thread).
+    """
+    np.random.seed(seed=seed)
+    seedNoise(seed)
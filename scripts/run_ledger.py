@@ -0,0 +1,301 @@
+"""
+Ledger of simulation runs in SQLite database.
+
+Every run is stored under its key (digest of typed configuration, number of symbols, mode of values, lean mode and version of simulation code)
+with values from getValues,
+timings of simulation stages and path of file with simulation arrays. Already computed configuration is returned from ledger without simulation.
+Swept parameters are stored in indexed columns, so queries like "all runs with Format=qam, Order=16" don't read whole table.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from scripts.simulation import simulateTransmitter, fiberTransmition, simulateReciever, getValues, leanSignal, handOver
+from scripts.simulation_parameters import SimulationConfig
+from scripts.simulation_server import jsonValue
+from scripts.workspace import localWorkspace
+from scripts.noise import seedRandom
+
+# Default path of ledger database in project directory (arrays are stored in "arrays" directory next to it)
+LEDGER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "runs", "ledger.sqlite")
+# Version of ledger records (part of run key, increase when stored results change without change of sources below)
+LEDGER_VERSION = 1
+# Sources of simulation which change results (their digest is part of run key, stored runs of older code aren't returned)
+LEDGER_SOURCES = ["simulation.py", "simulation_parameters.py", "my_models.py", "my_dsp.py", "noise.py", "alignment.py", "ber_estimation.py",
+                  "fft_backend.py"]
+# Default number of symbols of one run (same as simulate)
+LEDGER_SYMBOLS = 10**6
+# Columns of swept parameters (query keys => column names)
+LEDGER_COLUMNS = {"Format":"format", "Order":"modulationOrder", "Rs":"symbolRate", "SpS":"samplesPerSymbol", "Polarizations":"polarizations",
+                  "Modulator":"modulator", "Power":"sourcePower", "Length":"channelLength", "Reciever":"reciever", "Amplifier":"amplifier",
+                  "Symbols":"symbols", "Mode":"mode"}
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    key TEXT PRIMARY KEY,
+    configDigest TEXT NOT NULL,
+    format TEXT, modulationOrder INTEGER, symbolRate REAL, samplesPerSymbol INTEGER, polarizations INTEGER,
+    modulator TEXT, sourcePower REAL, channelLength REAL, reciever TEXT, amplifier INTEGER,
+    symbols INTEGER, mode TEXT,
+    config TEXT, runValues TEXT, timings TEXT, arrays TEXT, created REAL
+);
+CREATE INDEX IF NOT EXISTS runsModulation ON runs (format, modulationOrder, symbolRate);
+CREATE INDEX IF NOT EXISTS runsChannel ON runs (channelLength, sourcePower);
+CREATE INDEX IF NOT EXISTS runsReciever ON runs (reciever, modulator);
+CREATE INDEX IF NOT EXISTS runsDigest ON runs (configDigest);
+"""
+
+def codeVersion() -> str:
+    """
+    Digest of LEDGER_VERSION and LEDGER_SOURCES.
+    """
+    digest = hashlib.sha256(f"version={LEDGER_VERSION}".encode())
+
+    for source in LEDGER_SOURCES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), source), "rb") as file:
+            digest.update(file.read())
+
+    return digest.hexdigest()
+
+
+# Version of simulation code (part of run key)
+CODE_VERSION = codeVersion()
+
+def runKey(config: SimulationConfig, symbols: int, mode: str, lean: bool = False) -> str:
+    """
+    Stable key of run (digest of configuration, number of symbols, mode of values, lean mode and version of simulation code).
+    Lean runs have only plot windows of arrays, so they are stored separately.
+    """
+    return hashlib.sha256(f"{config.canonical()},symbols={int(symbols)},mode={mode!r},lean={bool(lean)},code={CODE_VERSION}".encode()).hexdigest()
+
+
+def fromJsonValue(value):
+    """
+    Converts strings of infinite and nan values (jsonValue) back to floats.
+    """
+    if isinstance(value, dict):
+        return {key:fromJsonValue(item) for key, item in value.items()}
+    elif value in ("inf", "-inf", "nan"):
+        return float(value)
+    else:
+        return value
+
+
+def timedSimulate(config: SimulationConfig, symbols: int = LEDGER_SYMBOLS, lean: bool = False) -> tuple[dict, dict]:
+    """
+    Simulate communication (same as simulate) with timings of stages.
+
+    Parameters
+    -----
+    lean: lean results mode (see simulate)
+
+    Returns
+    -----
+    simulationResults: output of simulate
+
+    timings: Transmitter, Channel, Reciever [s]
+    """
+    generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters, includeAmplifier = config.toDicts()
+    generalParameters.update({"Symbols":symbols})
+    Fs = generalParameters.get("Fs")
+    frequency = sourceParameters.get("Frequency")*10**12
+
+    seedRandom(generalParameters.get("Seed", 123))
+    timings = {}
+
+    start = time.perf_counter()
+    simulationResults = simulateTransmitter(generalParameters, sourceParameters, modulatorParameters)
+    if lean:
+        leanSignal(simulationResults, "modulationSignal", generalParameters.get("SpS"))
+    timings.update({"Transmitter":time.perf_counter() - start})
+
+    start = time.perf_counter()
+    simulationResults.update(fiberTransmition(channelParameters, amplifierParameters, simulationResults.get("modulatedSignal"), Fs, frequency, includeAmplifier))
+    timings.update({"Channel":time.perf_counter() - start})
+
+    if simulationResults.get("recieverSignal") is None:
+        return simulationResults, timings
+
+    recieverSignal = simulationResults.get("recieverSignal")
+    if lean:
+        leanSignal(simulationResults, "modulatedSignal", generalParameters.get("SpS"), spectrum=True)
+        leanSignal(simulationResults, "recieverSignal", generalParameters.get("SpS"), spectrum=True)
+
+    start = time.perf_counter()
+    simulationResults.update(simulateReciever(generalParameters, sourceParameters, channelParameters, recieverParameters,
+                                              recieverSignal, handOver(simulationResults) if lean else simulationResults, lean))
+    timings.update({"Reciever":time.perf_counter() - start})
+
+    if lean:
+        localWorkspace().clear()
+
+    return simulationResults, timings
+
+
+class RunLedger:
+    """
+    SQLite ledger of simulation runs.
+
+    Parameters
+    -----
+    path: path of database file (directory is created)
+
+    saveArrays: simulation arrays are saved to .npz files (needed for plots of stored runs, one file has hundreds of MB for 10^6 symbols)
+
+    lean: runs are simulated in lean results mode (see simulate), saved arrays have only plot windows and symbols
+    """
+    def __init__(self, path: str = LEDGER_PATH, saveArrays: bool = True, lean: bool = False):
+        self.path = path
+        self.saveArrays = saveArrays
+        self.lean = lean
+        self.arraysDirectory = os.path.join(os.path.dirname(path), "arrays")
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(LEDGER_SCHEMA)
+
+
+    def close(self):
+        self.connection.close()
+
+
+    def lookup(self, config: SimulationConfig, symbols: int = LEDGER_SYMBOLS, mode: str = "count") -> dict | None:
+        """
+        Returns
+        -----
+        stored record of run (see record method)
+
+        None: run isn't in ledger
+        """
+        row = self.connection.execute("SELECT * FROM runs WHERE key = ?", (runKey(config, symbols, mode, self.lean),)).fetchone()
+
+        return None if row is None else self.record(row)
+
+
+    def run(self, config: SimulationConfig, symbols: int = LEDGER_SYMBOLS, mode: str = "count") -> tuple[dict, dict | None]:
+        """
+        Returns stored run or simulates and stores new one.
+
+        Returns
+        -----
+        record: see record method ("Cached" key is True for stored run)
+
+        simulationResults: output of simulate (None for stored run, arrays can be loaded with loadResults)
+        """
+        record = self.lookup(config, symbols, mode)
+        # Run is simulated again if its arrays were deleted
+        arraysMissing = self.saveArrays and record is not None and record.get("Values") is not None and not self.loadable(record)
+        if record is not None and not arraysMissing:
+            record.update({"Cached":True})
+            return record, None
+
+        simulationResults, timings = timedSimulate(config, symbols, self.lean)
+
+        # Signal power is too low for amplifier detection (stored too, the same configuration fails again)
+        values = None
+        if simulationResults.get("recieverSignal") is not None:
+            generalParameters = dict(config.general.toDict(), Symbols=symbols)
+            start = time.perf_counter()
+            values = getValues(simulationResults, generalParameters, mode=mode)
+            timings.update({"Values":time.perf_counter() - start})
+
+        record = self.store(config, symbols, mode, values, timings, simulationResults)
+        record.update({"Cached":False})
+
+        return record, simulationResults
+
+
+    def store(self, config: SimulationConfig, symbols: int, mode: str, values: dict | None, timings: dict, simulationResults: dict | None = None) -> dict:
+        """
+        Stores run (replaces older run with the same key).
+
+        Returns
+        -----
+        record of run
+        """
+        key = runKey(config, symbols, mode, self.lean)
+
+        arrays = None
+        if self.saveArrays and simulationResults is not None and values is not None:
+            os.makedirs(self.arraysDirectory, exist_ok=True)
+            arrays = os.path.join(self.arraysDirectory, f"{key}.npz")
+            np.savez(arrays, **simulationResults)
+
+        general, modulator, reciever = config.general, config.modulator, config.reciever
+
+        self.connection.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                (key, config.digest(), general.format, general.order, general.symbolRate, general.samplesPerSymbol, general.polarizations,
+                                 modulator.type, config.source.power, config.channel.length, reciever.type, int(config.includeAmplifier),
+                                 int(symbols), mode, json.dumps(jsonValue(config.toDicts())), json.dumps(jsonValue(values)),
+                                 json.dumps(timings), arrays, time.time()))
+        self.connection.commit()
+
+        return self.lookup(config, symbols, mode)
+
+
+    def find(self, **conditions) -> list[dict]:
+        """
+        Stored runs with given values of swept parameters (keys of LEDGER_COLUMNS), e.g. find(Format="qam", Order=16).
+
+        Returns
+        -----
+        list of records (the newest first)
+        """
+        if any(key not in LEDGER_COLUMNS for key in conditions): raise Exception("Unexpected error")
+
+        where = " AND ".join(f"{LEDGER_COLUMNS.get(key)} = ?" for key in conditions) or "1"
+        rows = self.connection.execute(f"SELECT * FROM runs WHERE {where} ORDER BY created DESC", tuple(conditions.values())).fetchall()
+
+        return [self.record(row) for row in rows]
+
+
+    def record(self, row: sqlite3.Row) -> dict:
+        """
+        Converts database row to record.
+
+        Returns
+        -----
+        Key, Digest (configuration digest), Parameters (dictionaries of toDicts), Values (getValues output, None for undetected signal),
+        Timings (stage timings [s]), Arrays (path of .npz file or None), Created (unix time) and swept parameters (keys of LEDGER_COLUMNS)
+        """
+        record = {key:row[column] for key, column in LEDGER_COLUMNS.items()}
+        record.update({"Amplifier":bool(record.get("Amplifier"))})
+
+        values = json.loads(row["runValues"])
+        record.update({"Key":row["key"], "Digest":row["configDigest"], "Parameters":json.loads(row["config"]),
+                       "Values":None if values is None else fromJsonValue(values), "Timings":json.loads(row["timings"]),
+                       "Arrays":row["arrays"], "Created":row["created"]})
+
+        return record
+
+
+    def loadable(self, record: dict) -> bool:
+        """
+        True: arrays of stored run can be loaded
+        """
+        return record.get("Arrays") is not None and os.path.exists(record.get("Arrays"))
+
+
+    def loadResults(self, record: dict) -> dict | None:
+        """
+        Loads simulation arrays of stored run.
+
+        Returns
+        -----
+        simulationResults (same keys as simulate output)
+
+        None: arrays weren't saved or file was deleted
+        """
+        if not self.loadable(record):
+            return None
+
+        with np.load(record.get("Arrays")) as arrays:
+            return {key:arrays[key] for key in arrays.files}
@@ -0,0 +1,122 @@
+"""
+Automatic selection of samples per symbol.
+The lowest oversampling is chosen so that the widest signal in the simulation still fits below Nyquist frequency (Fs/2).
+Fewer samples per symbol means proportionally fewer samples thru every stage of simulation.
+Results aren't the same as with fixed oversampling: white noise (ASE, noise of ideal reciever) is simulated over whole Fs
+and NRZ pulses at low oversampling lose their edges, so automatic selection is optional (default SpS is 8).
+Reciever DSP can run with fewer samples per symbol ("RxSpS") when reciever filter is narrower than the widest signal
+(ideal reciever without filter keeps all samples).
+"""
+
+import numpy as np
+
+# Lower and upper limit of automatic samples per symbol
+MIN_SPS = 2
+MAX_SPS = 32
+# Lower limit of samples per symbol of reciever DSP (timing recovery and eye diagram)
+MIN_RX_SPS = 2
+# Nyquist frequency of reciever DSP related to reciever filter bandwidth (transition band of anti-aliasing filter of decimation
+# must be above filter, otherwise signal and noise at the edge of filter are attenuated)
+DECIMATION_MARGIN = 1.25
+# Part of Lorentzian spectrum of laser phase noise included in signal bandwidth [linewidths]
+LINEWIDTH_FACTOR = 10
+
+def detectedBandwidth(generalParameters: dict, sourceParameters: dict, channelParameters: dict, recieverParameters: dict) -> float:
+    """
+    One-sided bandwidth of signals before reciever filter [Hz].
+
+    NRZ symbols take main lobe of spectrum (Rs), laser phase noise widens optical spectrum by its linewidth.
+    Square-law detection of field changed by dispersion or nonlinearity creates beat frequencies up to double optical bandwidth.
+    """
+    Rs = generalParameters.get("Rs")
+
+    linewidth = 0 if sourceParameters.get("Ideal") else float(sourceParameters.get("Linewidth") or 0)
+    opticalBandwidth = Rs + LINEWIDTH_FACTOR * linewidth
+
+    dispersive = not channelParameters.get("Ideal") and float(channelParameters.get("Length") or 0) > 0 and (
+        float(channelParameters.get("Dispersion") or 0) > 0 or channelParameters.get("Nonlinear", False))
+
+    if recieverParameters.get("Type") == "Photodiode" and dispersive:
+        return 2 * opticalBandwidth
+    else:
+        return opticalBandwidth
+
+
+def recieverBandwidth(recieverParameters: dict) -> float | None:
+    """
+    Bandwidth of reciever filter [Hz] (None for ideal reciever).
+    """
+    bandwidth = recieverParameters.get("Bandwidth")
+
+    if recieverParameters.get("Ideal") or bandwidth in (None, "inf"):
+        return None
+
+    return float(bandwidth)
+
+
+def signalBandwidth(generalParameters: dict, sourceParameters: dict, channelParameters: dict, recieverParameters: dict) -> float:
+    """
+    One-sided bandwidth of the widest signal in simulation [Hz] (reciever filter must be below Nyquist frequency too).
+    """
+    bandwidth = detectedBandwidth(generalParameters, sourceParameters, channelParameters, recieverParameters)
+
+    if recieverBandwidth(recieverParameters) is not None:
+        bandwidth = max(bandwidth, recieverBandwidth(recieverParameters))
+
+    return bandwidth
+
+
+def oversampling(bandwidth: float, Rs: float, minimum: int, maximum: int, recieverParameters: dict) -> int:
+    """
+    Samples per symbol for Fs >= 2 * bandwidth between minimum and maximum (even for Gardner timing recovery).
+    """
+    SpS = int(np.ceil(2 * bandwidth / Rs - 1e-9))
+    SpS = min(max(SpS, minimum), maximum)
+
+    # Gardner detector needs middle sample between symbols
+    if recieverParameters.get("TimingRecovery", "Fixed") == "Gardner" and SpS % 2:
+        SpS = SpS + 1 if SpS < maximum else SpS - 1
+
+    return SpS
+
+
+def adaptiveSpS(generalParameters: dict, sourceParameters: dict, channelParameters: dict, recieverParameters: dict) -> int:
+    """
+    Minimum samples per symbol of transmitter, channel and detection (Fs >= 2 * signalBandwidth).
+
+    Parameters
+    -----
+    generalParameters: Rs is needed
+
+    Returns
+    -----
+    SpS between MIN_SPS and MAX_SPS
+    """
+    bandwidth = signalBandwidth(generalParameters, sourceParameters, channelParameters, recieverParameters)
+
+    return oversampling(bandwidth, generalParameters.get("Rs"), MIN_SPS, MAX_SPS, recieverParameters)
+
+
+def adaptiveRxSpS(generalParameters: dict, sourceParameters: dict, channelParameters: dict, recieverParameters: dict, SpS: int) -> int:
+    """
+    Minimum samples per symbol of reciever DSP. Detected signal is limited by reciever filter, so it is decimated after detection
+    (Nyquist frequency stays at least DECIMATION_MARGIN times filter bandwidth, so decimation doesn't change filtered signal and noise).
+
+    Parameters
+    -----
+    SpS: samples per symbol of simulation (upper limit)
+
+    Returns
+    -----
+    RxSpS between MIN_RX_SPS and SpS
+
+    SpS: ideal reciever (without filter)
+    """
+    bandwidth = recieverBandwidth(recieverParameters)
+
+    # Ideal reciever doesn't filter detected signal, its noise (e.g. ASE) is white over whole Fs
+    # and anti-aliasing filter of decimation would remove part of it
+    if bandwidth is None:
+        return SpS
+
+    return oversampling(DECIMATION_MARGIN * bandwidth, generalParameters.get("Rs"), min(MIN_RX_SPS, SpS), SpS, recieverParameters)
@@ -0,0 +1,201 @@
+"""
+Sensitivity curves (BER vs OSNR, BER vs received power).
+
+Transmitter and channel are simulated once without amplifier (noiseless received field). Every point of curve only scales the field
+to received power, adds ASE noise calibrated to OSNR (white noise over simulation bandwidth as in edfa model) and runs reciever.
+Points are computed in parallel threads sharing the noiseless field. Every point uses the same noise realizations (only scaled),
+so curves are smooth even with short symbol sequence, and unit noise blocks are generated only once (common random numbers).
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from optic.dsp.core import signal_power
+from optic.utils import dBm2W
+
+from scripts.simulation import simulateTransmitter, fiberTransmition, simulateReciever, getValues
+from scripts.simulation_parameters import asDict
+from scripts.noise import seedRandom, seedNoise, localNoise, commonRandomNumbers
+
+# Reference bandwidth of OSNR [Hz] (0.1 nm at 1550 nm)
+OSNR_BANDWIDTH = 12.5e9
+# Number of simulated symbols of curve
+CURVE_SYMBOLS = 10**5
+# Number of threads computing points of curve
+CURVE_WORKERS = os.cpu_count() or 1
+
+def noiselessField(generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict, seed: int = 123) -> dict:
+    """
+    Simulates transmitter and channel without amplifier (transmitter keeps its laser noise).
+
+    Returns
+    -----
+    transmitterResults with recieverSignal (noiseless received field) and noiseBlocks (numbers of noise blocks drawn by transmitter)
+    """
+    seedRandom(seed)
+    results = simulateTransmitter(generalParameters, sourceParameters, modulatorParameters)
+
+    frequency = sourceParameters.get("Frequency")*10**12
+    results.update(fiberTransmition(channelParameters, {}, results.get("modulatedSignal"), generalParameters.get("Fs"), frequency, False))
+    results.update({"noiseBlocks":dict(localNoise().blocks)})
+
+    return results
+
+
+def aseVariance(field, osnr: float, Fs: float) -> float:
+    """
+    Variance of ASE noise of every polarization row of field for given OSNR.
+    OSNR is signal power related to ASE power of both polarizations in OSNR_BANDWIDTH.
+
+    Parameters
+    -----
+    osnr: OSNR [dB]
+
+    Fs: sampling frequency (bandwidth of white ASE noise)
+    """
+    # Power spectral density of ASE in one polarization
+    N_ase = signal_power(field.T) / (2 * 10**(osnr / 10) * OSNR_BANDWIDTH)
+
+    return N_ase * Fs
+
+
+def curvePoint(results: dict, point: tuple, generalParameters: dict, sourceParameters: dict, channelParameters: dict, recieverParameters: dict,
+               mode: str, seed: int) -> dict:
+    """
+    Reciever simulation of one point of curve (runs in worker thread).
+
+    Parameters
+    -----
+    results: output of noiselessField
+
+    point: (OSNR [dB] or None = without ASE, received power [dBm] or None = power at the end of channel)
+
+    Returns
+    -----
+    values from getValues with OSNR and Power keys
+    """
+    osnr, power = point
+    field = results.get("recieverSignal")
+
+    # Noise of every point starts from the same seed (noise source of thread), streams continue after blocks of transmitter
+    # (independent local oscillator draws its own laser noise, not the noise of transmitter laser)
+    seedNoise(seed, results.get("noiseBlocks"))
+
+    if power is not None:
+        field = field * np.sqrt(dBm2W(power) / signal_power(field.T))
+
+    if osnr is not None:
+        field = field + localNoise().complexGaussian("ase", field.shape, aseVariance(field, osnr, generalParameters.get("Fs")))
+
+    pointResults = dict(results, recieverSignal=field)
+    pointResults.update(simulateReciever(generalParameters, sourceParameters, channelParameters, recieverParameters, field, results))
+
+    values = getValues(pointResults, generalParameters, mode=mode)
+    values.update({"OSNR":osnr, "Power":values.get("powerRxdBm") if power is None else power})
+
+    return values
+
+
+def sensitivityCurve(points: list, generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict,
+                     recieverParameters: dict, symbols: int = CURVE_SYMBOLS, mode: str = "count", workers: int = CURVE_WORKERS, seed: int = 123) -> list[dict]:
+    """
+    Values of curve points computed from one noiseless received field.
+
+    Parameters
+    -----
+    points: list of (OSNR [dB] or None, received power [dBm] or None), see curvePoint
+
+    mode: mode of getValues ("count" / "estimate")
+
+    workers: number of threads computing points
+
+    Returns
+    -----
+    list of values of points (getValues output with OSNR and Power keys)
+    """
+    generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters = [
+        asDict(parameters) for parameters in (generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters)]
+    generalParameters = dict(generalParameters, Symbols=symbols)
+
+    results = noiselessField(generalParameters, sourceParameters, modulatorParameters, channelParameters, seed)
+
+    # Unit noise blocks shared by all points (threads)
+    commonNoise = {}
+
+    def compute(point: tuple) -> dict:
+        with commonRandomNumbers(commonNoise):
+            return curvePoint(results, point, generalParameters, sourceParameters, channelParameters, recieverParameters, mode, seed)
+
+    if workers == 1:
+        return [compute(point) for point in points]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(compute, points))
+
+
+def osnrCurve(osnrValues, generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict,
+              recieverParameters: dict, power: float | None = None, **options) -> list[dict]:
+    """
+    BER vs OSNR curve (optically preamplified reciever).
+
+    Parameters
+    -----
+    osnrValues: OSNR values [dB]
+
+    power: received power [dBm] of all points (None = power at the end of channel)
+
+    options: symbols, mode, workers, seed (see sensitivityCurve)
+
+    Returns
+    -----
+    list of values of points (see sensitivityCurve)
+    """
+    return sensitivityCurve([(float(osnr), power) for osnr in osnrValues], generalParameters, sourceParameters, modulatorParameters,
+                            channelParameters, recieverParameters, **options)
+
+
+def powerCurve(powers, generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict,
+               recieverParameters: dict, osnr: float | None = None, **options) -> list[dict]:
+    """
+    BER vs received power curve (reciever noise limited, optional constant OSNR).
+
+    Parameters
+    -----
+    powers: received powers [dBm]
+
+    osnr: OSNR [dB] of all points (None = without ASE)
+
+    options: symbols, mode, workers, seed (see sensitivityCurve)
+
+    Returns
+    -----
+    list of values of points (see sensitivityCurve)
+    """
+    return sensitivityCurve([(osnr, float(power)) for power in powers], generalParameters, sourceParameters, modulatorParameters,
+                            channelParameters, recieverParameters, **options)
+
+
+def requiredValue(curve: list, axis: str, target: float = 1e-3) -> float | None:
+    """
+    Sensitivity (required OSNR or received power) for target BER, log10(BER) is interpolated linearly between points.
+    Points without errors are skipped (mode="estimate" of curve gives BER below counting limit).
+
+    Parameters
+    -----
+    curve: output of osnrCurve / powerCurve
+
+    axis: "OSNR" / "Power"
+
+    Returns
+    -----
+    required value
+
+    None: target isn't crossed by curve
+    """
+    points = sorted((point.get(axis), point.get("BER")) for point in curve if point.get("BER") > 0)
+
+    for (x1, ber1), (x2, ber2) in zip(points, points[1:]):
+        if ber1 >= target > ber2:
+            return x1 + (x2 - x1) * (np.log10(target) - np.log10(ber1)) / (np.log10(ber2) - np.log10(ber1))
+
+    return None
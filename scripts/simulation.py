@@ -3,28 +3,49 @@ Simulation process.
 """
 
 import numpy as np
+from copy import copy
 from optic.utils import parameters
 import matplotlib.pyplot as plt
 from commpy.utilities  import upsample
-from optic.models.devices import mzm, photodiode, basicLaserModel, iqm, coherentReceiver, pm
-from optic.models.channels import linearFiberChannel
+from optic.models.devices import mzm, iqm, pm
 from optic.comm.modulation import modulateGray, GrayMapping, demodulateGray
 from optic.dsp.core import pulseShape, pnorm, signal_power
 from optic.comm.metrics import fastBERcalc
-try:
-    from optic.dsp.coreGPU import firFilter    
-except ImportError:
-    from optic.dsp.core import firFilter
 
-from scripts.my_models import edfa, idealLaser
+from scripts.my_models import edfa, idealLaser, laserModel, photodiode, coherentReceiver
 from scripts.my_plot import eyediagram, constellation, opticalSpectrum, electricalInTime, opticalInTime
 from scripts.other_functions import calculateTransSpeed
-from scripts.my_models import attenuationChannel
-
-def simulate(generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict, recieverParameters: dict, amplifierParameters: dict, includeAmplifier: bool) -> dict:
+from scripts.my_models import attenuationChannel, linearFiberChannel, nonlinearFiberChannel, pmdChannel, GAMMA
+from scripts.my_dsp import cdCompensation, phaseRecovery, blockLMSEqualizer, mimoEqualizer, trainingLength, samplingPhase, gardnerTiming, decimateSignal, CPR_WINDOW, EQ_STEP
+from scripts.simulation_parameters import asDict
+from scripts.alignment import alignSymbols
+from scripts.fft_backend import fftConvolve, reducedSpectrum
+from scripts.ber_estimation import estimateErrors, ESTIMATE_SYMBOLS
+from scripts.workspace import localWorkspace
+from scripts.noise import seedRandom
+
+# Number of symbols of sampled signals kept in lean results (time plots and eye diagrams)
+LEAN_SYMBOLS = 2000
+# Number of bins of optical spectra kept in lean results
+LEAN_SPECTRUM_BINS = 4096
+# Sampling frequency of spectrum plots
+SPECTRUM_FS = 10**12
+
+def simulate(generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict, recieverParameters: dict, amplifierParameters: dict, includeAmplifier: bool,
+             lean: bool = False) -> dict:
     """
     Simulate communication.
 
+    Parameters
+    -----
+    Parameters can be dictionaries or parameters objects (simulation_parameters module).
+
+    generalParameters: optional "Polarizations" key (1 / 2), dual polarization signals are arrays (2, N) with one row per polarization,
+        optional "Seed" key sets seed of random numbers (default 123)
+
+    lean: lean results mode, sampled signals are replaced by their plot windows as soon as next stage used them (see leanSignal),
+        peak memory is given by the largest stage instead of all signals, buffers of workspace are freed after simulation
+
     Returns
     -----
     simulationResults: bitsTx, symbolsTx, modulationSignal, carrierSignal, modulatedSignal, recieverSignal, detectedSignal, symbolsRx, bitsRx
@@ -32,12 +53,68 @@ def simulate(generalParameters: dict, sourceParameters: dict, modulatorParameter
     ! error with detection of amplifier and signal power => recieverSignal is None
     """
 
-    # Each time random numbers
-    np.random.seed(seed=123)
+    # Parameters objects to dictionaries
+    generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters = [
+        asDict(parameters) for parameters in (generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters)]
+
+    # Each time the same random numbers
+    seedRandom(generalParameters.get("Seed", 123))
+
+    # Output dictionary
+    # Adds bitsTx, symbolsTx, modulationSignal, carrierSignal, modulatedSignal
+    simulationResults = simulateTransmitter(generalParameters, sourceParameters, modulatorParameters)
+    # Modulation signal was used by modulator
+    if lean:
+        leanSignal(simulationResults, "modulationSignal", generalParameters.get("SpS"))
+    # Adds recieverSignal, detectedSignal, symbolsRx, bitsRx (lean mode: transmitter results are handed over and returned with plot windows)
+    simulationResults.update(simulateLink(generalParameters, sourceParameters, channelParameters, recieverParameters, amplifierParameters, includeAmplifier,
+                                          handOver(simulationResults) if lean else simulationResults, lean))
+
+    # Temporary signals aren't kept between lean runs
+    if lean:
+        localWorkspace().clear()
+
+    return simulationResults
+
+
+def leanSignal(simulationResults: dict, key: str, SpS: int, spectrum: bool = False):
+    """
+    Lean results mode. Replaces full signal in simulation results with its first LEAN_SYMBOLS symbols (plot window)
+    and adds its power ("<key>Power" key) and optionally reduced spectrum ("<key>Spectrum" key, X polarization, LEAN_SPECTRUM_BINS bins).
+    Full array is freed unless it is referenced elsewhere.
+
+    Parameters
+    -----
+    SpS: samples per symbol of signal
+    """
+    signal = simulationResults.get(key)
+
+    simulationResults.update({key:signal[..., :LEAN_SYMBOLS * SpS].copy(), key + "Power":signal_power(signal.T)})
+
+    if spectrum:
+        simulationResults.update({key + "Spectrum":np.array(reducedSpectrum(signal[0] if signal.ndim == 2 else signal, SPECTRUM_FS, LEAN_SPECTRUM_BINS))})
+
+
+def handOver(results: dict) -> dict:
+    """
+    Lean results mode. Moves all items of results to new dictionary (results are emptied).
+    Stage called with the new dictionary then keeps the only references of signals, so it can free them as soon as they were used.
+    """
+    moved = dict(results)
+    results.clear()
+
+    return moved
+
+
+def simulateTransmitter(generalParameters: dict, sourceParameters: dict, modulatorParameters: dict) -> dict:
+    """
+    Simulate transmitter part of communication (information source, optical source and modulator).
 
+    Returns
+    -----
+    bitsTx, symbolsTx, modulationSignal, carrierSignal, modulatedSignal
+    """
     Fs = generalParameters.get("Fs")
-    # Correct units (THz -> Hz)
-    frequency = sourceParameters.get("Frequency")*10**12
 
     # Output dictionary
     simulationResults = {}
@@ -48,17 +125,115 @@ def simulate(generalParameters: dict, sourceParameters: dict, modulatorParameter
     simulationResults.update(carrierSignal(sourceParameters, Fs, simulationResults.get("modulationSignal")))
     # Adds modulatedSignal
     simulationResults.update(modulate(modulatorParameters, simulationResults.get("modulationSignal"), simulationResults.get("carrierSignal"), generalParameters))
+
+    return simulationResults
+
+
+def simulateLink(generalParameters: dict, sourceParameters: dict, channelParameters: dict, recieverParameters: dict, amplifierParameters: dict, includeAmplifier: bool, transmitterResults: dict,
+                 lean: bool = False) -> dict:
+    """
+    Simulate transmission channel and reciever part of communication.
+
+    Parameters
+    -----
+    transmitterResults: output of simulateTransmitter (isn't changed)
+
+    lean: lean results mode (see simulate), signals of transmitterResults are freed only if caller doesn't keep them (see handOver)
+
+    Returns
+    -----
+    recieverSignal, detectedSignal, symbolsRx, bitsRx
+
+    lean mode: also transmitterResults with modulatedSignal and carrierSignal replaced by plot windows
+
+    ! error with detection of amplifier and signal power => recieverSignal is None
+    """
+    Fs = generalParameters.get("Fs")
+    # Correct units (THz -> Hz)
+    frequency = sourceParameters.get("Frequency")*10**12
+
+    # Signals of transmitter are replaced in copy
+    if lean:
+        transmitterResults = dict(transmitterResults)
+
+    # Output dictionary
+    simulationResults = {}
+
     # Adds recieverSignal
-    simulationResults.update(fiberTransmition(channelParameters, amplifierParameters, simulationResults.get("modulatedSignal"), Fs, frequency, includeAmplifier))
+    simulationResults.update(fiberTransmition(channelParameters, amplifierParameters, transmitterResults.get("modulatedSignal"), Fs, frequency, includeAmplifier))
     
     # Error with amplifier detection (signal is too low)
     if simulationResults.get("recieverSignal") is None:
-        return simulationResults
+        return dict(transmitterResults, **simulationResults) if lean else simulationResults
+
+    recieverSignal = simulationResults.get("recieverSignal")
+
+    # Modulated signal was used by channel, only reciever keeps full reciever signal
+    if lean:
+        leanSignal(transmitterResults, "modulatedSignal", generalParameters.get("SpS"), spectrum=True)
+        leanSignal(simulationResults, "recieverSignal", generalParameters.get("SpS"), spectrum=True)
     
+    # Adds detectedSignal, symbolsRx, bitsRx (lean mode: also transmitter results, carrier signal is freed by reciever)
+    simulationResults.update(simulateReciever(generalParameters, sourceParameters, channelParameters, recieverParameters, recieverSignal,
+                                              handOver(transmitterResults) if lean else transmitterResults, lean))
+
+    return simulationResults
+
+
+def simulateReciever(generalParameters: dict, sourceParameters: dict, channelParameters: dict, recieverParameters: dict, recieverSignal, transmitterResults: dict,
+                     lean: bool = False) -> dict:
+    """
+    Simulate reciever part of communication (detection and digital signal processing).
+
+    Parameters
+    -----
+    recieverSignal: optical signal at reciever
+
+    transmitterResults: output of simulateTransmitter (carrierSignal and symbolsTx are used, isn't changed)
+
+    lean: lean results mode (see simulate), carrier signal is freed only if caller doesn't keep it (see handOver)
+
+    Returns
+    -----
+    detectedSignal (sampled with RxSpS, see recieverRate), symbolsRx, TrainingSymbols (see equalization), bitsRx
+
+    lean mode: also transmitterResults with carrierSignal replaced by plot window
+    """
+    Fs = generalParameters.get("Fs")
+    # Sampling of reciever DSP
+    recieverGeneral = recieverRate(generalParameters)
+    # Correct units (THz -> Hz)
+    frequency = sourceParameters.get("Frequency")*10**12
+
+    # Carrier signal is replaced in copy, copy of transmitter results is returned
+    if lean:
+        transmitterResults = dict(transmitterResults)
+
+    # Output dictionary
+    simulationResults = transmitterResults if lean else {}
+
     # Adds detectedSignal
-    simulationResults.update(detection(recieverParameters, simulationResults.get("recieverSignal"), simulationResults.get("carrierSignal"), generalParameters))
-    # Adds symbolsRx, bitsRx
-    simulationResults.update(restoreInformation(simulationResults.get("detectedSignal"), generalParameters))
+    referentSignal = localOscillator(recieverParameters, sourceParameters, transmitterResults.get("carrierSignal"), Fs)
+    # Carrier signal was used by local oscillator
+    if lean:
+        leanSignal(transmitterResults, "carrierSignal", generalParameters.get("SpS"), spectrum=True)
+    simulationResults.update(detection(recieverParameters, recieverSignal, referentSignal, generalParameters))
+    referentSignal = None
+    # Replaces detectedSignal (decimation to sampling frequency of reciever DSP)
+    simulationResults.update(decimation(simulationResults.get("detectedSignal"), generalParameters))
+    # Replaces detectedSignal (optional dispersion compensation of coherent reciever)
+    simulationResults.update(dispersionCompensation(recieverParameters, channelParameters, simulationResults.get("detectedSignal"), recieverGeneral.get("Fs"), frequency))
+    # Adds symbolsRx
+    simulationResults.update(sampleSymbols(simulationResults.get("detectedSignal"), recieverGeneral, recieverParameters.get("TimingRecovery", "Fixed")))
+    # Detected signal was sampled
+    if lean:
+        leanSignal(simulationResults, "detectedSignal", recieverGeneral.get("SpS"))
+    # Replaces symbolsRx, adds TrainingSymbols (optional adaptive equalizer)
+    simulationResults.update(equalization(recieverParameters, simulationResults.get("symbolsRx"), transmitterResults.get("symbolsTx"), generalParameters))
+    # Replaces symbolsRx (optional carrier phase recovery of coherent reciever)
+    simulationResults.update(carrierRecovery(recieverParameters, simulationResults.get("symbolsRx"), generalParameters))
+    # Adds bitsRx
+    simulationResults.update(decideSymbols(simulationResults.get("symbolsRx"), generalParameters))
 
     return simulationResults
 
@@ -67,16 +242,21 @@ def modulationSignal(generalParameters: dict) -> dict:
     """
     Generate electrical modulation signal (voltage).
 
+    Parameters
+    -----
+    generalParameters: optional "Symbols" key sets number of symbols (default 10^6), optional "Polarizations" key (default 1)
+
     Returns
     -----
-        bitsTx, symbolsTx, modulationSignal
+        bitsTx, symbolsTx, modulationSignal (rows of 2-D arrays for dual polarization)
     """
     SpS = generalParameters.get("SpS")
     modulationOrder = generalParameters.get("Order")
     modulationFormat = generalParameters.get("Format")
+    polarizations = generalParameters.get("Polarizations", 1)
     
     # Generate pseudo-random bit sequence
-    bitsTx = np.random.randint(2, size=int(np.log2(modulationOrder)*1e6))
+    bitsTx = np.random.randint(2, size=int(np.log2(modulationOrder)*generalParameters.get("Symbols", 10**6)*polarizations))
 
     # Generate modulated symbol sequence
     symbolsTx = modulateGray(bitsTx, modulationOrder, modulationFormat)
@@ -86,12 +266,17 @@ def modulationSignal(generalParameters: dict) -> dict:
     # Upsampling
     symbolsUp = upsample(symbolsTx, SpS)
 
+    # One row per polarization
+    if polarizations == 2:
+        bitsTx, symbolsTx, symbolsUp = [array.reshape(2, -1) for array in (bitsTx, symbolsTx, symbolsUp)]
+    elif polarizations != 1: raise Exception("Unexpected error")
+
     # Typical NRZ pulse
     pulse = pulseShape("nrz", SpS)
     pulse = pulse/max(abs(pulse))
 
-    # Pulse shaping
-    signalTx = firFilter(pulse, symbolsUp)
+    # Pulse shaping (FFT convolution)
+    signalTx = fftConvolve(symbolsUp, pulse)
 
     return {"bitsTx":bitsTx, "symbolsTx":symbolsTx, "modulationSignal":signalTx}
 
@@ -104,7 +289,7 @@ def carrierSignal(sourceParameters: dict, Fs: int, modulationSignal) -> dict:
     -----
     Fs: sample frequency
 
-    modulationSignal: to match both signals lengths
+    modulationSignal: to match both signals lengths (one laser for both polarizations)
 
     Returns
     -----
@@ -113,7 +298,7 @@ def carrierSignal(sourceParameters: dict, Fs: int, modulationSignal) -> dict:
     # Ideal source
     if sourceParameters.get("Ideal"):
         power = sourceParameters.get("Power")
-        samples = len(modulationSignal)
+        samples = modulationSignal.shape[-1]
         
         return{"carrierSignal":idealLaser(power, samples)}
     
@@ -126,20 +311,24 @@ def carrierSignal(sourceParameters: dict, Fs: int, modulationSignal) -> dict:
         paramLaser.P = sourceParameters.get("Power")   # laser power [dBm]
         paramLaser.lw = sourceParameters.get("Linewidth")    # laser linewidth [Hz]
         paramLaser.Fs = Fs  # sampling rate [symbols/s]
-        paramLaser.Ns = len(modulationSignal)   # number of signal samples
+        paramLaser.Ns = modulationSignal.shape[-1]   # number of signal samples
         paramLaser.RIN_var = rin # RIN
 
-        return {"carrierSignal":basicLaserModel(paramLaser)}
+        return {"carrierSignal":laserModel(paramLaser)}
 
 
 def modulate(modulatorParameters: dict, modulationSignal, carrierSignal, generalParameters: dict) -> dict:
     """
     Modulates carrier signal.
+    Dual polarization modulation signal (2, N) => carrier is split to both polarizations and both modulators work at once.
 
     Returns
     -----
     modulatedSignal
     """
+    # Polarization beam splitter
+    if modulationSignal.ndim == 2:
+        carrierSignal = np.broadcast_to(carrierSignal / np.sqrt(2), modulationSignal.shape)
 
     if modulatorParameters.get("Type") == "PM":
         return {"modulatedSignal":pm(carrierSignal, modulationSignal, 2)}
@@ -165,7 +354,10 @@ def modulate(modulatorParameters: dict, modulationSignal, carrierSignal, general
         paramIQM.VbQ = -2
         paramIQM.Vphi = 1
 
-        return {"modulatedSignal":iqm(carrierSignal*np.sqrt(2), modulationSignal, paramIQM)}
+        # Carrier of IQM branches (temporary signal in workspace buffer)
+        carrierIQM = np.multiply(carrierSignal, np.sqrt(2), out=localWorkspace().array("carrierIQM", modulationSignal.shape, np.result_type(carrierSignal)))
+
+        return {"modulatedSignal":iqm(carrierIQM, modulationSignal, paramIQM)}
     else: raise Exception("Unexpected error")
 
 
@@ -183,14 +375,15 @@ def fiberTransmition(fiberParameters: dict, amplifierParameters: dict, modulated
     -----
     recieverSignal: signal at reciever
     """
-    dispersion = fiberParameters.get("Dispersion")
-
     paramCh = parameters()
     paramCh.L = fiberParameters.get("Length")         # total link distance
     paramCh.alpha = fiberParameters.get("Attenuation")        # fiber loss parameter [dB/km]
-    paramCh.D = dispersion         # fiber dispersion parameter [ps/nm/km]
+    paramCh.D = fiberParameters.get("Dispersion")         # fiber dispersion parameter [ps/nm/km]
     paramCh.Fc = frequency # central optical frequency [Hz]
     paramCh.Fs = Fs        # simulation sampling frequency [samples/second]
+    paramCh.nonlinear = fiberParameters.get("Nonlinear", False)   # Kerr nonlinearity (split-step Fourier method)
+    paramCh.gamma = fiberParameters.get("Gamma", GAMMA)   # fiber nonlinear parameter [1/W/km]
+    paramCh.pmd = fiberParameters.get("PMD", 0)   # PMD parameter of dual polarization signal [ps/sqrt(km)]
 
     # Channel has amplifier
     if includeAmplifier:
@@ -202,15 +395,39 @@ def fiberTransmition(fiberParameters: dict, amplifierParameters: dict, modulated
         if fiberParameters.get("Ideal"):
             recieverSignal = modulatedSignal
         else:
-            # Channel with only attenuation
-            if dispersion == 0:
-                recieverSignal = attenuationChannel(modulatedSignal, paramCh)
-            else:
-                recieverSignal = linearFiberChannel(modulatedSignal, paramCh)
+            recieverSignal = fiberChannel(modulatedSignal, paramCh)
             
     return {"recieverSignal":recieverSignal}
 
 
+def fiberChannel(signal, fiberParameters) -> np.ndarray:
+    """
+    Simulates signal thru one section of fiber.
+
+    Parameters
+    -----
+    fiberParameters: parameters() object (nonlinear and gamma attributes select nonlinear channel, pmd attribute adds PMD of dual polarization signal)
+
+    Returns
+    -----
+    signal at the end of fiber
+    """
+    # Kerr nonlinearity
+    if getattr(fiberParameters, "nonlinear", False):
+        signal = nonlinearFiberChannel(signal, fiberParameters)
+    # Channel with only attenuation
+    elif fiberParameters.D == 0:
+        signal = attenuationChannel(signal, fiberParameters)
+    else:
+        signal = linearFiberChannel(signal, fiberParameters)
+
+    # Polarization mode dispersion
+    if signal.ndim == 2 and getattr(fiberParameters, "pmd", 0) > 0:
+        signal = pmdChannel(signal, fiberParameters)
+
+    return signal
+
+
 def amplifierTransmition(fiberParameters, amplifierParameters: dict, idealChannel: bool, modulatedSignal, Fs: int, frequency: float) -> np.ndarray | None:
     """
     Simulates signal thru fiber with amplifier.
@@ -219,6 +436,8 @@ def amplifierTransmition(fiberParameters, amplifierParameters: dict, idealChanne
     -----
     fiberParameters: parameters() object
 
+    amplifierParameters: optional "NoiseScale" key multiplies ASE noise (importance sampling)
+
     Fs: sampling frequency
 
     frequency: central frequency of optical signal [Hz]
@@ -229,14 +448,13 @@ def amplifierTransmition(fiberParameters, amplifierParameters: dict, idealChanne
 
     None: in case there was a error with detection limit of amplifier and signal power
     """
-    dispersion = fiberParameters.D
-
     # Amplifier parameters
     paramEDFA = parameters()
     paramEDFA.G = amplifierParameters.get("Gain")    # edfa gain
     paramEDFA.NF = amplifierParameters.get("Noise")   # edfa noise figure 
     paramEDFA.Fc = frequency
     paramEDFA.Fs = Fs
+    paramEDFA.noiseScale = amplifierParameters.get("NoiseScale", 1)
 
     detectionLimit = amplifierParameters.get("Detection")
     amplifierPosition = amplifierParameters.get("Position")
@@ -257,45 +475,29 @@ def amplifierTransmition(fiberParameters, amplifierParameters: dict, idealChanne
     elif amplifierParameters.get("Ideal") and not(idealChannel):
         # Amplifier at the start of the channel
         if amplifierPosition == "start":
-            modulatedSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA)
+            modulatedSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA, out=localWorkspace().like("amplifiedSignal", modulatedSignal))
 
-            # Channel with only attenuation
-            if dispersion == 0:
-                recieverSignal = attenuationChannel(modulatedSignal, fiberParameters)
-            else:
-                recieverSignal = linearFiberChannel(modulatedSignal, fiberParameters)
+            recieverSignal = fiberChannel(modulatedSignal, fiberParameters)
 
         # Amplifier in the middle of the channel
         elif amplifierPosition == "middle":
             # Lenght needs to be halfed
-            fiberParameters.L = fiberParameters.L / 2
+            fiberParameters = halfChannel(fiberParameters)
 
             # First half
-            # Channel with only attenuation
-            if dispersion == 0:
-                modulatedSignal = attenuationChannel(modulatedSignal, fiberParameters)
-            else:
-                modulatedSignal = linearFiberChannel(modulatedSignal, fiberParameters)
+            modulatedSignal = fiberChannel(modulatedSignal, fiberParameters)
 
-            # Amplifier
-            modulatedSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA)
+            # Amplifier (in-place, output of fiber is new array)
+            modulatedSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA, out=modulatedSignal)
 
             # Second half
-            # Channel with only attenuation
-            if dispersion == 0:
-                recieverSignal = attenuationChannel(modulatedSignal, fiberParameters)
-            else:
-                recieverSignal = linearFiberChannel(modulatedSignal, fiberParameters)
+            recieverSignal = fiberChannel(modulatedSignal, fiberParameters)
 
         # Amplifier at the end of channel
         elif amplifierPosition == "end":
-            # Channel with only attenuation
-            if dispersion == 0:
-                modulatedSignal = attenuationChannel(modulatedSignal, fiberParameters)
-            else:
-                modulatedSignal = linearFiberChannel(modulatedSignal, fiberParameters)
+            modulatedSignal = fiberChannel(modulatedSignal, fiberParameters)
 
-            recieverSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA)
+            recieverSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA, out=modulatedSignal)
         else: raise Exception("Unexpected error")
 
     # Real amplifier with real channel
@@ -306,65 +508,87 @@ def amplifierTransmition(fiberParameters, amplifierParameters: dict, idealChanne
             if not(checkPower(modulatedSignal, detectionLimit)):
                 return
             
-            modulatedSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA)
+            modulatedSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA, out=localWorkspace().like("amplifiedSignal", modulatedSignal))
 
-            # Channel with only attenuation
-            if dispersion == 0:
-                recieverSignal = attenuationChannel(modulatedSignal, fiberParameters)
-            else:
-                recieverSignal = linearFiberChannel(modulatedSignal, fiberParameters)
+            recieverSignal = fiberChannel(modulatedSignal, fiberParameters)
 
         # Amplifier i the middle of the channel
         elif amplifierPosition == "middle":
             # Lenght needs to be halfed
-            fiberParameters.L = fiberParameters.L / 2
+            fiberParameters = halfChannel(fiberParameters)
             
             # First half
-            # Channel with only attenuation
-            if dispersion == 0:
-                modulatedSignal = attenuationChannel(modulatedSignal, fiberParameters)
-            else:
-                modulatedSignal = linearFiberChannel(modulatedSignal, fiberParameters)
+            modulatedSignal = fiberChannel(modulatedSignal, fiberParameters)
             
             # Signal power is too low
             if not(checkPower(modulatedSignal, detectionLimit)):
                 return
 
-            # Amplifier
-            modulatedSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA)
+            # Amplifier (in-place, output of fiber is new array)
+            modulatedSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA, out=modulatedSignal)
 
             # Second half
-            # Channel with only attenuation
-            if dispersion == 0:
-                recieverSignal = attenuationChannel(modulatedSignal, fiberParameters)
-            else:
-                recieverSignal = linearFiberChannel(modulatedSignal, fiberParameters)
+            recieverSignal = fiberChannel(modulatedSignal, fiberParameters)
 
         # Amplifier at the end of the channel
         elif amplifierPosition == "end":
-            # Channel with only attenuation
-            if dispersion == 0:
-                modulatedSignal = attenuationChannel(modulatedSignal, fiberParameters)
-            else:
-                modulatedSignal = linearFiberChannel(modulatedSignal, fiberParameters)
+            modulatedSignal = fiberChannel(modulatedSignal, fiberParameters)
 
             # Signal power is too low
             if not(checkPower(modulatedSignal, detectionLimit)):
                 return
 
-            recieverSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA)
+            recieverSignal = edfa(modulatedSignal, amplifierParameters.get("Ideal"), paramEDFA, out=modulatedSignal)
         else: raise Exception("Unexpected error")
     else: raise Exception("Unexpected error")
 
     return recieverSignal
 
 
+def halfChannel(fiberParameters):
+    """
+    Creates copy of channel parameters() object with half length. Original object isn't changed.
+    """
+    halfParameters = copy(fiberParameters)
+    halfParameters.L = fiberParameters.L / 2
+
+    return halfParameters
+
+
+def localOscillator(recieverParameters: dict, sourceParameters: dict, transmitterCarrier, Fs: int) -> np.ndarray:
+    """
+    Signal of local oscillator for coherent detection.
+
+    Parameters
+    -----
+    recieverParameters: optional "LocalOscillator" key
+        "Transmitter" = carrier signal of transmitter is used (default, phase noise is cancelled)
+
+        "Independent" = laser with the same parameters as source, but with its own phase noise and RIN
+
+    transmitterCarrier: carrier signal of transmitter
+
+    Fs: sampling frequency
+
+    Returns
+    -----
+    referentSignal
+    """
+    if recieverParameters.get("Type") != "Coherent" or recieverParameters.get("LocalOscillator", "Transmitter") == "Transmitter":
+        return transmitterCarrier
+    elif recieverParameters.get("LocalOscillator") == "Independent":
+        return carrierSignal(sourceParameters, Fs, transmitterCarrier).get("carrierSignal")
+    else: raise Exception("Unexpected error")
+
+
 def detection(recieverParameters: dict, recieverSignal, referentSignal, generalParameters: dict) -> dict:
     """
     Convert optical signal back to electrical (current).
 
     Parameters
     ----
+    recieverParameters: optional "NoiseScale" key multiplies shot and thermal noise (importance sampling)
+
     referentSginal: optical signal as a signal from local oscilator for coherent detection
 
     Returns
@@ -373,6 +597,10 @@ def detection(recieverParameters: dict, recieverSignal, referentSignal, generalP
     """
     Fs = generalParameters.get("Fs")
 
+    # Local oscillator is split to both polarizations
+    if recieverSignal.ndim == 2:
+        referentSignal = np.divide(referentSignal, np.sqrt(2), out=localWorkspace().like("referentSignal", referentSignal))
+
     if recieverParameters.get("Type") == "Photodiode":
         # Ideal photodiode
         if recieverParameters.get("Ideal"):
@@ -385,6 +613,7 @@ def detection(recieverParameters: dict, recieverSignal, referentSignal, generalP
             paramPD.B = recieverParameters.get("Bandwidth")
             paramPD.R = recieverParameters.get("Resolution")
             paramPD.Fs = Fs
+            paramPD.noiseScale = recieverParameters.get("NoiseScale", 1)
 
         return {"detectedSignal":photodiode(recieverSignal, paramPD)}
     
@@ -400,40 +629,207 @@ def detection(recieverParameters: dict, recieverSignal, referentSignal, generalP
             paramPD.B = recieverParameters.get("Bandwidth")
             paramPD.R = recieverParameters.get("Resolution")
             paramPD.Fs = Fs
+            paramPD.noiseScale = recieverParameters.get("NoiseScale", 1)
 
         return {"detectedSignal":coherentReceiver(recieverSignal, referentSignal, paramPD)}
 
     else: raise Exception("Unexpected error")
 
 
-def restoreInformation(detectedSignal, generalParameters: dict) -> dict:
+def recieverRate(generalParameters: dict) -> dict:
     """
-    Gets bits information from detected signal.
+    General parameters of reciever DSP.
+
+    Parameters
+    -----
+    generalParameters: optional "RxSpS" key sets samples per symbol of detected signal after decimation (default SpS)
 
     Returns
     -----
-    symbolsRx, bitsRx
+    generalParameters with SpS, Fs and Ts of reciever DSP
     """
     SpS = generalParameters.get("SpS")
+    recieverSpS = generalParameters.get("RxSpS") or SpS
+
+    if not 1 <= recieverSpS <= SpS: raise Exception("Unexpected error")
+
+    Fs = recieverSpS * generalParameters.get("Rs")
+
+    return dict(generalParameters, SpS=recieverSpS, Fs=Fs, Ts=1 / Fs)
+
+
+def decimation(detectedSignal, generalParameters: dict) -> dict:
+    """
+    Decimates detected signal (limited by reciever filter) to samples per symbol of reciever DSP with polyphase resampling.
+
+    Returns
+    -----
+    detectedSignal
+    """
+    return {"detectedSignal":decimateSignal(detectedSignal, generalParameters.get("SpS"), recieverRate(generalParameters).get("SpS"))}
+
+
+def dispersionCompensation(recieverParameters: dict, channelParameters: dict, detectedSignal, Fs: int, frequency: float) -> dict:
+    """
+    Compensates chromatic dispersion of the channel in detected signal (frequency domain equalizer).
+    Used only for coherent reciever with optional "CDCompensation" key and channel with dispersion.
+
+    Parameters
+    -----
+    Fs: sampling frequency
+
+    frequency: central frequency of optical signal [Hz]
+
+    Returns
+    -----
+    detectedSignal
+    """
+    dispersion = channelParameters.get("Dispersion")
+
+    if (not recieverParameters.get("CDCompensation", False) or recieverParameters.get("Type") != "Coherent"
+            or channelParameters.get("Ideal") or dispersion == 0):
+        return {"detectedSignal":detectedSignal}
+
+    return {"detectedSignal":perPolarization(cdCompensation, detectedSignal, Fs, channelParameters.get("Length"), dispersion, frequency)}
+
+
+def equalization(recieverParameters: dict, symbolsRx, symbolsTx, generalParameters: dict) -> dict:
+    """
+    Removes intersymbol interference of PAM symbols with block LMS equalizer (FFE / DFE).
+    Used only for photodiode reciever with optional "EqualizerTaps" key (number of feed-forward taps),
+    "FeedbackTaps" key (number of decision feedback taps) and "StepSize" key.
+    Dual polarization symbols of coherent reciever are demultiplexed with 2x2 equalizer ("EqualizerTaps" and "StepSize" keys).
+
+    Parameters
+    -----
+    symbolsTx: transmitted symbols (training sequence)
+
+    Returns
+    -----
+    symbolsRx, TrainingSymbols (number of the first symbols used for training, they aren't counted by getValues)
+    """
+    taps = recieverParameters.get("EqualizerTaps", 0)
+
+    if taps and recieverParameters.get("Type") == "Coherent" and symbolsRx.ndim == 2:
+        symbolsRx = mimoEqualizer(symbolsRx, symbolsTx, generalParameters.get("Order"), generalParameters.get("Format"), taps,
+                                  recieverParameters.get("StepSize", EQ_STEP))
+
+        return {"symbolsRx":symbolsRx, "TrainingSymbols":trainingLength(symbolsRx.shape[-1])}
+
+    if not taps or recieverParameters.get("Type") != "Photodiode" or generalParameters.get("Format") != "pam":
+        return {"symbolsRx":symbolsRx, "TrainingSymbols":0}
+
+    symbolsRx = blockLMSEqualizer(symbolsRx, symbolsTx, generalParameters.get("Order"), taps, recieverParameters.get("FeedbackTaps", 0),
+                                  recieverParameters.get("StepSize", EQ_STEP))
+
+    return {"symbolsRx":symbolsRx, "TrainingSymbols":trainingLength(symbolsRx.size)}
+
+
+def carrierRecovery(recieverParameters: dict, symbolsRx, generalParameters: dict) -> dict:
+    """
+    Removes phase noise of local oscillator and source from symbols (Viterbi-Viterbi for PSK, blind phase search for QAM).
+    Used only for coherent reciever with optional "PhaseRecovery" key ("PhaseRecoveryWindow" key sets number of averaged symbols).
+
+    Returns
+    -----
+    symbolsRx
+    """
     modulationFormat = generalParameters.get("Format")
-    modulationOrder = generalParameters.get("Order")
 
-    detectedSignal = detectedSignal/np.std(detectedSignal)
-    # Capture samples in the middle of signaling intervals
-    symbolsRx = detectedSignal[0::SpS]
+    if not recieverParameters.get("PhaseRecovery", False) or recieverParameters.get("Type") != "Coherent" or modulationFormat == "pam":
+        return {"symbolsRx":symbolsRx}
+
+    window = recieverParameters.get("PhaseRecoveryWindow", CPR_WINDOW)
+
+    return {"symbolsRx":perPolarization(phaseRecovery, symbolsRx, generalParameters.get("Order"), modulationFormat, window)}
+
+
+def sampleSymbols(detectedSignal, generalParameters: dict, timing: str = "Fixed") -> dict:
+    """
+    Gets normalized symbols from detected signal.
+
+    Parameters
+    -----
+    timing: "Fixed" = first sample of every signaling interval
+
+        "Phase" = sampling phase with maximum variance of samples (eye opening)
+
+        "Gardner" = sampling phase with maximum variance tracked by Gardner timing recovery
+
+    Returns
+    -----
+    symbolsRx
+    """
+    SpS = generalParameters.get("SpS")
+
+    # Normalized signal is temporary (symbols are new array)
+    detectedSignal = np.divide(detectedSignal, np.std(detectedSignal, axis=-1, keepdims=True), out=localWorkspace().like("normalizedSignal", detectedSignal))
+
+    if timing == "Fixed":
+        # Capture samples in the middle of signaling intervals
+        symbolsRx = detectedSignal[..., 0::SpS]
+    elif timing == "Phase":
+        symbolsRx = detectedSignal[..., samplingPhase(detectedSignal, SpS)::SpS]
+    elif timing == "Gardner":
+        symbolsRx = perPolarization(gardnerTiming, detectedSignal, SpS)
+    else: raise Exception("Unexpected error")
+
+    # Subtract DC level and normalize power (every polarization)
+    symbolsRx = symbolsRx - symbolsRx.mean(axis=-1, keepdims=True)
+    symbolsRx = symbolsRx / np.sqrt(np.mean(np.abs(symbolsRx)**2, axis=-1, keepdims=True))
+
+    return {"symbolsRx":symbolsRx}
+
+
+def decideSymbols(symbolsRx, generalParameters: dict) -> dict:
+    """
+    Demodulates symbols to bits.
 
-    # Subtract DC level and normalize power
-    symbolsRx = symbolsRx - symbolsRx.mean()
-    symbolsRx = pnorm(symbolsRx)
+    Returns
+    -----
+    bitsRx
+    """
+    modulationFormat = generalParameters.get("Format")
+    modulationOrder = generalParameters.get("Order")
 
     # Demodulate symbols to bits with minimum Euclidean distance 
     const = GrayMapping(modulationOrder, modulationFormat) # get constellation
     Es = signal_power(const) # calculate the average energy per symbol of the constellation
 
-    # Demodulated bits
-    bitsRx = demodulateGray(np.sqrt(Es)*symbolsRx, modulationOrder, modulationFormat)
+    # Demodulated bits (one row per polarization)
+    bitsRx = demodulateGray(np.sqrt(Es)*symbolsRx.ravel(), modulationOrder, modulationFormat)
+    if symbolsRx.ndim == 2:
+        bitsRx = bitsRx.reshape(symbolsRx.shape[0], -1)
+
+    return {"bitsRx":bitsRx}
+
+
+def perPolarization(function, signal, *arguments) -> np.ndarray:
+    """
+    Applies processing of one signal to every polarization of dual polarization signal (rows of 2-D array).
+    Outputs are shortened to the same length.
+    """
+    if signal.ndim == 1:
+        return function(signal, *arguments)
+
+    rows = [function(row, *arguments) for row in signal]
+    length = min(row.size for row in rows)
+
+    return np.stack([row[:length] for row in rows])
 
-    return {"symbolsRx":symbolsRx, "bitsRx":bitsRx}
+
+def restoreInformation(detectedSignal, generalParameters: dict) -> dict:
+    """
+    Gets bits information from detected signal.
+
+    Returns
+    -----
+    symbolsRx, bitsRx
+    """
+    information = sampleSymbols(detectedSignal, recieverRate(generalParameters))
+    information.update(decideSymbols(information.get("symbolsRx"), generalParameters))
+
+    return information
 
 
 def getPlot(type: str, title: str, simulationResults: dict, generalParameters: dict, sourceParameters: dict)  -> tuple[plt.Figure, plt.Axes]:
@@ -451,6 +847,8 @@ def getPlot(type: str, title: str, simulationResults: dict, generalParameters: d
 
     Ts = generalParameters.get("Ts")
     SpS = generalParameters.get("SpS")
+    # Detected signal is sampled with samples per symbol of reciever DSP
+    recieverGeneral = recieverRate(generalParameters)
 
     # Frequency to Hz
     centralFrequency = sourceParameters.get("Frequency") * 10**12
@@ -463,12 +861,18 @@ def getPlot(type: str, title: str, simulationResults: dict, generalParameters: d
     symbolsTx = simulationResults.get("symbolsTx")
     symbolsRx = simulationResults.get("symbolsRx")
 
+    # Dual polarization: signals of X polarization, constellations of both polarizations
+    carrierSignal, informationSignal, modulatedSignal, recieverSignal, detectedSignal = [
+        signal[0] if signal is not None and signal.ndim == 2 else signal
+        for signal in (carrierSignal, informationSignal, modulatedSignal, recieverSignal, detectedSignal)]
+    symbolsTx, symbolsRx = [symbols.T if symbols is not None and symbols.ndim == 2 else symbols for symbols in (symbolsTx, symbolsRx)]
+
     if type == "electricalTx":
         # Modulation signal
         return electricalInTime(Ts, informationSignal, title)
     elif type == "electricalRx":
         # Detected signal
-        return electricalInTime(Ts, detectedSignal, title)
+        return electricalInTime(recieverGeneral.get("Ts"), detectedSignal, title)
     elif type == "constellationTx":
         # Tx constellation diagram
         return constellation(symbolsTx, whiteb=False, title="Tx symbols")
@@ -477,13 +881,13 @@ def getPlot(type: str, title: str, simulationResults: dict, generalParameters: d
         return constellation(symbolsRx, whiteb=False, title="Rx symbols")
     elif type == "spectrumTx":
         # Tx optical spectrum
-        return opticalSpectrum(modulatedSignal, 10**12, centralFrequency, title)
+        return opticalSpectrum(modulatedSignal, SPECTRUM_FS, centralFrequency, title, simulationResults.get("modulatedSignalSpectrum"))
         # Rx optical spectrum
     elif type == "spectrumRx":
-        return opticalSpectrum(recieverSignal, 10**12, centralFrequency, title)
+        return opticalSpectrum(recieverSignal, SPECTRUM_FS, centralFrequency, title, simulationResults.get("recieverSignalSpectrum"))
         # Source signal spectrum
     elif type == "spectrumSc":
-        return opticalSpectrum(carrierSignal, 10**12, centralFrequency, title)
+        return opticalSpectrum(carrierSignal, SPECTRUM_FS, centralFrequency, title, simulationResults.get("carrierSignalSpectrum"))
     elif type == "opticalTx":
         # Modulated signal in time (Tx signal)
         return opticalInTime(Ts, modulatedSignal, title, "modulated")
@@ -500,47 +904,90 @@ def getPlot(type: str, title: str, simulationResults: dict, generalParameters: d
     elif type == "eyeRx":
         # Rx eyediagram
         discard = 100
-        return eyediagram(detectedSignal[discard:-discard], detectedSignal.size-2*discard, SpS, ptype="fancy", title="signal at Rx")
+        return eyediagram(detectedSignal[discard:-discard], detectedSignal.size-2*discard, recieverGeneral.get("SpS"), ptype="fancy", title="signal at Rx")
     else: raise Exception("Unexpected error")
 
 
-def getValues(simulationResults: dict, generalParameters: dict) -> dict:
+def getValues(simulationResults: dict, generalParameters: dict, mode: str = "count", align: bool = True) -> dict:
     """
     Calculates simulation output values from simulation results.
 
+    Parameters
+    -----
+    mode: "count" = errors are counted over all symbols (Monte Carlo)
+
+        "estimate" = errors are predicted with Gaussian noise formulas from per-level statistics of symbols (ber_estimation module)
+
+    align: received symbols are aligned with transmitted symbols (delay and phase ambiguity) before error calculation
+
+    Symbols used for training of equalizer ("TrainingSymbols" key of simulation results) aren't counted.
+
     Returns
     -----
-    BER, SER, SNR, powerTxdBm, powerTxW, powerRxdBm, powerRxW, Speed
+    BER, SER, SNR, Delay, powerTxdBm, powerTxW, powerRxdBm, powerRxW, Speed
+
+    Dual polarization: BER, SER and Delay are means of both polarizations, SNR of mean noise power, powers and speed are totals.
     """
     
     modulationFormat = generalParameters.get("Format")
     modulationOrder = generalParameters.get("Order")
     Rs = generalParameters.get("Rs")
 
-    bitsTx = simulationResults.get("bitsTx")
-    bitsRx = simulationResults.get("bitsRx")
     symbolsTx = simulationResults.get("symbolsTx")
     symbolsRx = simulationResults.get("symbolsRx")
     modulatedSignal = simulationResults.get("modulatedSignal")
     recieverSignal = simulationResults.get("recieverSignal")
 
-    # Error values
-    valuesList = fastBERcalc(symbolsRx, symbolsTx, modulationOrder, modulationFormat)
-    # extract the values from arrays
-    ber, ser, snr = [array[0] for array in valuesList]
-    values = {"BER":ber, "SER":ser, "SNR":snr}
+    # One row per polarization
+    polarizations = symbolsRx.shape[0] if symbolsRx.ndim == 2 else 1
+    symbolsRx, symbolsTx = np.atleast_2d(symbolsRx), np.atleast_2d(symbolsTx)
+
+    # Training symbols of equalizer
+    training = simulationResults.get("TrainingSymbols", 0)
+    symbolsRx, symbolsTx = symbolsRx[:, training:], symbolsTx[:, training:]
+
+    valuesList = []
+    for polarization in range(polarizations):
+        polarizationRx, polarizationTx = symbolsRx[polarization], symbolsTx[polarization]
+
+        # Alignment of received and transmitted symbols
+        delay = 0
+        if align:
+            aligned = alignSymbols(polarizationRx, polarizationTx, modulationOrder, modulationFormat)
+            polarizationRx, polarizationTx = aligned.get("symbolsRx"), aligned.get("symbolsTx")
+            delay = aligned.get("Delay")
+
+        # Error values
+        if mode == "count":
+            errorValues = fastBERcalc(polarizationRx, polarizationTx, modulationOrder, modulationFormat)
+            # extract the values from arrays
+            ber, ser, snr = [array[0] for array in errorValues]
+        elif mode == "estimate":
+            ber, ser, snr = estimateErrors(polarizationRx, polarizationTx, modulationOrder, modulationFormat)
+        else: raise Exception("Unexpected error")
+
+        valuesList.append((ber, ser, snr, delay))
+
+    if polarizations == 1:
+        ber, ser, snr, delay = valuesList[0]
+    else:
+        ber, ser, snr, delay = np.array(valuesList).T
+        ber, ser, delay = ber.mean(), ser.mean(), delay.mean()
+        snr = -10*np.log10(np.mean(10**(-snr / 10)))
+
+    values = {"BER":ber, "SER":ser, "SNR":snr, "Delay":delay}
 
     # Transmission speed
-    values.update({"Speed":calculateTransSpeed(Rs, modulationOrder)})
+    values.update({"Speed":polarizations * calculateTransSpeed(Rs, modulationOrder)})
 
-    # Tx power [W]
-    power = signal_power(modulatedSignal)
+    # Tx power [W] (sum of polarizations, stored power of lean results)
+    power = float(simulationResults.get("modulatedSignalPower", signal_power(modulatedSignal.T)))
     values.update({"powerTxW":power})
     # Tx power [dBm]
     power = 10*np.log10(power / 1e-3)
     values.update({"powerTxdBm":power})
     # Rx power [W]
-    power = signal_power(recieverSignal)
+    power = float(simulationResults.get("recieverSignalPower", signal_power(recieverSignal.T)))
     values.update({"powerRxW":power})
     # Rx power [dBm]
     power = 10*np.log10(power / 1e-3)
@@ -559,6 +1006,26 @@ def checkPower(signal, limit) -> bool:
 
         False: signal power is too low
         """
-        signalPower = 10*np.log10(signal_power(signal) / 1e-3)
+        signalPower = 10*np.log10(signal_power(signal.T) / 1e-3)
+
+        return signalPower >= limit
+
+
+def estimateValues(generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict, recieverParameters: dict, amplifierParameters: dict, includeAmplifier: bool) -> dict | None:
+    """
+    Fast estimation of output values. Simulates only short sequence of symbols and predicts errors (getValues "estimate" mode).
+
+    Returns
+    -----
+    values from getValues
+
+    None: signal power is too low for amplifier detection
+    """
+    generalParameters = dict(asDict(generalParameters), Symbols=ESTIMATE_SYMBOLS)
+
+    simulationResults = simulate(generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters, includeAmplifier)
+
+    if simulationResults.get("recieverSignal") is None:
+        return None
 
-        return signalPower >= limit
\ No newline at end of file
+    return getValues(simulationResults, generalParameters, mode="estimate")
@@ -0,0 +1,363 @@
+"""
+Typed immutable parameters of simulation blocks.
+Objects are hashable and have stable digest (same in every process) so they can be used for caching, deduplication and sending to worker processes.
+
+All values are stored in canonical units:
+frequencies in Hz, power in dBm, length in km, attenuation in dB/km, dispersion in ps/nm/km, gain and noise figure in dB.
+Ideal values ("inf" / "-inf" strings in GUI dictionaries) are stored as float infinities.
+"""
+
+import hashlib
+from dataclasses import dataclass, fields
+
+def toFloat(value) -> float:
+    """
+    Converts number or sentinel string ("inf" / "-inf") to float.
+    """
+    return float(value)
+
+
+def toSentinel(value: float):
+    """
+    Converts float infinity back to sentinel string used in GUI dictionaries.
+    """
+    if value == float("inf"):
+        return "inf"
+    elif value == float("-inf"):
+        return "-inf"
+    else:
+        return value
+
+
+def canonicalValue(value) -> str:
+    """
+    Creates canonical text representation of value (used for digest).
+    """
+    if isinstance(value, bool):
+        return str(value)
+    elif isinstance(value, float):
+        return value.hex()
+    elif isinstance(value, int):
+        return float(value).hex()
+    elif isinstance(value, str):
+        return repr(value)
+    elif value is None:
+        return "None"
+    else:
+        return value.canonical()
+
+
+class CanonicalParameters:
+    """
+    Common methods of parameters objects.
+    """
+    __slots__ = ()
+
+    def canonical(self) -> str:
+        """
+        Canonical text representation (class name and all fields).
+        """
+        values = ",".join(f"{field.name}={canonicalValue(getattr(self, field.name))}" for field in fields(self))
+        return f"{type(self).__name__}({values})"
+
+    def digest(self) -> str:
+        """
+        Stable hash (sha256 hex digest) of parameters. Same in every process and python session.
+        """
+        return hashlib.sha256(self.canonical().encode()).hexdigest()
+
+    def floatFields(self, *names: str):
+        """
+        Converts given fields to floats (frozen object => object.__setattr__).
+        """
+        for name in names:
+            object.__setattr__(self, name, toFloat(getattr(self, name)))
+
+
+@dataclass(frozen=True, slots=True)
+class GeneralParameters(CanonicalParameters):
+    """
+    General parameters.
+
+    format: "pam" / "psk" / "qam"
+
+    order: modulation order
+
+    symbolRate: [symbols/s]
+
+    samplesPerSymbol: SpS
+
+    polarizations: 1 (single polarization) / 2 (dual polarization)
+
+    recieverSamplesPerSymbol: RxSpS of reciever DSP after decimation (0 => same as SpS)
+
+    seed: seed of random numbers (information bits and noise)
+    """
+    format: str
+    order: int
+    symbolRate: float
+    samplesPerSymbol: int = 8
+    polarizations: int = 1
+    recieverSamplesPerSymbol: int = 0
+    seed: int = 123
+
+    def __post_init__(self):
+        object.__setattr__(self, "order", int(self.order))
+        object.__setattr__(self, "samplesPerSymbol", int(self.samplesPerSymbol))
+        object.__setattr__(self, "polarizations", int(self.polarizations))
+        object.__setattr__(self, "recieverSamplesPerSymbol", int(self.recieverSamplesPerSymbol or 0))
+        object.__setattr__(self, "seed", int(self.seed))
+        self.floatFields("symbolRate")
+
+    @property
+    def samplingFrequency(self) -> float:
+        return self.samplesPerSymbol * self.symbolRate
+
+    def toDict(self) -> dict:
+        """
+        Dictionary used by simulation (SpS, Format, Order, Rs, Fs, Ts, Polarizations, RxSpS, Seed).
+        """
+        Fs = self.samplingFrequency
+        return {"SpS":self.samplesPerSymbol, "Format":self.format, "Order":self.order, "Rs":self.symbolRate, "Fs":Fs, "Ts":1 / Fs,
+                "Polarizations":self.polarizations, "RxSpS":self.recieverSamplesPerSymbol or self.samplesPerSymbol, "Seed":self.seed}
+
+    @classmethod
+    def fromDict(cls, parameters: dict):
+        return cls(parameters.get("Format"), parameters.get("Order"), parameters.get("Rs"), parameters.get("SpS", 8), parameters.get("Polarizations", 1),
+                   parameters.get("RxSpS", 0), parameters.get("Seed", 123))
+
+
+@dataclass(frozen=True, slots=True)
+class SourceParameters(CanonicalParameters):
+    """
+    Optical source parameters.
+
+    power: [dBm]
+
+    frequency: central frequency [Hz]
+
+    linewidth: [Hz]
+
+    rin: relative intensity noise [dB/Hz] (-inf for ideal source)
+    """
+    power: float
+    frequency: float
+    linewidth: float
+    rin: float
+    ideal: bool = False
+
+    def __post_init__(self):
+        self.floatFields("power", "frequency", "linewidth", "rin")
+
+    def toDict(self) -> dict:
+        """
+        Dictionary used by simulation (frequency in THz).
+        """
+        return {"Power":self.power, "Frequency":self.frequency / 10**12, "Linewidth":self.linewidth, "RIN":toSentinel(self.rin), "Ideal":self.ideal}
+
+    @classmethod
+    def fromDict(cls, parameters: dict):
+        return cls(parameters.get("Power"), toFloat(parameters.get("Frequency")) * 10**12, parameters.get("Linewidth"),
+                   parameters.get("RIN"), parameters.get("Ideal", False))
+
+
+@dataclass(frozen=True, slots=True)
+class ModulatorParameters(CanonicalParameters):
+    """
+    Modulator parameters.
+
+    type: "PM" / "MZM" / "IQM"
+    """
+    type: str
+
+    def toDict(self) -> dict:
+        return {"Type":self.type}
+
+    @classmethod
+    def fromDict(cls, parameters: dict):
+        return cls(parameters.get("Type"))
+
+
+@dataclass(frozen=True, slots=True)
+class ChannelParameters(CanonicalParameters):
+    """
+    Transmission channel parameters.
+
+    length: [km]
+
+    attenuation: [dB/km]
+
+    dispersion: [ps/nm/km]
+
+    nonlinear: Kerr nonlinearity (split-step Fourier method)
+
+    gamma: nonlinear parameter [1/W/km]
+
+    pmd: polarization mode dispersion parameter of dual polarization signal [ps/sqrt(km)]
+    """
+    length: float
+    attenuation: float
+    dispersion: float
+    ideal: bool = False
+    nonlinear: bool = False
+    gamma: float = 1.3
+    pmd: float = 0.0
+
+    def __post_init__(self):
+        self.floatFields("length", "attenuation", "dispersion", "gamma", "pmd")
+
+    def toDict(self) -> dict:
+        return {"Length":self.length, "Attenuation":self.attenuation, "Dispersion":self.dispersion, "Ideal":self.ideal,
+                "Nonlinear":self.nonlinear, "Gamma":self.gamma, "PMD":self.pmd}
+
+    @classmethod
+    def fromDict(cls, parameters: dict):
+        return cls(parameters.get("Length"), parameters.get("Attenuation"), parameters.get("Dispersion"), parameters.get("Ideal", False),
+                   parameters.get("Nonlinear", False), parameters.get("Gamma", 1.3), parameters.get("PMD", 0.0))
+
+
+@dataclass(frozen=True, slots=True)
+class RecieverParameters(CanonicalParameters):
+    """
+    Reciever parameters.
+
+    type: "Photodiode" / "Coherent"
+
+    bandwidth: [Hz] (inf for ideal reciever)
+
+    resolution: responsivity [A/W] (inf for ideal reciever)
+
+    cdCompensation: chromatic dispersion compensation of coherent reciever
+
+    localOscillator: "Transmitter" (carrier of transmitter) / "Independent" (own laser) for coherent reciever
+
+    phaseRecovery: carrier phase recovery of coherent reciever
+
+    equalizerTaps: number of feed-forward taps of photodiode reciever equalizer or 2x2 equalizer of dual polarization coherent reciever (0 => without equalizer)
+
+    feedbackTaps: number of decision feedback taps of equalizer
+
+    stepSize: step size of equalizer adaptation
+
+    timingRecovery: "Fixed" / "Phase" (maximum variance) / "Gardner" (tracked) sampling of symbols
+
+    phaseRecoveryWindow: number of symbols averaged by carrier phase recovery
+
+    noiseScale: multiplier of shot and thermal noise (importance sampling)
+    """
+    type: str
+    bandwidth: float
+    resolution: float
+    ideal: bool = False
+    cdCompensation: bool = False
+    localOscillator: str = "Transmitter"
+    phaseRecovery: bool = False
+    equalizerTaps: int = 0
+    feedbackTaps: int = 0
+    stepSize: float = 0.05
+    timingRecovery: str = "Fixed"
+    phaseRecoveryWindow: int = 65
+    noiseScale: float = 1.0
+
+    def __post_init__(self):
+        object.__setattr__(self, "equalizerTaps", int(self.equalizerTaps))
+        object.__setattr__(self, "feedbackTaps", int(self.feedbackTaps))
+        object.__setattr__(self, "phaseRecoveryWindow", int(self.phaseRecoveryWindow))
+        self.floatFields("bandwidth", "resolution", "stepSize", "noiseScale")
+
+    def toDict(self) -> dict:
+        return {"Type":self.type, "Bandwidth":toSentinel(self.bandwidth), "Resolution":toSentinel(self.resolution), "Ideal":self.ideal,
+                "CDCompensation":self.cdCompensation, "LocalOscillator":self.localOscillator, "PhaseRecovery":self.phaseRecovery,
+                "EqualizerTaps":self.equalizerTaps, "FeedbackTaps":self.feedbackTaps, "StepSize":self.stepSize, "TimingRecovery":self.timingRecovery,
+                "PhaseRecoveryWindow":self.phaseRecoveryWindow, "NoiseScale":self.noiseScale}
+
+    @classmethod
+    def fromDict(cls, parameters: dict):
+        return cls(parameters.get("Type"), parameters.get("Bandwidth"), parameters.get("Resolution"), parameters.get("Ideal", False),
+                   parameters.get("CDCompensation", False), parameters.get("LocalOscillator", "Transmitter"), parameters.get("PhaseRecovery", False),
+                   parameters.get("EqualizerTaps", 0), parameters.get("FeedbackTaps", 0), parameters.get("StepSize", 0.05),
+                   parameters.get("TimingRecovery", "Fixed"), parameters.get("PhaseRecoveryWindow", 65), parameters.get("NoiseScale", 1.0))
+
+
+@dataclass(frozen=True, slots=True)
+class AmplifierParameters(CanonicalParameters):
+    """
+    Optical amplifier parameters.
+
+    position: "start" / "middle" / "end"
+
+    gain: [dB]
+
+    noise: noise figure [dB]
+
+    detection: detection limit [dBm] (-inf for ideal amplifier)
+
+    noiseScale: multiplier of ASE noise (importance sampling)
+    """
+    position: str
+    gain: float
+    noise: float
+    detection: float
+    ideal: bool = False
+    noiseScale: float = 1.0
+
+    def __post_init__(self):
+        self.floatFields("gain", "noise", "detection", "noiseScale")
+
+    def toDict(self) -> dict:
+        return {"Position":self.position, "Gain":self.gain, "Noise":self.noise, "Detection":toSentinel(self.detection), "Ideal":self.ideal,
+                "NoiseScale":self.noiseScale}
+
+    @classmethod
+    def fromDict(cls, parameters: dict):
+        return cls(parameters.get("Position"), parameters.get("Gain"), parameters.get("Noise"), parameters.get("Detection"), parameters.get("Ideal", False),
+                   parameters.get("NoiseScale", 1.0))
+
+
+@dataclass(frozen=True, slots=True)
+class SimulationConfig(CanonicalParameters):
+    """
+    Whole configuration of one simulation run.
+    Amplifier is None when it isn't included.
+    """
+    general: GeneralParameters
+    source: SourceParameters
+    modulator: ModulatorParameters
+    channel: ChannelParameters
+    reciever: RecieverParameters
+    amplifier: AmplifierParameters | None = None
+
+    @property
+    def includeAmplifier(self) -> bool:
+        return self.amplifier is not None
+
+    def toDicts(self) -> tuple:
+        """
+        Arguments for simulate function.
+
+        Returns
+        -----
+        tuple (generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters, includeAmplifier)
+        """
+        amplifierParameters = self.amplifier.toDict() if self.includeAmplifier else None
+
+        return (self.general.toDict(), self.source.toDict(), self.modulator.toDict(), self.channel.toDict(),
+                self.reciever.toDict(), amplifierParameters, self.includeAmplifier)
+
+    @classmethod
+    def fromDicts(cls, generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict,
+                  recieverParameters: dict, amplifierParameters: dict | None = None, includeAmplifier: bool = False):
+        amplifier = AmplifierParameters.fromDict(amplifierParameters) if includeAmplifier else None
+
+        return cls(GeneralParameters.fromDict(generalParameters), SourceParameters.fromDict(sourceParameters), ModulatorParameters.fromDict(modulatorParameters),
+                   ChannelParameters.fromDict(channelParameters), RecieverParameters.fromDict(recieverParameters), amplifier)
+
+
+def asDict(parameters) -> dict | None:
+    """
+    Converts parameters object to dictionary used by simulation. Dictionaries are returned without change.
+    """
+    if isinstance(parameters, CanonicalParameters):
+        return parameters.toDict()
+    else:
+        return parameters
@@ -0,0 +1,368 @@
+"""
+Local simulation service. Scripts and notebooks can run simulations without GUI.
+
+Server listens only on localhost (TCP 127.0.0.1 or Unix socket). Messages are JSON objects, one per line.
+Submitted jobs are queued and dispatched to process pool running simulate and getValues.
+Number of running jobs is bounded by number of processors and by available memory (estimated memory of every job).
+
+Requests:
+    {"type": "submit", "job": {...}, "tag": any}
+        job: generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters (GUI dictionaries),
+        optional amplifierParameters, includeAmplifier, symbols, mode ("count" / "estimate"),
+        commonNoise (True = noise realizations are shared with other jobs of the same worker, see noise.commonRandomNumbers,
+        kept noise blocks of every worker are limited by JOB_COMMON_NOISE_BYTES and this memory is reserved after the first such job)
+
+    {"type": "cancel", "id": job id} (only queued jobs)
+
+    {"type": "status"}
+
+Events sent back (streamed for every job): queued (with position in queue), running, done (values, seconds, digest), error, cancelled.
+
+Run server: python -m scripts.simulation_server [--port PORT] [--socket PATH] [--workers N]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import numpy as np
+
+from scripts.simulation import simulate, getValues
+from scripts.simulation_parameters import SimulationConfig
+from scripts.noise import commonRandomNumbers, setCommonMemory
+
+# Default TCP port
+SERVER_PORT = 8765
+# Default number of symbols of one job
+JOB_SYMBOLS = 10**6
+# Estimated memory of simulation [bytes per sample] and of worker process [bytes]
+JOB_BYTES_PER_SAMPLE = 400
+JOB_BASE_MEMORY = 300 * 2**20
+# Unit noise blocks shared by jobs with commonNoise key (in every worker process)
+JOB_COMMON_NOISE = {}
+# Memory limit of JOB_COMMON_NOISE of one worker process [bytes] (blocks stay allocated between jobs)
+JOB_COMMON_NOISE_BYTES = 2**28
+# Start method of worker processes (forked workers would inherit listening socket of server)
+WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def availableMemory() -> int | None:
+    """
+    Available physical memory [bytes] (None if it can't be found).
+    """
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def jobMemory(job: dict) -> int:
+    """
+    Estimated memory of one job [bytes].
+    """
+    general = job.get("generalParameters")
+    samples = job.get("symbols", JOB_SYMBOLS) * general.get("SpS", 8) * general.get("Polarizations", 1)
+
+    return JOB_BASE_MEMORY + JOB_BYTES_PER_SAMPLE * samples
+
+
+def jsonValue(value):
+    """
+    Converts numpy values of results to JSON values (infinite and nan values to strings).
+    """
+    if isinstance(value, dict):
+        return {key:jsonValue(item) for key, item in value.items()}
+    elif isinstance(value, (np.ndarray, list, tuple)):
+        return [jsonValue(item) for item in value]
+    elif isinstance(value, (np.bool_, bool)):
+        return bool(value)
+    elif isinstance(value, (np.integer, int)):
+        return int(value)
+    elif isinstance(value, (np.floating, float)):
+        return float(value) if np.isfinite(value) else str(float(value))
+    else:
+        return value
+
+
+def jobConfig(job: dict) -> SimulationConfig:
+    """
+    Typed configuration of job (also validates parameter blocks).
+    """
+    return SimulationConfig.fromDicts(job.get("generalParameters"), job.get("sourceParameters"), job.get("modulatorParameters"),
+                                      job.get("channelParameters"), job.get("recieverParameters"), job.get("amplifierParameters"),
+                                      job.get("includeAmplifier", False))
+
+
+def runJob(job: dict) -> dict:
+    """
+    Simulation of one job (runs in worker process).
+
+    Returns
+    -----
+    values from getValues
+
+    None: signal power is too low for amplifier detection
+    """
+    generalParameters = dict(job.get("generalParameters"), Symbols=job.get("symbols", JOB_SYMBOLS))
+    setCommonMemory(JOB_COMMON_NOISE_BYTES)
+
+    with commonRandomNumbers(JOB_COMMON_NOISE) if job.get("commonNoise", False) else nullcontext():
+        simulationResults = simulate(generalParameters, job.get("sourceParameters"), job.get("modulatorParameters"), job.get("channelParameters"),
+                                     job.get("recieverParameters"), job.get("amplifierParameters"), job.get("includeAmplifier", False))
+
+    if simulationResults.get("recieverSignal") is None:
+        return None
+
+    return jsonValue(getValues(simulationResults, generalParameters, mode=job.get("mode", "count")))
+
+
+class MemoryBudget:
+    """
+    Limits sum of estimated memory of running jobs. Job larger than whole budget runs alone.
+    Memory which stays allocated between jobs (kept common noise of workers) is reserved, it decreases budget.
+    """
+    def __init__(self, budget: int | None):
+        self.budget = budget
+        self.used = 0
+        self.condition = asyncio.Condition()
+
+
+    async def acquire(self, amount: int):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.budget is None or self.used == 0 or self.used + amount <= self.budget)
+            self.used += amount
+
+
+    async def release(self, amount: int):
+        async with self.condition:
+            self.used -= amount
+            self.condition.notify_all()
+
+
+    async def reserve(self, amount: int):
+        async with self.condition:
+            if self.budget is not None:
+                self.budget -= amount
+
+
+class SimulationServer:
+    """
+    Asyncio server with job queue and process pool.
+
+    Parameters
+    -----
+    workers: number of worker processes (None = number of processors, limited by available memory for default jobs)
+    """
+    def __init__(self, workers: int | None = None):
+        memory = availableMemory()
+        if workers is None:
+            workers = os.cpu_count() or 1
+            if memory is not None:
+                defaultJob = {"generalParameters":{}}
+                workers = max(1, min(workers, memory // jobMemory(defaultJob)))
+
+        self.workers = workers
+        self.memory = MemoryBudget(memory)
+        self.queue = asyncio.Queue()
+        self.jobs = {}
+        self.counter = 0
+        self.running = 0
+        self.pool = None
+        # Memory of common noise of workers is reserved
+        self.commonReserved = False
+
+
+    async def serve(self, port: int = SERVER_PORT, path: str | None = None):
+        """
+        Runs server until it is cancelled (or SIGTERM is received). Unix socket is used if path is given, otherwise TCP port on localhost.
+        Worker processes are shut down when server stops.
+        """
+        loop = asyncio.get_running_loop()
+        # SIGTERM cancels server like KeyboardInterrupt, so worker processes aren't left orphaned
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(WORKER_START_METHOD))
+        dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handleClient, path=path)
+        else:
+            server = await asyncio.start_server(self.handleClient, host="127.0.0.1", port=port)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            loop.remove_signal_handler(signal.SIGTERM)
+            for dispatcher in dispatchers:
+                dispatcher.cancel()
+            self.pool.shutdown(cancel_futures=True)
+
+
+    async def handleClient(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Reads requests of one client. Events of its jobs are written to the same connection.
+        """
+        lock = asyncio.Lock()
+
+        async def send(message: dict):
+            # Client could be disconnected, job continues
+            try:
+                async with lock:
+                    writer.write((json.dumps(message) + "\n").encode())
+                    await writer.drain()
+            except (ConnectionError, RuntimeError):
+                pass
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+
+            request = None
+            try:
+                request = json.loads(line)
+                await self.handleRequest(request, send)
+            except Exception as exception:
+                tag = request.get("tag") if isinstance(request, dict) else None
+                await send({"event":"error", "tag":tag, "message":str(exception)})
+
+        # Queued jobs of disconnected client aren't simulated
+        for job in self.jobs.values():
+            if job.get("send") is send and job.get("state") == "queued":
+                job.update({"state":"cancelled"})
+
+        writer.close()
+
+
+    async def handleRequest(self, request: dict, send):
+        """
+        Processes one request (submit / cancel / status).
+        """
+        if request.get("type") == "submit":
+            job = request.get("job")
+            digest = jobConfig(job).digest()
+
+            self.counter += 1
+            jobId = self.counter
+            self.jobs.update({jobId:{"job":job, "send":send, "tag":request.get("tag"), "digest":digest, "state":"queued"}})
+
+            await self.queue.put(jobId)
+            await send({"event":"queued", "id":jobId, "tag":request.get("tag"), "position":self.queue.qsize()})
+
+        elif request.get("type") == "cancel":
+            job = self.jobs.get(request.get("id"))
+            if job is None or job.get("state") != "queued":
+                raise Exception("Job can't be cancelled")
+
+            job.update({"state":"cancelled"})
+            await job.get("send")({"event":"cancelled", "id":request.get("id"), "tag":job.get("tag")})
+
+        elif request.get("type") == "status":
+            await send({"event":"status", "workers":self.workers, "queued":self.queue.qsize(), "running":self.running})
+
+        else: raise Exception("Unknown request type")
+
+
+    async def dispatch(self):
+        """
+        Takes jobs from queue and runs them in process pool (one dispatcher per worker).
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            jobId = await self.queue.get()
+            job = self.jobs.get(jobId)
+
+            if job.get("state") == "cancelled":
+                self.jobs.pop(jobId)
+                continue
+
+            send = job.get("send")
+            memory = jobMemory(job.get("job"))
+
+            # Any worker can run job with common noise and keep its noise blocks
+            if job.get("job").get("commonNoise", False) and not self.commonReserved:
+                self.commonReserved = True
+                await self.memory.reserve(self.workers * JOB_COMMON_NOISE_BYTES)
+
+            await self.memory.acquire(memory)
+            self.running += 1
+            job.update({"state":"running"})
+            await send({"event":"running", "id":jobId, "tag":job.get("tag")})
+
+            start = time.perf_counter()
+            try:
+                values = await loop.run_in_executor(self.pool, runJob, job.get("job"))
+            except Exception as exception:
+                await send({"event":"error", "id":jobId, "tag":job.get("tag"), "message":str(exception)})
+            else:
+                await send({"event":"done", "id":jobId, "tag":job.get("tag"), "digest":job.get("digest"), "values":values,
+                            "seconds":time.perf_counter() - start})
+            finally:
+                self.running -= 1
+                self.jobs.pop(jobId)
+                await self.memory.release(memory)
+
+
+def submitJobs(jobs: list, port: int = SERVER_PORT, path: str | None = None):
+    """
+    Blocking client for scripts and notebooks. Submits jobs and yields events until all jobs are finished.
+    Tag of every job is its index in the list.
+
+    Parameters
+    -----
+    jobs: list of job dictionaries (see module documentation)
+
+    Yields
+    -----
+    event dictionaries
+    """
+    if path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(path)
+    else:
+        connection = socket.create_connection(("127.0.0.1", port))
+
+    with connection, connection.makefile("rw") as stream:
+        for index, job in enumerate(jobs):
+            stream.write(json.dumps({"type":"submit", "job":job, "tag":index}) + "\n")
+        stream.flush()
+
+        remaining = len(jobs)
+        while remaining > 0:
+            line = stream.readline()
+            if not line:
+                break
+
+            event = json.loads(line)
+            if event.get("event") in ("done", "error", "cancelled") and event.get("tag") is not None:
+                remaining -= 1
+
+            yield event
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local simulation server")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="TCP port on localhost")
+    parser.add_argument("--socket", default=None, help="path of Unix socket (instead of TCP port)")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    arguments = parser.parse_args()
+
+    server = SimulationServer(arguments.workers)
+    print(f"Simulation server with {server.workers} workers")
+
+    try:
+        asyncio.run(server.serve(arguments.port, arguments.socket))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Solvers of link parameters for target BER or SNR (maximum reach, minimum power, minimum gain).
+Transmitter output is computed only once and reused in every iteration of the root finding.
+"""
+
+import numpy as np
+from scipy.optimize import brentq
+
+from scripts.simulation import simulateTransmitter, simulateLink, getValues
+from scripts.simulation_parameters import asDict
+from scripts.noise import seedRandom, commonRandomNumbers
+
+def prepareTransmitter(generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, seed: int = 123) -> dict:
+    """
+    Simulate transmitter once so it can be reused by solvers.
+
+    Returns
+    -----
+    transmitterResults: bitsTx, symbolsTx, modulationSignal, carrierSignal, modulatedSignal
+    """
+    seedRandom(seed)
+
+    return simulateTransmitter(asDict(generalParameters), asDict(sourceParameters), asDict(modulatorParameters))
+
+
+def scaleTransmitter(transmitterResults: dict, powerChange: float) -> dict:
+    """
+    Changes power of transmitter output (carrier and modulated signal).
+    All modulators are linear in optical field so scaling of the carrier scales also the modulated signal.
+
+    Parameters
+    -----
+    powerChange: change of power [dB]
+    """
+    if powerChange == 0:
+        return transmitterResults
+
+    scale = np.sqrt(10**(powerChange / 10))
+
+    scaledResults = dict(transmitterResults)
+    scaledResults.update({"carrierSignal":transmitterResults.get("carrierSignal") * scale,
+                          "modulatedSignal":transmitterResults.get("modulatedSignal") * scale})
+
+    return scaledResults
+
+
+def evaluateLink(transmitterResults: dict, generalParameters: dict, sourceParameters: dict, channelParameters: dict, recieverParameters: dict,
+                 amplifierParameters: dict, includeAmplifier: bool, seed: int = 321) -> dict | None:
+    """
+    Simulate channel and reciever with cached transmitter output and calculate output values.
+    Random generator is reseeded so every evaluation uses the same noise (smooth objective function).
+
+    Returns
+    -----
+    values from getValues
+
+    None: signal power is too low for amplifier detection
+    """
+    seedRandom(seed)
+
+    linkResults = simulateLink(generalParameters, sourceParameters, channelParameters, recieverParameters, amplifierParameters, includeAmplifier, transmitterResults)
+
+    if linkResults.get("recieverSignal") is None:
+        return None
+
+    simulationResults = dict(transmitterResults)
+    simulationResults.update(linkResults)
+
+    return getValues(simulationResults, generalParameters)
+
+
+def metricError(values: dict | None, metric: str, target: float, bitsNumber: int) -> float:
+    """
+    Distance of metric from its target. Positive value means that link is worse than target.
+
+    BER is compared in logarithmic scale. Zero BER is replaced by resolution of error counting.
+
+    Parameters
+    -----
+    metric: "BER" / "SNR"
+
+    bitsNumber: number of simulated bits
+    """
+    if metric == "BER":
+        # Link failed (amplifier detection)
+        if values is None:
+            ber = 0.5
+        else:
+            ber = max(values.get("BER"), 0.5 / bitsNumber)
+
+        return np.log10(ber) - np.log10(target)
+
+    elif metric == "SNR":
+        if values is None:
+            return np.inf
+
+        return target - values.get("SNR")
+    else: raise Exception("Unexpected error")
+
+
+def solveParameter(block: str, key: str, goal: str, bounds: tuple[float, float], target: float, generalParameters: dict, sourceParameters: dict,
+                   modulatorParameters: dict, channelParameters: dict, recieverParameters: dict, amplifierParameters: dict | None = None,
+                   includeAmplifier: bool = False, metric: str = "BER", tolerance: float = 0.1, bracketPoints: int = 6, maxIterations: int = 50) -> dict:
+    """
+    Finds the highest / lowest value of one parameter for which target metric is reached.
+    Target is bracketed on coarse grid of values and then the bracket is refined with Brent's method.
+
+    Parameters
+    -----
+    block: "channel" / "source" / "amplifier"
+
+    key: name of parameter ("Length", "Power", "Gain")
+
+    goal: "maximum" / "minimum" value of parameter
+
+    bounds: (lower, upper) values of parameter
+
+    target: target BER or SNR [dB]
+
+    metric: "BER" / "SNR"
+
+    tolerance: absolute tolerance of result in parameter units
+
+    bracketPoints: number of grid points used for bracketing
+
+    Returns
+    -----
+    dictionary: Value, Values (getValues output at Value), Evaluations, Bracketed
+
+    Value is None if target isn't reached anywhere on the grid.
+    Bracketed is False if target is reached at the bound in direction of goal (upper bound for maximum, lower for minimum),
+    Value is then the bound (even if some inner grid points don't reach target).
+    """
+    generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters = [
+        asDict(parameters) for parameters in (generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters)]
+
+    if block not in ("channel", "source", "amplifier") or goal not in ("maximum", "minimum"):
+        raise Exception("Unexpected error")
+
+    transmitterResults = prepareTransmitter(generalParameters, sourceParameters, modulatorParameters)
+    referencePower = sourceParameters.get("Power")
+    bitsNumber = transmitterResults.get("bitsTx").size
+
+    # Cache of evaluated points
+    evaluations = {}
+    # Noise realizations generated by the first evaluation are reused by all evaluations (common random numbers)
+    commonNoise = {}
+
+    def evaluate(value: float) -> dict | None:
+        if value in evaluations:
+            return evaluations.get(value)
+
+        source, channel, amplifier = sourceParameters, channelParameters, amplifierParameters
+        transmitter = transmitterResults
+
+        if block == "channel":
+            channel = dict(channelParameters, **{key:value})
+        elif block == "amplifier":
+            amplifier = dict(amplifierParameters, **{key:value})
+        elif block == "source":
+            source = dict(sourceParameters, **{key:value})
+            # Power is changed by scaling of cached transmitter output
+            if key == "Power":
+                transmitter = scaleTransmitter(transmitterResults, value - referencePower)
+
+        with commonRandomNumbers(commonNoise):
+            values = evaluateLink(transmitter, generalParameters, source, channel, recieverParameters, amplifier, includeAmplifier)
+        evaluations.update({value:values})
+
+        return values
+
+    def objective(value: float) -> float:
+        return metricError(evaluate(value), metric, target, bitsNumber)
+
+    # Bracketing on coarse grid
+    grid = np.linspace(bounds[0], bounds[1], bracketPoints)
+    satisfied = np.array([objective(value) <= 0 for value in grid])
+
+    # Target isn't reached
+    if not satisfied.any():
+        return {"Value":None, "Values":None, "Evaluations":len(evaluations), "Bracketed":False}
+
+    # Bound in direction of goal reaches target (highest / lowest possible value)
+    if satisfied[-1 if goal == "maximum" else 0]:
+        value = grid[-1] if goal == "maximum" else grid[0]
+        return {"Value":value, "Values":evaluate(value), "Evaluations":len(evaluations), "Bracketed":False}
+
+    if goal == "maximum":
+        # Last satisfying point followed by failing point
+        index = np.flatnonzero(satisfied)[-1]
+        lower, upper = grid[index], grid[index + 1]
+    else:
+        # First satisfying point preceded by failing point
+        index = np.flatnonzero(satisfied)[0]
+        lower, upper = grid[index - 1], grid[index]
+
+    value = brentq(objective, lower, upper, xtol=tolerance, maxiter=maxIterations)
+
+    # Returned value should satisfy target (root is known only with tolerance)
+    if objective(value) > 0:
+        value = value - tolerance if objective(lower) <= 0 else value + tolerance
+        value = min(max(value, lower), upper)
+
+    return {"Value":value, "Values":evaluate(value), "Evaluations":len(evaluations), "Bracketed":True}
+
+
+def maximumReach(target: float, generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict,
+                 recieverParameters: dict, amplifierParameters: dict | None = None, includeAmplifier: bool = False, metric: str = "BER",
+                 bounds: tuple[float, float] = (1, 1000), tolerance: float = 0.1) -> dict:
+    """
+    Finds the longest channel length [km] for which target BER (or SNR) is reached.
+
+    Returns
+    -----
+    dictionary: Value, Values, Evaluations, Bracketed (see solveParameter)
+    """
+    return solveParameter("channel", "Length", "maximum", bounds, target, generalParameters, sourceParameters, modulatorParameters, channelParameters,
+                          recieverParameters, amplifierParameters, includeAmplifier, metric, tolerance)
+
+
+def minimumPower(target: float, generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict,
+                 recieverParameters: dict, amplifierParameters: dict | None = None, includeAmplifier: bool = False, metric: str = "BER",
+                 bounds: tuple[float, float] = (-20, 50), tolerance: float = 0.05) -> dict:
+    """
+    Finds the lowest source power [dBm] for which target BER (or SNR) is reached.
+
+    Returns
+    -----
+    dictionary: Value, Values, Evaluations, Bracketed (see solveParameter)
+    """
+    return solveParameter("source", "Power", "minimum", bounds, target, generalParameters, sourceParameters, modulatorParameters, channelParameters,
+                          recieverParameters, amplifierParameters, includeAmplifier, metric, tolerance)
+
+
+def minimumGain(target: float, generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict,
+                recieverParameters: dict, amplifierParameters: dict, metric: str = "BER", bounds: tuple[float, float] = (0.1, 50),
+                tolerance: float = 0.05) -> dict:
+    """
+    Finds the lowest amplifier gain [dB] for which target BER (or SNR) is reached.
+
+    Returns
+    -----
+    dictionary: Value, Values, Evaluations, Bracketed (see solveParameter)
+    """
+    return solveParameter("amplifier", "Gain", "minimum", bounds, target, generalParameters, sourceParameters, modulatorParameters, channelParameters,
+                          recieverParameters, amplifierParameters, True, metric, tolerance)
@@ -0,0 +1,337 @@
+"""
+Pure validation of parameters values.
+Doesn't use any GUI objects so it can be used in worker processes (for example sweeps).
+"""
+
+import re
+
+from scripts.sampling_policy import MAX_SPS
+
+# Regular expression to match valid numbers, including negative and decimal numbers
+NUMBER_PATTERN = re.compile(r'^[-+]?\d*\.?\d+$')
+
+# Format is tuple (bool, value)
+# True = parameter can be equal or greater
+# False = parameter must be greater
+DOWN_LIMITS = {
+    # Source
+    "Power":(True , -20), # -20 dBm
+    "Frequency":(True, 170), # ~ 1760 nm
+    "Linewidth":(True, 1), # 1 Hz
+    "RIN": (True, -250), # -250 dB/Hz
+    # Modulator
+
+    # Channel
+    "Length":(False, 0), # > 0 km
+    "Attenuation":(True, 0), # 0 dBm/km
+    "Dispersion":(True, 0), # 0 ps/nm/km
+    # Reciever
+    "Bandwidth":(False, 0), # > 0 Hz
+    "Resolution":(False, 0), # > 0 A/W
+    # Amplifier
+    "Gain":(False, 0), # > 0 dB
+    "Noise":(True, 0), # 0 dB
+    "Detection":(True, -50) # -50 dBm
+}
+
+# Format is tuple (bool, value)
+# True = parameter can be equal or lower
+# False = parameter must be lower
+# None value = limit depends on general parameters (see upLimit)
+UP_LIMITS = {
+    # Source
+    "Power":(True , 50), # 50 dBm
+    "Frequency":(True, 250), # <= ~ 1200 nm
+    "Linewidth":(True, 10**9), # 1 GHz
+    "RIN":(True, 0), # 0 dB/Hz
+    # Modulator
+
+    # Channel
+    "Length":(True, 1000), # 1000 km
+    "Attenuation":(True, 5), # 5 dB/km
+    "Dispersion":(True, 200), # 200 ps/nm/km
+    # Reciever
+    "Bandwidth":(True, None), # <= Fs/2 (MAX_SPS * Rs/2 for automatic samples per symbol)
+    "Resolution":(True, 10), # 10 A/W
+    # Amplifier
+    "Gain":(True, 50), # 50 dB
+    "Noise":(True, 100), # 100 dB
+    "Detection":(True, 100) # 100 dBm
+}
+
+# Format is tuple (always string parameters, string parameters of ideal block)
+STRING_PARAMETERS = {
+    "source":((), ("RIN",)), # Ideal source has -inf RIN
+    "modulator":(("Type",), ()),
+    "channel":((), ()),
+    "reciever":(("Type",), ("Bandwidth", "Resolution")), # Ideal values are "inf"
+    "amplifier":(("Position",), ("Detection",)) # Ideal value is "-inf"
+}
+
+# Parameters which can be inputed in different frequency units
+FREQUENCY_PARAMETERS = {"source":"Linewidth", "reciever":"Bandwidth"}
+
+FREQUENCY_UNITS = {"Hz":1, "kHz":10**3, "MHz":10**6, "GHz":10**9}
+
+
+def convertNumber(input) -> tuple[float, bool]:
+    """
+    Converts string to float value. Bool value indicates empty input string.
+    Numbers (int, float) are passed as floats.
+
+    Returns
+
+    (float, False) = converted float number
+
+    (None, False) = input string has character in it
+
+    (None, True) = input string is empty
+    ----
+    """
+    if isinstance(input, (int, float)) and not isinstance(input, bool):
+        return float(input), False
+
+    if input:
+        if NUMBER_PATTERN.match(input):
+            return float(input), False
+        else:
+            return None, False
+    else:
+        return None, True
+
+
+def createError(parameterName: str, kind: str, message: str) -> dict:
+    """
+    Creates structured error.
+
+    Parameters
+    -----
+    kind: "empty" / "number" / "down" / "up"
+
+    Returns
+    -----
+    dictionary: Parameter, Kind, Title, Message
+    """
+    return {"Parameter":parameterName, "Kind":kind, "Title":f"{parameterName} input error", "Message":message}
+
+
+def checkNumberValue(parameterName: str, parameterValue) -> tuple[float | None, dict | None]:
+    """
+    Converts string number to float.
+
+    Returns
+    -----
+    tuple (float value, None) if parameter is ok
+
+    tuple (None, error) if parameter isn't ok
+    """
+    value, isEmpty = convertNumber(parameterValue)
+
+    if value is None and isEmpty is False:
+        return None, createError(parameterName, "number", f"{parameterName} must be a number!")
+
+    elif value is None and isEmpty is True:
+        return None, createError(parameterName, "empty", f"You must input {parameterName}!")
+    # Number is ok
+    else:
+        return value, None
+
+
+def upLimit(parameterName: str, generalParameters: dict) -> tuple[bool, float]:
+    """
+    Gets up limit of parameter. Resolves limits which depend on general parameters.
+
+    Returns
+    -----
+    tuple (can be equal, limit value)
+    """
+    limitComp, limitValue = UP_LIMITS.get(parameterName)
+
+    # Bandwidth is limited by sampling frequency (automatic samples per symbol can be raised up to MAX_SPS)
+    if limitValue is None and generalParameters.get("AutoSpS", False):
+        limitValue = MAX_SPS * generalParameters.get("Rs") / 2
+    elif limitValue is None:
+        limitValue = generalParameters.get("Fs") / 2
+
+    return limitComp, limitValue
+
+
+def checkLimitValue(parameterName: str, parameterValue: float, generalParameters: dict) -> dict | None:
+    """
+    Checks down and up limit of parameter.
+
+    Returns
+    ----
+    None: parameter is ok
+
+    error: parameters is off limit
+    """
+    # Down limit
+    limitComp, limitValue = DOWN_LIMITS.get(parameterName)
+
+    # Can be equal
+    if limitComp and parameterValue < limitValue:
+        return createError(parameterName, "down", f"{parameterName} must be greater or equal to {limitValue}!")
+    # Cannot be equal
+    elif not limitComp and parameterValue <= limitValue:
+        return createError(parameterName, "down", f"{parameterName} must be greater than {limitValue}!")
+
+    # Up limit
+    limitComp, limitValue = upLimit(parameterName, generalParameters)
+
+    # Can be equal
+    if limitComp and parameterValue > limitValue:
+        return createError(parameterName, "up", f"{parameterName} must be lower or equal to {limitValue}!")
+    # Cannot be equal
+    elif not limitComp and parameterValue >= limitValue:
+        return createError(parameterName, "up", f"{parameterName} must be lower than {limitValue}!")
+
+    return None
+
+
+def splitStringValues(parameters: dict, type: str, ideal: bool) -> tuple[dict, dict]:
+    """
+    Separates valid string parameters from number parameters to convert. Input dictionary is not changed.
+
+    Returns
+    -----
+    tuple (dictionary with number parameters, dictionary with string parameters)
+    """
+    stringKeys, idealKeys = STRING_PARAMETERS.get(type)
+
+    if ideal:
+        stringKeys = stringKeys + idealKeys
+
+    numberParameters = {key:value for key, value in parameters.items() if key not in stringKeys}
+    stringParameters = {key:parameters.get(key) for key in stringKeys if key in parameters}
+
+    return numberParameters, stringParameters
+
+
+def convertFrequency(frequency: float, units: str) -> float:
+    """
+    Converts frequency to Hz based on units ("Hz" / "kHz" / "MHz" / "GHz").
+    """
+    multiplier = FREQUENCY_UNITS.get(units)
+
+    if multiplier is None:
+        raise Exception("Unexpected error")
+
+    return frequency * multiplier
+
+
+def validateBlock(type: str, parameters: dict, generalParameters: dict, units: str = "Hz") -> tuple[dict | None, list]:
+    """
+    Checks if the parameters of one block has valid values and coverts numbers into float.
+    All errors are collected (in order number errors, limit errors).
+
+    Parameters
+    ----
+    type: type of block
+
+        "source" / "modulator" / "channel" / "reciever" / "amplifier"
+
+    parameters: parameters to check (aren't changed)
+
+    units: units of frequency parameter (Linewidth, Bandwidth)
+
+    Returns
+    -----
+    tuple (valid parameters, []) if all parameters are ok
+
+    tuple (None, errors) if some parameter isn't ok
+    """
+    if type not in STRING_PARAMETERS:
+        raise Exception("Unexpected error")
+
+    ideal = parameters.get("Ideal", False)
+    parameters = {key:value for key, value in parameters.items() if key != "Ideal"}
+
+    numberParameters, stringParameters = splitStringValues(parameters, type, ideal)
+
+    errors = []
+
+    # Convert parameters values to floats
+    for key, value in numberParameters.items():
+        checked, error = checkNumberValue(key, value)
+        # Parameter was not inputed correctly
+        if error is not None:
+            errors.append(error)
+        else:
+            numberParameters[key] = checked
+
+    if errors:
+        return None, errors
+
+    # Correct frequency units (to Hz)
+    frequencyKey = FREQUENCY_PARAMETERS.get(type)
+    if frequencyKey in numberParameters:
+        numberParameters[frequencyKey] = convertFrequency(numberParameters.get(frequencyKey), units)
+
+    # Check the limits
+    for key, value in numberParameters.items():
+        error = checkLimitValue(key, value, generalParameters)
+        # Off limit parameter
+        if error is not None:
+            errors.append(error)
+
+    if errors:
+        return None, errors
+
+    # Merge converted and string parameters back together
+    numberParameters.update(stringParameters)
+    numberParameters.update({"Ideal":ideal})
+
+    return numberParameters, []
+
+
+def validateConfiguration(generalParameters: dict, blocksParameters: dict, units: dict | None = None) -> tuple[dict | None, list]:
+    """
+    Validates whole configuration (all blocks at once).
+
+    Parameters
+    -----
+    blocksParameters: block type as key, block parameters as value
+
+    units: Optional. Block type as key, frequency units as value (default is Hz)
+
+    Returns
+    -----
+    tuple (valid blocks parameters, []) if everything is ok
+
+    tuple (None, errors) if some parameter isn't ok. Every error has extra "Block" key.
+    """
+    if units is None:
+        units = {}
+
+    validBlocks = {}
+    errors = []
+
+    for type, parameters in blocksParameters.items():
+        validParameters, blockErrors = validateBlock(type, parameters, generalParameters, units.get(type, "Hz"))
+
+        for error in blockErrors:
+            error["Block"] = type
+        errors.extend(blockErrors)
+
+        validBlocks[type] = validParameters
+
+    if errors:
+        return None, errors
+
+    return validBlocks, []
+
+
+def validateConfigurations(configurations: list) -> list:
+    """
+    Validates many configurations (for example points of parameters sweep).
+
+    Parameters
+    -----
+    configurations: list of tuples (generalParameters, blocksParameters)
+
+    Returns
+    -----
+    list of errors lists (empty list = configuration is ok)
+    """
+    return [validateConfiguration(generalParameters, blocksParameters)[1] for generalParameters, blocksParameters in configurations]
@@ -0,0 +1,182 @@
+"""
+Wavelength division multiplexing (WDM) simulation.
+
+Transmitters of all channels are computed at once (one row of 2-D arrays per channel).
+Channels are multiplexed in frequency domain (spectrum of every row is placed on its FFT bins of the composite signal),
+composite field is transmitted thru the channel and demultiplexed with a cached filter bank.
+"""
+
+import numpy as np
+
+from scripts.fft_backend import fft, ifft, fftFrequencies, cachedArray
+from scripts.simulation import simulateTransmitter, fiberTransmition, simulateReciever, getValues
+from scripts.simulation_parameters import asDict
+from scripts.noise import seedRandom
+
+# Default number of symbols of every channel
+WDM_SYMBOLS = 10**4
+# Order of super-Gaussian demultiplexer filters
+DEMUX_ORDER = 4
+
+def gridOffsets(channels: int, spacing: float) -> np.ndarray:
+    """
+    Frequency offsets of channels from central frequency (grid is centered).
+
+    Parameters
+    -----
+    spacing: channel spacing [Hz]
+    """
+    return (np.arange(channels) - (channels - 1) / 2) * spacing
+
+
+def compositeUpsampling(channels: int, spacing: float, Fs: float) -> int:
+    """
+    Upsampling factor of composite signal so that spectra of all channels (each Fs wide) fit into the sampling band.
+    """
+    return int(np.ceil(((channels - 1) * spacing + Fs) / Fs))
+
+
+@cachedArray
+def channelBins(length: int, upsampling: int, shifts: tuple) -> np.ndarray:
+    """
+    Indexes of composite spectrum bins for every channel. Cached for repeated use.
+
+    Parameters
+    -----
+    length: number of samples of one channel
+
+    upsampling: upsampling factor of composite signal
+
+    shifts: frequency shifts of channels [bins]
+
+    Returns
+    -----
+    array (channels, length) of bins (FFT order of channel spectrum)
+    """
+    frequencyIndexes = np.round(fftFrequencies(length, length)).astype(int)
+    bins = (frequencyIndexes + np.array(shifts).reshape(-1, 1)) % (length * upsampling)
+    bins.flags.writeable = False
+
+    return bins
+
+
+@cachedArray
+def demuxFilter(length: int, Fs: float, bandwidth: float, order: int = DEMUX_ORDER) -> np.ndarray:
+    """
+    Super-Gaussian band-pass of one demultiplexer channel (in baseband of the channel). Cached for repeated use.
+
+    Parameters
+    -----
+    length: number of samples of one channel
+
+    Fs: sampling frequency of one channel
+
+    bandwidth: 3 dB bandwidth [Hz]
+
+    Returns
+    -----
+    transfer function (FFT order)
+    """
+    frequency = fftFrequencies(length, Fs)
+    transferFunction = np.exp(-np.log(2) / 2 * (2 * frequency / bandwidth)**(2 * order))
+    transferFunction.flags.writeable = False
+
+    return transferFunction
+
+
+def multiplex(signals, bins, upsampling: int) -> np.ndarray:
+    """
+    Creates composite field of all channels (rows of signals) placed on their frequencies.
+    """
+    spectra = fft(signals, axis=1)
+    length = signals.shape[1] * upsampling
+
+    # Overlapping bins of neighbouring channels are summed
+    spectrum = (np.bincount(bins.ravel(), weights=spectra.real.ravel(), minlength=length)
+                + 1j * np.bincount(bins.ravel(), weights=spectra.imag.ravel(), minlength=length))
+
+    return ifft(spectrum) * upsampling
+
+
+def demultiplex(signal, bins, upsampling: int, transferFunction) -> np.ndarray:
+    """
+    Filters every channel from composite field (one spectrum, bins of channels selected at once).
+
+    Returns
+    -----
+    array (channels, length) of channel fields in baseband
+    """
+    spectrum = fft(signal)
+
+    return ifft(spectrum[bins] * transferFunction, axis=1) / upsampling
+
+
+def simulateWDM(generalParameters: dict, sourceParameters: dict, modulatorParameters: dict, channelParameters: dict, recieverParameters: dict,
+                amplifierParameters: dict | None = None, includeAmplifier: bool = False, channels: int = 8, spacing: float = 50e9,
+                demuxBandwidth: float | None = None) -> dict | None:
+    """
+    Simulate WDM communication. All channels have the same parameters, source frequency is the center of the grid.
+    Only single polarization channels are supported.
+
+    Parameters
+    -----
+    generalParameters: optional "Symbols" key sets number of symbols of every channel (default WDM_SYMBOLS)
+
+    channels: number of channels
+
+    spacing: channel spacing [Hz] (rounded to frequency resolution of simulation)
+
+    demuxBandwidth: 3 dB bandwidth of demultiplexer filters [Hz] (default is channel spacing)
+
+    Returns
+    -----
+    dictionary: Frequencies (channel frequencies [Hz]), Values (list of getValues output of every channel), compositeSignal, recieverSignal
+
+    None: signal power is too low for amplifier detection
+    """
+    generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters = [
+        asDict(parameters) for parameters in (generalParameters, sourceParameters, modulatorParameters, channelParameters, recieverParameters, amplifierParameters)]
+
+    seedRandom(123)
+
+    if generalParameters.get("Polarizations", 1) != 1: raise Exception("Unexpected error")
+
+    Fs = generalParameters.get("Fs")
+    frequency = sourceParameters.get("Frequency")*10**12
+    symbols = generalParameters.get("Symbols", WDM_SYMBOLS)
+
+    # All transmitters at once (one long sequence divided into rows)
+    transmitterResults = simulateTransmitter(dict(generalParameters, Symbols=channels * symbols), sourceParameters, modulatorParameters)
+    transmitterResults = {key:value.reshape(channels, -1) for key, value in transmitterResults.items()}
+    length = transmitterResults.get("modulatedSignal").shape[1]
+
+    # Channel grid on FFT bins of one channel
+    upsampling = compositeUpsampling(channels, spacing, Fs)
+    shifts = np.round(gridOffsets(channels, spacing) / (Fs / length)).astype(int)
+    offsets = shifts * Fs / length
+    bins = channelBins(length, upsampling, tuple(shifts))
+
+    compositeSignal = multiplex(transmitterResults.get("modulatedSignal"), bins, upsampling)
+
+    # Transmission of composite field (sampling frequency covers whole grid)
+    recieverSignal = fiberTransmition(channelParameters, amplifierParameters, compositeSignal, upsampling * Fs, frequency, includeAmplifier).get("recieverSignal")
+
+    if recieverSignal is None:
+        return None
+
+    if demuxBandwidth is None:
+        demuxBandwidth = abs(offsets[1] - offsets[0]) if channels > 1 else Fs
+    channelSignals = demultiplex(recieverSignal, bins, upsampling, demuxFilter(length, Fs, demuxBandwidth))
+
+    # Reciever of every channel
+    valuesList = []
+    for channel in range(channels):
+        channelTransmitter = {key:value[channel] for key, value in transmitterResults.items()}
+        channelSource = dict(sourceParameters, Frequency=(frequency + offsets[channel]) / 10**12)
+
+        channelResults = dict(channelTransmitter, recieverSignal=channelSignals[channel])
+        channelResults.update(simulateReciever(generalParameters, channelSource, channelParameters, recieverParameters, channelSignals[channel], channelTransmitter))
+
+        valuesList.append(getValues(channelResults, generalParameters))
+
+    return {"Frequencies":frequency + offsets, "Values":valuesList, "compositeSignal":compositeSignal, "recieverSignal":recieverSignal}
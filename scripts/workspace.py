@@ -0,0 +1,81 @@
+"""
+Workspace of reusable arrays for temporary signals of simulation stages.
+
+Temporary signals (signal split by optical hybrid, amplified signal between fiber sections, normalized detected signal...) have
+the same size in every run with the same parameters. Workspace keeps one buffer per name, so back-to-back runs write into memory
+which is already allocated and mapped instead of allocating (and page-faulting) new arrays in every stage.
+Arrays of workspace are valid only until the next request of the same name, so they are never returned in simulation results.
+
+Every thread has its own workspace (live simulation runs on background thread).
+"""
+
+import threading
+import numpy as np
+
+# Workspaces of threads
+THREAD_WORKSPACES = threading.local()
+
+class Workspace:
+    """
+    Named reusable buffers. Buffer grows to the largest requested size and smaller requests use its beginning.
+    """
+    def __init__(self):
+        self.buffers = {}
+
+
+    def array(self, name: str, shape, dtype=np.complex128) -> np.ndarray:
+        """
+        Uninitialized array from buffer of given name.
+
+        Parameters
+        -----
+        name: name of buffer (one buffer per temporary signal of stage)
+
+        shape, dtype: shape and type of returned array
+
+        Returns
+        -----
+        array (view of buffer), its content is overwritten by the next request of the same name
+        """
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        buffer = self.buffers.get(name)
+
+        if buffer is None or buffer.dtype != dtype or buffer.size < size:
+            # Old buffer is freed before the new one is allocated
+            self.buffers.pop(name, None)
+            buffer = np.empty(size, dtype)
+            self.buffers.update({name:buffer})
+
+        return buffer[:size].reshape(shape)
+
+
+    def like(self, name: str, signal: np.ndarray) -> np.ndarray:
+        """
+        Uninitialized array with shape and type of signal.
+        """
+        return self.array(name, signal.shape, signal.dtype)
+
+
+    def nbytes(self) -> int:
+        """
+        Memory of all buffers [bytes].
+        """
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+
+    def clear(self):
+        """
+        Frees all buffers.
+        """
+        self.buffers.clear()
+
+
+def localWorkspace() -> Workspace:
+    """
+    Workspace of current thread.
+    """
+    if not hasattr(THREAD_WORKSPACES, "workspace"):
+        THREAD_WORKSPACES.workspace = Workspace()
+
+    return THREAD_WORKSPACES.workspace